@@ -3,17 +3,43 @@ import sys
 import platform
 import shutil
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from pathlib import Path
 import subprocess
 import threading
+import queue
+import itertools
+import re
+import time
+import mmap
+import hashlib
+import hmac
+import ipaddress
+import random
+import struct
+import bisect
+import heapq
+import array
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as futures_wait
 from send2trash import send2trash
 import configparser
+import json
+import argparse
+import urllib.request
+import urllib.error
+import importlib.util
+import cProfile
+import pstats
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# tkinterdnd2 is only needed for the GUI; headless workers (--worker /
+# --serve) run on machines that never open a window. The GUI entry point
+# checks for it and shows the install hint.
 try:
     from tkinterdnd2 import DND_FILES, TkinterDnD
 except ImportError:
-    messagebox.showerror("Error", "Please install tkinterdnd2 using: pip install tkinterdnd2")
-    sys.exit(1)
+    DND_FILES = TkinterDnD = None
 
 class ConfigHandler:
     def __init__(self):
@@ -30,6 +56,21 @@ class ConfigHandler:
         self.save_video_path = True
         self.save_lut_path = True
         self.output_prefix = '_with_sdr_lut'  # Default prefix
+        self.verify_level = 'quick'           # quick / sampled / full (see VERIFY_LEVELS)
+        self.dedupe_mode = 'link'             # link / reuse / off (see DEDUPE_MODES)
+        self.job_server_url = JOB_SERVER_DEFAULT_URL
+        self.mux_backend = default_mux_backend()  # mkvmerge / native (see MUX_BACKENDS)
+        self.signal_check = True              # sample range/transfer before muxing
+        self.make_proxies = False             # SDR proxy per clip (see ProxyBuilder)
+        self.process_priority = 'balanced'    # background / balanced / throughput (see PROCESS_PRIORITIES)
+        # Segmented mode for huge recordings: inputs at or above this many GB
+        # are muxed in parallel parts (0 = off); 0 parts = SEGMENT_MAX_PARALLEL.
+        self.segment_threshold_gb = SEGMENT_DEFAULT_THRESHOLD_GB
+        self.segment_count = 0
+        # Monitoring: JSON-lines event log path ('' = off) and local
+        # Prometheus /metrics port (0 = off). settings.ini only.
+        self.event_log = ''
+        self.metrics_port = 0
 
         # ------------------------------------------------------------------
         # HDR tagging defaults (tuned for DJI Osmo Pocket 3 HDR @ Rec.2100 HLG)
@@ -73,6 +114,20 @@ class ConfigHandler:
                 self.save_video_path = self.config['Preferences'].getboolean('save_video_path', True)
                 self.save_lut_path = self.config['Preferences'].getboolean('save_lut_path', True)
                 self.output_prefix = self.config['Preferences'].get('output_prefix', '_with_sdr_lut')
+                self.verify_level = self.config['Preferences'].get('verify_level', self.verify_level)
+                self.dedupe_mode = self.config['Preferences'].get('dedupe_mode', self.dedupe_mode)
+                self.job_server_url = self.config['Preferences'].get('job_server_url', self.job_server_url)
+                self.mux_backend = self.config['Preferences'].get('mux_backend', self.mux_backend)
+                self.signal_check = self.config['Preferences'].getboolean('signal_check', self.signal_check)
+                self.make_proxies = self.config['Preferences'].getboolean('make_proxies', self.make_proxies)
+                self.process_priority = self.config['Preferences'].get('process_priority',
+                                                                       self.process_priority)
+                self.segment_threshold_gb = self.config['Preferences'].getfloat(
+                    'segment_threshold_gb', self.segment_threshold_gb)
+                self.segment_count = self.config['Preferences'].getint('segment_count', self.segment_count)
+            if 'Monitoring' in self.config:
+                self.event_log = self.config['Monitoring'].get('event_log', self.event_log)
+                self.metrics_port = self.config['Monitoring'].getint('metrics_port', self.metrics_port)
             # Pull HDR section — fall back to Pocket 3 defaults if missing so
             # existing settings.ini files from earlier versions still load.
             if 'HDR' in self.config:
@@ -89,6 +144,7 @@ class ConfigHandler:
                 self.hdr_min_luminance = self.config['HDR'].get('min_luminance', self.hdr_min_luminance)
         except Exception as e:
             print(f'[ConfigHandler.load_config] Error loading config: {str(e)}')
+            EVENT_LOG.emit('error', stage='config', detail=f'Error loading config: {e}')
 
     def save_config(self):
         if not 'Paths' in self.config:
@@ -97,6 +153,8 @@ class ConfigHandler:
             self.config['Preferences'] = {}
         if not 'HDR' in self.config:
             self.config['HDR'] = {}
+        if not 'Monitoring' in self.config:
+            self.config['Monitoring'] = {}
 
         # Save paths
         self.config['Paths']['last_video_path'] = self.last_video_path
@@ -108,6 +166,18 @@ class ConfigHandler:
         self.config['Preferences']['save_video_path'] = str(self.save_video_path)
         self.config['Preferences']['save_lut_path'] = str(self.save_lut_path)
         self.config['Preferences']['output_prefix'] = self.output_prefix
+        self.config['Preferences']['verify_level'] = self.verify_level
+        self.config['Preferences']['dedupe_mode'] = self.dedupe_mode
+        self.config['Preferences']['job_server_url'] = self.job_server_url
+        self.config['Preferences']['mux_backend'] = self.mux_backend
+        self.config['Preferences']['signal_check'] = str(self.signal_check)
+        self.config['Preferences']['make_proxies'] = str(self.make_proxies)
+        self.config['Preferences']['process_priority'] = self.process_priority
+        self.config['Preferences']['segment_threshold_gb'] = str(self.segment_threshold_gb)
+        self.config['Preferences']['segment_count'] = str(self.segment_count)
+
+        self.config['Monitoring']['event_log'] = self.event_log
+        self.config['Monitoring']['metrics_port'] = str(self.metrics_port)
 
         # Save HDR section — every flag the user can tweak so a relaunch
         # restores their exact Pocket 3 / custom HDR profile.
@@ -128,6 +198,7 @@ class ConfigHandler:
                 self.config.write(configfile)
         except Exception as e:
             print(f'[ConfigHandler.save_config] Error saving config: {str(e)}')
+            EVENT_LOG.emit('error', stage='config', detail=f'Error saving config: {e}')
 
     def update_preferences(self, show_info, delete_original, save_video_path, save_lut_path, output_prefix):
         self.show_info = show_info
@@ -137,6 +208,47 @@ class ConfigHandler:
         self.output_prefix = output_prefix
         self.save_config()
 
+    def update_verify_level(self, level):
+        """Update the output verification level"""
+        self.verify_level = level
+        self.save_config()
+
+    def update_dedupe_mode(self, mode):
+        """Update how already-muxed duplicate clips are handled"""
+        self.dedupe_mode = mode
+        self.save_config()
+
+    def update_job_server_url(self, url):
+        """Update the job server the GUI submits to"""
+        self.job_server_url = url
+        self.save_config()
+
+    def update_mux_backend(self, backend):
+        """Update which muxer (mkvmerge or the native remuxer) runs jobs"""
+        self.mux_backend = backend
+        self.save_config()
+
+    def update_signal_check(self, enabled):
+        """Update whether clips are range/transfer checked before muxing"""
+        self.signal_check = enabled
+        self.save_config()
+
+    def update_make_proxies(self, enabled):
+        """Update whether an SDR proxy is encoded for every muxed clip"""
+        self.make_proxies = enabled
+        self.save_config()
+
+    def update_process_priority(self, preset):
+        """Update the CPU/IO priority preset for mkvmerge/ffmpeg children"""
+        self.process_priority = preset
+        self.save_config()
+
+    def update_segmenting(self, threshold_gb, count):
+        """Update the segmented-mux threshold (GB, 0 = off) and part count"""
+        self.segment_threshold_gb = threshold_gb
+        self.segment_count = count
+        self.save_config()
+
     def update_hdr(self, tag_hdr, colour_matrix, colour_range, transfer, primaries,
                    max_cll, max_fall, chromaticity, white_point,
                    max_luminance, min_luminance):
@@ -252,38 +364,4827 @@ HDR_PRESETS = {
     'Custom (manual)': None,
 }
 
-# Dropdown options for the individual enum fields. Pairs of (display_label,
-# raw_value) — the raw value is what gets written into the StringVar / passed
-# to mkvmerge. Using a Combobox in 'readonly' mode prevents typos.
-HDR_MATRIX_OPTIONS = [
-    ('1 - BT.709',  '1'),
-    ('9 - BT.2020 non-constant', '9'),
-    ('10 - BT.2020 constant',    '10'),
-    ('0 - Identity / RGB',       '0'),
-]
-HDR_RANGE_OPTIONS = [
-    ('1 - Limited / Broadcast', '1'),
-    ('2 - Full / PC',           '2'),
-    ('0 - Unspecified',         '0'),
-]
-HDR_TRANSFER_OPTIONS = [
-    ('1 - BT.709 (SDR)',                '1'),
-    ('16 - SMPTE ST 2084 (PQ / HDR10)', '16'),
-    ('18 - ARIB STD-B67 (HLG)',         '18'),
-    ('6 - SMPTE 170M (NTSC)',           '6'),
-    ('14 - BT.2020 10-bit',             '14'),
-    ('15 - BT.2020 12-bit',             '15'),
-]
-HDR_PRIMARIES_OPTIONS = [
-    ('1 - BT.709',           '1'),
-    ('9 - BT.2020',          '9'),
-    ('11 - DCI P3',          '11'),
-    ('12 - Display P3 / D65','12'),
-]
+# Dropdown options for the individual enum fields. Pairs of (display_label,
+# raw_value) — the raw value is what gets written into the StringVar / passed
+# to mkvmerge. Using a Combobox in 'readonly' mode prevents typos.
+HDR_MATRIX_OPTIONS = [
+    ('1 - BT.709',  '1'),
+    ('9 - BT.2020 non-constant', '9'),
+    ('10 - BT.2020 constant',    '10'),
+    ('0 - Identity / RGB',       '0'),
+]
+HDR_RANGE_OPTIONS = [
+    ('1 - Limited / Broadcast', '1'),
+    ('2 - Full / PC',           '2'),
+    ('0 - Unspecified',         '0'),
+]
+HDR_TRANSFER_OPTIONS = [
+    ('1 - BT.709 (SDR)',                '1'),
+    ('16 - SMPTE ST 2084 (PQ / HDR10)', '16'),
+    ('18 - ARIB STD-B67 (HLG)',         '18'),
+    ('6 - SMPTE 170M (NTSC)',           '6'),
+    ('14 - BT.2020 10-bit',             '14'),
+    ('15 - BT.2020 12-bit',             '15'),
+]
+HDR_PRIMARIES_OPTIONS = [
+    ('1 - BT.709',           '1'),
+    ('9 - BT.2020',          '9'),
+    ('11 - DCI P3',          '11'),
+    ('12 - Display P3 / D65','12'),
+]
+
+# ----------------------------------------------------------------------------
+# Compiled HDR profiles.
+# ----------------------------------------------------------------------------
+# HDR_PRESETS and the panel hold raw strings. Before anything is muxed they
+# are compiled into an HDRProfile: every field is range/shape checked (a
+# six-value chromaticity, luminance bounds in order, ...) and the mkvmerge
+# argv fragment is built once. Compiled profiles are immutable and interned
+# by their values, so a batch of 300 clips shares one object and a typo is
+# rejected before any process starts, instead of by mkvmerge mid-batch.
+#
+# User profiles live in HDR_PROFILE_LIBRARY as {name: HDR_PRESETS-style
+# dict} and are listed after the built-in presets.
+# ----------------------------------------------------------------------------
+HDR_PROFILE_LIBRARY = 'hdr_profiles.json'
+
+# (field, mkvmerge flag, kind, bounds). Enum bounds are the code ranges the
+# Matroska spec defines; light levels are CTA-861.3's 16-bit fields.
+HDR_PROFILE_SCHEMA = (
+    ('colour_matrix', '--colour-matrix',                   'int',    (0, 14)),
+    ('colour_range',  '--colour-range',                    'int',    (0, 3)),
+    ('transfer',      '--colour-transfer-characteristics', 'int',    (0, 18)),
+    ('primaries',     '--colour-primaries',                'int',    (0, 22)),
+    ('max_cll',       '--max-content-light',               'int',    (0, 65535)),
+    ('max_fall',      '--max-frame-light',                 'int',    (0, 65535)),
+    ('chromaticity',  '--chromaticity-coordinates',        'coords', 6),
+    ('white_point',   '--white-colour-coordinates',        'coords', 2),
+    ('max_luminance', '--max-luminance',                   'float',  (0.0, 10000.0)),
+    ('min_luminance', '--min-luminance',                   'float',  (0.0, 10000.0)),
+)
+HDR_PROFILE_FIELDS = tuple(field for field, _flag, _kind, _bounds in HDR_PROFILE_SCHEMA)
+
+
+class HDRProfileError(ValueError):
+    """One or more HDR fields are malformed; str() lists every problem."""
+
+
+class HDRProfile:
+    """Validated, immutable HDR field set plus its precomputed mkvmerge flags."""
+
+    __slots__ = ('name', 'values', 'flags')
+
+    def __init__(self, name, values, flags):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'values', values)    # tuple of (field, value)
+        object.__setattr__(self, 'flags', flags)      # tuple of argv strings
+
+    def __setattr__(self, _name, _value):
+        raise AttributeError('HDRProfile is immutable')
+
+    def __repr__(self):
+        return f'HDRProfile({self.name!r}, flags={len(self.flags) // 2})'
+
+    def get(self, field, default=''):
+        return dict(self.values).get(field, default)
+
+    def as_dict(self):
+        """HDR_PRESETS-style dict of the normalised values (blank = unset)."""
+        return dict(self.values)
+
+
+_compiled_profiles = {}
+_compiled_profiles_lock = threading.Lock()
+
+
+def _hdr_number(text, kind):
+    """int/float of text, or ValueError with a message fit for the user."""
+    try:
+        return int(text) if kind == 'int' else float(text)
+    except ValueError:
+        raise ValueError(f'{text!r} is not {"an integer" if kind == "int" else "a number"}')
+
+
+def _check_hdr_field(kind, bounds, text):
+    """Normalised text for one field, or raise ValueError describing the problem."""
+    if kind == 'coords':
+        parts = [p.strip() for p in text.split(',')]
+        if len(parts) != bounds:
+            raise ValueError(f'needs {bounds} comma-separated values, got {len(parts)}')
+        for part in parts:
+            if not 0.0 <= _hdr_number(part, 'float') <= 1.0:
+                raise ValueError(f'coordinate {part} is outside 0..1')
+        return ','.join(parts)
+    low, high = bounds
+    number = _hdr_number(text, kind)
+    if not low <= number <= high:
+        raise ValueError(f'{text} is outside {low}..{high}')
+    return str(number) if kind == 'int' else text
+
+
+def compile_hdr_profile(values, name=''):
+    """Validate an HDR_PRESETS-style dict and return its (shared) HDRProfile.
+
+    Values may be strings or numbers (JSON libraries and job specs carry
+    both). Blank fields stay unset and produce no flag. Raises
+    HDRProfileError naming every bad field.
+    """
+    if not isinstance(values, dict):
+        raise HDRProfileError(f'expected an object of HDR fields, got {type(values).__name__}')
+    raw, problems = [], []
+    for field in HDR_PROFILE_FIELDS:
+        value = values.get(field)
+        if value is None:
+            value = ''
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif not isinstance(value, str):
+            problems.append(f'{field}: expected text or a number, got {type(value).__name__}')
+            value = ''
+        raw.append((field, value.strip()))
+    if problems:
+        raise HDRProfileError('; '.join(problems))
+    raw = tuple(raw)
+    key = (name, raw)
+    with _compiled_profiles_lock:
+        profile = _compiled_profiles.get(key)
+    if profile is not None:
+        return profile
+
+    normalised, flags, problems = [], [], []
+    for (field, flag, kind, bounds), (_field, text) in zip(HDR_PROFILE_SCHEMA, raw):
+        if text:
+            try:
+                text = _check_hdr_field(kind, bounds, text)
+            except ValueError as e:
+                problems.append(f'{field}: {e}')
+            else:
+                # All flags target track ID 0, the source's video track.
+                flags.extend([flag, f'0:{text}'])
+        normalised.append((field, text))
+    fields = dict(normalised)
+    if fields['max_cll'] and fields['max_fall'] and not problems \
+            and int(fields['max_fall']) > int(fields['max_cll']):
+        problems.append('max_fall: must not exceed max_cll')
+    if fields['max_luminance'] and fields['min_luminance'] and not problems \
+            and float(fields['min_luminance']) >= float(fields['max_luminance']):
+        problems.append('min_luminance: must be below max_luminance')
+    if problems:
+        raise HDRProfileError('; '.join(problems))
+
+    profile = HDRProfile(name, tuple(normalised), tuple(flags))
+    with _compiled_profiles_lock:
+        _compiled_profiles[key] = profile
+    return profile
+
+
+def load_hdr_profiles(path=HDR_PROFILE_LIBRARY):
+    """Compile the built-in presets plus the user library at path.
+
+    Returns ({name: HDRProfile}, [error messages]); invalid user entries
+    are reported and left out rather than failing the whole library.
+    """
+    profiles, errors = {}, []
+    for name, values in HDR_PRESETS.items():
+        if values is not None:
+            profiles[name] = compile_hdr_profile(values, name)
+    if not os.path.exists(path):
+        return profiles, errors
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            library = json.load(f)
+    except (OSError, ValueError) as e:
+        return profiles, [f'{path}: {e}']
+    if not isinstance(library, dict):
+        return profiles, [f'{path}: expected an object of name: profile, got {type(library).__name__}']
+    for name, values in library.items():
+        try:
+            profiles[name] = compile_hdr_profile(values, name)
+        except HDRProfileError as e:
+            errors.append(f'{name}: {e}')
+    return profiles, errors
+
+
+def save_hdr_profile(profile, path=HDR_PROFILE_LIBRARY):
+    """Add or replace profile in the user library at path."""
+    library = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            library = json.load(f)
+        if not isinstance(library, dict):
+            raise ValueError(f'expected an object of name: profile, got {type(library).__name__}')
+    library[profile.name] = profile.as_dict()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(library, indent=2))
+
+# ----------------------------------------------------------------------------
+# Subprocess helpers shared by the module-level pipeline functions below.
+# ----------------------------------------------------------------------------
+# On Windows, suppress the flashing console window that would otherwise pop
+# up for every mkvinfo / ffmpeg child we start.
+NO_WINDOW_FLAGS = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+
+# Muxing usually shares the workstation with an NLE, so every mkvmerge,
+# mkvinfo, ffmpeg and ffprobe child we start runs at a preset CPU / IO
+# priority:
+#   nice      POSIX niceness added via `nice -n` (0 = unchanged)
+#   ionice    Linux `ionice` class/level (None = unchanged; class 3 = idle)
+#   windows   Windows priority-class creation flag (0 = normal)
+#   reserve   CPUs kept free of analysis work (probe, verify, scopes,
+#             thumbnails, signal checks) for the Tk thread and other apps;
+#             a fraction of the machine or a count
+# Analysis pool threads pin themselves on start (pin_analysis_thread) and
+# the ffmpeg children they spawn inherit that mask; the Tk thread is never
+# pinned. Affinity is Linux-only; elsewhere only the priority applies.
+PROCESS_PRIORITIES = {
+    'background': {'nice': 15, 'ionice': ('3', None),
+                   'windows': getattr(subprocess, 'IDLE_PRIORITY_CLASS', 0), 'reserve': 0.5},
+    'balanced':   {'nice': 5, 'ionice': ('2', '7'),
+                   'windows': getattr(subprocess, 'BELOW_NORMAL_PRIORITY_CLASS', 0), 'reserve': 1},
+    'throughput': {'nice': 0, 'ionice': None, 'windows': 0, 'reserve': 0},
+}
+PROCESS_PRIORITY_OPTIONS = [
+    ('Background (NLE first)', 'background'),
+    ('Balanced',               'balanced'),
+    ('Max throughput',         'throughput'),
+]
+# CPUs this process may use, captured from the main thread before any pool
+# thread narrows its own mask.
+_PROCESS_CPUS = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+_process_priority_name = 'balanced'
+_process_priority = PROCESS_PRIORITIES[_process_priority_name]
+_priority_prefix = None
+
+
+def set_process_priority(preset):
+    """Select the PROCESS_PRIORITIES preset used for children started from now on."""
+    global _process_priority_name, _process_priority, _priority_prefix
+    if preset not in PROCESS_PRIORITIES:
+        preset = 'balanced'
+    _process_priority_name = preset
+    _process_priority = PROCESS_PRIORITIES[preset]
+    _priority_prefix = None
+
+
+def prioritized(cmd):
+    """cmd wrapped in nice/ionice for the current priority preset (POSIX only)."""
+    global _priority_prefix
+    if platform.system() == "Windows":
+        return cmd
+    if _priority_prefix is None:
+        prefix = []
+        ionice = _process_priority['ionice']
+        if ionice and shutil.which('ionice'):
+            # -t: still run the command where the IO scheduler refuses the class.
+            prefix += ['ionice', '-t', '-c', ionice[0]] + (['-n', ionice[1]] if ionice[1] else [])
+        if _process_priority['nice'] and shutil.which('nice'):
+            prefix += ['nice', '-n', str(_process_priority['nice'])]
+        _priority_prefix = prefix
+    return _priority_prefix + list(cmd)
+
+
+def child_creationflags():
+    """creationflags for a prioritized child: no console window + priority class."""
+    return NO_WINDOW_FLAGS | _process_priority['windows']
+
+
+def analysis_cpus():
+    """CPUs analysis workers may use under the current preset ([] = no pinning)."""
+    reserve = _process_priority['reserve']
+    if isinstance(reserve, float):
+        reserve = int(len(_PROCESS_CPUS) * reserve)
+    if not reserve or len(_PROCESS_CPUS) <= reserve:
+        return []
+    # Leave the lowest-numbered CPUs free; the scheduler tends to fill those
+    # first, so that's where the Tk thread and the NLE end up.
+    return _PROCESS_CPUS[reserve:]
+
+
+def pin_analysis_thread():
+    """ThreadPoolExecutor initializer: pin the calling thread to analysis_cpus()."""
+    cpus = analysis_cpus()
+    if not cpus:
+        return
+    try:
+        # pid 0 is the calling thread on Linux, not the whole process.
+        os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        print(f'[pin_analysis_thread] Error setting affinity: {str(e)}')
+
+
+# ----------------------------------------------------------------------------
+# Structured event log + Prometheus metrics.
+# ----------------------------------------------------------------------------
+# Unattended runs (headless workers, job server, long GUI batches) need more
+# than the free text in the Status & Output panel. EVENT_LOG appends one JSON
+# object per line (job start/end, bytes, durations, verification results,
+# errors) and METRICS keeps counters / histograms / gauges that any of our
+# HTTP servers expose at /metrics in the Prometheus text format.
+#
+# Both are module-level singletons so the pipeline functions can record
+# without threading a logger through every call. The event log is off until
+# configure() is given a path.
+# ----------------------------------------------------------------------------
+METRICS_DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+METRICS_THROUGHPUT_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600, 3200)
+
+
+class EventLog:
+    """Thread-safe JSON-lines writer."""
+
+    def __init__(self, path=''):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def configure(self, path):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            self.path = path
+
+    def emit(self, event, **fields):
+        if not self.path:
+            return
+        record = {'ts': time.time(), 'event': event, 'host': platform.node(),
+                  'pid': os.getpid()}
+        record.update(fields)
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                # One write per record so concurrent worker processes
+                # appending to the same file don't interleave lines.
+                self._file.write(line)
+                self._file.flush()
+            except OSError as e:
+                print(f'[EventLog.emit] Error writing event log: {str(e)}')
+
+
+class MetricsRegistry:
+    """Minimal Prometheus-style registry: counters, histograms, callback gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}   # name -> {'type', 'help', 'buckets', 'series'}
+
+    def counter(self, name, help_text):
+        self._metrics[name] = {'type': 'counter', 'help': help_text, 'series': {}}
+
+    def histogram(self, name, help_text, buckets=METRICS_DEFAULT_BUCKETS):
+        self._metrics[name] = {'type': 'histogram', 'help': help_text,
+                               'buckets': tuple(buckets), 'series': {}}
+
+    def gauge(self, name, help_text):
+        self._metrics[name] = {'type': 'gauge', 'help': help_text, 'series': {}}
+
+    def track(self, name, fn, **labels):
+        """Report fn() as a gauge value at scrape time."""
+        with self._lock:
+            self._metrics[name]['series'][tuple(sorted(labels.items()))] = fn
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._metrics[name]['series']
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metrics[name]
+            state = metric['series'].get(key)
+            if state is None:
+                state = metric['series'][key] = [[0] * len(metric['buckets']), 0.0, 0]
+            for i, bound in enumerate(metric['buckets']):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def _labels(key, extra=()):
+        pairs = list(key) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, metric in self._metrics.items():
+                lines.append(f'# HELP {name} {metric["help"]}')
+                lines.append(f'# TYPE {name} {metric["type"]}')
+                for key, state in metric['series'].items():
+                    if metric['type'] == 'histogram':
+                        counts, total, count = state
+                        for bound, n in zip(metric['buckets'], counts):
+                            lines.append(f'{name}_bucket{self._labels(key, [("le", bound)])} {n}')
+                        lines.append(f'{name}_bucket{self._labels(key, [("le", "+Inf")])} {count}')
+                        lines.append(f'{name}_sum{self._labels(key)} {total}')
+                        lines.append(f'{name}_count{self._labels(key)} {count}')
+                    else:
+                        value = state() if callable(state) else state
+                        lines.append(f'{name}{self._labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+EVENT_LOG = EventLog()
+METRICS = MetricsRegistry()
+METRICS.counter('hdr_jobs_total', 'Mux jobs finished, by result')
+METRICS.counter('hdr_failures_total', 'Pipeline failures, by stage')
+METRICS.counter('hdr_bytes_in_total', 'Source bytes muxed')
+METRICS.counter('hdr_bytes_out_total', 'Tagged output bytes written')
+METRICS.histogram('hdr_probe_seconds', 'Instant-info probe latency')
+METRICS.histogram('hdr_mux_seconds', 'mkvmerge wall-clock time per job')
+METRICS.histogram('hdr_mux_throughput_mb_per_s', 'mkvmerge throughput per job (MiB/s of source)',
+                  METRICS_THROUGHPUT_BUCKETS)
+METRICS.histogram('hdr_verify_seconds', 'Output verification time, by level')
+METRICS.histogram('hdr_hook_seconds', 'Pipeline hook run time, by stage')
+METRICS.gauge('hdr_queue_depth', 'Items waiting, by queue')
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Serve METRICS at http://host:port/metrics on a daemon thread."""
+    httpd = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+# ----------------------------------------------------------------------------
+# Minimal EBML / Matroska reader.
+# ----------------------------------------------------------------------------
+# Just enough of the EBML spec to walk a Matroska file's element tree without
+# shelling out to mkvinfo. Works on any bytes-like buffer that supports
+# slicing, which in practice is an mmap of the file — so only the pages that
+# hold element headers we actually visit are ever read from disk, and a
+# 100 GB recording costs the same as a 10 MB one.
+#
+# Element IDs (Matroska spec, https://www.matroska.org/technical/elements.html)
+# ----------------------------------------------------------------------------
+EBML_ID_HEADER = 0x1A45DFA3
+EBML_ID_DOCTYPE = 0x4282
+MKV_ID_SEGMENT = 0x18538067
+MKV_ID_SEEKHEAD = 0x114D9B74
+MKV_ID_SEEK = 0x4DBB
+MKV_ID_SEEK_ID = 0x53AB
+MKV_ID_SEEK_POSITION = 0x53AC
+MKV_ID_INFO = 0x1549A966
+MKV_ID_TIMESTAMP_SCALE = 0x2AD7B1
+MKV_ID_DURATION = 0x4489
+MKV_ID_TRACKS = 0x1654AE6B
+MKV_ID_TRACK_ENTRY = 0xAE
+MKV_ID_TRACK_TYPE = 0x83
+MKV_ID_VIDEO = 0xE0
+MKV_ID_COLOUR = 0x55B0
+MKV_ID_MATRIX = 0x55B1
+MKV_ID_RANGE = 0x55B9
+MKV_ID_TRANSFER = 0x55BA
+MKV_ID_PRIMARIES = 0x55BB
+MKV_ID_MAX_CLL = 0x55BC
+MKV_ID_MAX_FALL = 0x55BD
+MKV_ID_MASTERING = 0x55D0
+MKV_ID_PRIMARY_R_X = 0x55D1
+MKV_ID_PRIMARY_R_Y = 0x55D2
+MKV_ID_PRIMARY_G_X = 0x55D3
+MKV_ID_PRIMARY_G_Y = 0x55D4
+MKV_ID_PRIMARY_B_X = 0x55D5
+MKV_ID_PRIMARY_B_Y = 0x55D6
+MKV_ID_WHITE_X = 0x55D7
+MKV_ID_WHITE_Y = 0x55D8
+MKV_ID_LUMINANCE_MAX = 0x55D9
+MKV_ID_LUMINANCE_MIN = 0x55DA
+MKV_ID_ATTACHMENTS = 0x1941A469
+MKV_ID_ATTACHED_FILE = 0x61A7
+MKV_ID_FILE_NAME = 0x466E
+MKV_ID_FILE_MIME = 0x4660
+MKV_ID_CLUSTER = 0x1F43B675
+
+
+def _ebml_read_id(buf, pos):
+    """Return (element_id, length) for the EBML ID at buf[pos].
+
+    IDs keep their length-marker bits, which is how the spec writes them
+    (0x1A45DFA3 and friends above).
+    """
+    first = buf[pos]
+    length = 1
+    mask = 0x80
+    while length <= 4 and not (first & mask):
+        mask >>= 1
+        length += 1
+    if length > 4:
+        raise ValueError(f'Invalid EBML ID at offset {pos}')
+    return int.from_bytes(buf[pos:pos + length], 'big'), length
+
+
+def _ebml_read_size(buf, pos):
+    """Return (data_size, length) for the EBML size vint at buf[pos].
+
+    A size with every value bit set means "unknown" (live-streamed clusters);
+    that comes back as None so callers can treat it as "runs to the parent's
+    end".
+    """
+    first = buf[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not (first & mask):
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError(f'Invalid EBML size at offset {pos}')
+    value = first & (mask - 1)
+    for b in buf[pos + 1:pos + length]:
+        value = (value << 8) | b
+    if value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def iter_ebml(buf, start, end):
+    """Yield (element_id, header_pos, data_pos, data_size) for each child.
+
+    Walks the elements laid out back to back in buf[start:end]. Unknown-size
+    elements are clamped to the parent's end; a truncated trailing element
+    stops the walk instead of raising, since a half-written file is exactly
+    what the verifier needs to survive looking at.
+    """
+    pos = start
+    while pos < end:
+        try:
+            eid, id_len = _ebml_read_id(buf, pos)
+            size, size_len = _ebml_read_size(buf, pos + id_len)
+        except (ValueError, IndexError):
+            return
+        data_pos = pos + id_len + size_len
+        if size is None:
+            size = end - data_pos
+        yield eid, pos, data_pos, size
+        pos = data_pos + size
+
+
+def _ebml_uint(buf, pos, size):
+    return int.from_bytes(buf[pos:pos + size], 'big')
+
+
+def _ebml_float(buf, pos, size):
+    if size == 4:
+        return struct.unpack('>f', buf[pos:pos + 4])[0]
+    if size == 8:
+        return struct.unpack('>d', buf[pos:pos + 8])[0]
+    return 0.0
+
+
+def _ebml_string(buf, pos, size):
+    return bytes(buf[pos:pos + size]).rstrip(b'\x00').decode('utf-8', 'replace')
+
+
+def _format_float(value):
+    """Render a stored float the way a user would type it ('0.3127', '1000')."""
+    return f'{value:.6g}'
+
+
+def _parse_mkv_colour(buf, start, end):
+    """Decode a Colour element into the HDR_PRESETS key layout (all strings)."""
+    tags = {}
+    coords = {}
+    white = {}
+    for eid, _h, pos, size in iter_ebml(buf, start, end):
+        if eid == MKV_ID_MATRIX:
+            tags['colour_matrix'] = str(_ebml_uint(buf, pos, size))
+        elif eid == MKV_ID_RANGE:
+            tags['colour_range'] = str(_ebml_uint(buf, pos, size))
+        elif eid == MKV_ID_TRANSFER:
+            tags['transfer'] = str(_ebml_uint(buf, pos, size))
+        elif eid == MKV_ID_PRIMARIES:
+            tags['primaries'] = str(_ebml_uint(buf, pos, size))
+        elif eid == MKV_ID_MAX_CLL:
+            tags['max_cll'] = str(_ebml_uint(buf, pos, size))
+        elif eid == MKV_ID_MAX_FALL:
+            tags['max_fall'] = str(_ebml_uint(buf, pos, size))
+        elif eid == MKV_ID_MASTERING:
+            for mid, _mh, mpos, msize in iter_ebml(buf, pos, pos + size):
+                value = _ebml_float(buf, mpos, msize)
+                if MKV_ID_PRIMARY_R_X <= mid <= MKV_ID_PRIMARY_B_Y:
+                    coords[mid] = value
+                elif mid in (MKV_ID_WHITE_X, MKV_ID_WHITE_Y):
+                    white[mid] = value
+                elif mid == MKV_ID_LUMINANCE_MAX:
+                    tags['max_luminance'] = _format_float(value)
+                elif mid == MKV_ID_LUMINANCE_MIN:
+                    tags['min_luminance'] = _format_float(value)
+    if coords:
+        tags['chromaticity'] = ','.join(_format_float(coords[k]) for k in sorted(coords))
+    if white:
+        tags['white_point'] = ','.join(_format_float(white[k]) for k in sorted(white))
+    return tags
+
+
+def read_mkv_summary(path):
+    """Read the metadata-bearing header of a Matroska file.
+
+    Returns a dict with:
+      doc_type     'matroska' / 'webm'
+      duration_s   float seconds (0.0 if the Info element has none)
+      colour       HDR_PRESETS-style dict for the first video track's Colour
+      attachments  list of (file_name, mime_type) tuples
+      has_clusters True once at least one Cluster element was seen
+
+    Only top-level Segment children are walked, and the walk stops at the
+    first Cluster — everything mkvmerge writes that we care about comes
+    before the media data, with the SeekHead used to reach anything placed
+    after it.
+    """
+    summary = {'doc_type': '', 'duration_s': 0.0, 'colour': {},
+               'attachments': [], 'has_clusters': False}
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('File is empty')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            file_end = len(buf)
+            top = iter_ebml(buf, 0, file_end)
+            header = next(top, None)
+            if header is None or header[0] != EBML_ID_HEADER:
+                raise ValueError('Not an EBML file')
+            _eid, _h, pos, size = header
+            for cid, _ch, cpos, csize in iter_ebml(buf, pos, pos + size):
+                if cid == EBML_ID_DOCTYPE:
+                    summary['doc_type'] = _ebml_string(buf, cpos, csize)
+
+            segment = next(top, None)
+            if segment is None or segment[0] != MKV_ID_SEGMENT:
+                raise ValueError('No Matroska Segment element')
+            _sid, _sh, seg_start, seg_size = segment
+            seg_end = min(seg_start + seg_size, file_end)
+
+            seen = set()
+            seek_targets = {}
+
+            def visit(eid, pos, size):
+                seen.add(eid)
+                if eid == MKV_ID_SEEKHEAD:
+                    for sid, _x, spos, ssize in iter_ebml(buf, pos, pos + size):
+                        if sid != MKV_ID_SEEK:
+                            continue
+                        target_id = target_pos = None
+                        for kid, _y, kpos, ksize in iter_ebml(buf, spos, spos + ssize):
+                            if kid == MKV_ID_SEEK_ID:
+                                target_id = _ebml_uint(buf, kpos, ksize)
+                            elif kid == MKV_ID_SEEK_POSITION:
+                                target_pos = _ebml_uint(buf, kpos, ksize)
+                        if target_id is not None and target_pos is not None:
+                            seek_targets.setdefault(target_id, seg_start + target_pos)
+                elif eid == MKV_ID_INFO:
+                    scale = 1000000
+                    duration = 0.0
+                    for iid, _x, ipos, isize in iter_ebml(buf, pos, pos + size):
+                        if iid == MKV_ID_TIMESTAMP_SCALE:
+                            scale = _ebml_uint(buf, ipos, isize)
+                        elif iid == MKV_ID_DURATION:
+                            duration = _ebml_float(buf, ipos, isize)
+                    summary['duration_s'] = duration * scale / 1e9
+                elif eid == MKV_ID_TRACKS:
+                    for tid, _x, tpos, tsize in iter_ebml(buf, pos, pos + size):
+                        if tid != MKV_ID_TRACK_ENTRY or summary['colour']:
+                            continue
+                        for vid, _y, vpos, vsize in iter_ebml(buf, tpos, tpos + tsize):
+                            if vid != MKV_ID_VIDEO:
+                                continue
+                            for kid, _z, kpos, ksize in iter_ebml(buf, vpos, vpos + vsize):
+                                if kid == MKV_ID_COLOUR:
+                                    summary['colour'] = _parse_mkv_colour(buf, kpos, kpos + ksize)
+                elif eid == MKV_ID_ATTACHMENTS:
+                    for aid, _x, apos, asize in iter_ebml(buf, pos, pos + size):
+                        if aid != MKV_ID_ATTACHED_FILE:
+                            continue
+                        name = mime = ''
+                        for fid, _y, fpos, fsize in iter_ebml(buf, apos, apos + asize):
+                            if fid == MKV_ID_FILE_NAME:
+                                name = _ebml_string(buf, fpos, fsize)
+                            elif fid == MKV_ID_FILE_MIME:
+                                mime = _ebml_string(buf, fpos, fsize)
+                        summary['attachments'].append((name, mime))
+
+            for eid, _h, pos, size in iter_ebml(buf, seg_start, seg_end):
+                if eid == MKV_ID_CLUSTER:
+                    summary['has_clusters'] = True
+                    break
+                visit(eid, pos, size)
+
+            # Anything the SeekHead points at that we have not walked yet
+            # (typically Attachments or Tracks written after the clusters).
+            for target_id in (MKV_ID_INFO, MKV_ID_TRACKS, MKV_ID_ATTACHMENTS):
+                target = seek_targets.get(target_id)
+                if target_id in seen or target is None or target >= seg_end:
+                    continue
+                for eid, _h, pos, size in iter_ebml(buf, target, seg_end):
+                    if eid == target_id:
+                        visit(eid, pos, size)
+                    break
+    return summary
+
+
+# ----------------------------------------------------------------------------
+# Lazy Matroska element browser.
+# ----------------------------------------------------------------------------
+# Pasting mkvinfo's full dump into a Text widget is slow to build and to
+# scroll once a file has thousands of clusters and cue points. The browser
+# exposes the same element tree straight from the file: only the top level
+# is read up front, children are parsed when a node is expanded, and long
+# child lists (Segment -> Cluster x 20k) come in MKV_TREE_PAGE_SIZE pages.
+#
+# The file is memory-mapped per call rather than held open, so nothing
+# pins it (Windows can't trash or rename a file with a live mapping) and
+# only the pages actually touched are ever read — a 100 GB file opens as
+# fast as a 10 MB one.
+# ----------------------------------------------------------------------------
+MKV_TREE_PAGE_SIZE = 200
+MKV_TREE_BINARY_PREVIEW = 16   # bytes of hex shown for binary elements
+
+# Element ID -> (name, kind); kind is master / uint / int / float / string /
+# date / binary / block. Unknown IDs are shown as binary.
+MKV_ELEMENT_NAMES = {
+    0x1A45DFA3: ('EBML', 'master'),
+    0x4286: ('EBMLVersion', 'uint'),
+    0x42F7: ('EBMLReadVersion', 'uint'),
+    0x42F2: ('EBMLMaxIDLength', 'uint'),
+    0x42F3: ('EBMLMaxSizeLength', 'uint'),
+    0x4282: ('DocType', 'string'),
+    0x4287: ('DocTypeVersion', 'uint'),
+    0x4285: ('DocTypeReadVersion', 'uint'),
+    0xEC: ('Void', 'binary'),
+    0xBF: ('CRC-32', 'binary'),
+    0x18538067: ('Segment', 'master'),
+    0x114D9B74: ('SeekHead', 'master'),
+    0x4DBB: ('Seek', 'master'),
+    0x53AB: ('SeekID', 'binary'),
+    0x53AC: ('SeekPosition', 'uint'),
+    0x1549A966: ('Info', 'master'),
+    0x73A4: ('SegmentUID', 'binary'),
+    0x2AD7B1: ('TimestampScale', 'uint'),
+    0x4489: ('Duration', 'float'),
+    0x4461: ('DateUTC', 'date'),
+    0x7BA9: ('Title', 'string'),
+    0x4D80: ('MuxingApp', 'string'),
+    0x5741: ('WritingApp', 'string'),
+    0x1654AE6B: ('Tracks', 'master'),
+    0xAE: ('TrackEntry', 'master'),
+    0xD7: ('TrackNumber', 'uint'),
+    0x73C5: ('TrackUID', 'uint'),
+    0x83: ('TrackType', 'uint'),
+    0xB9: ('FlagEnabled', 'uint'),
+    0x88: ('FlagDefault', 'uint'),
+    0x55AA: ('FlagForced', 'uint'),
+    0x9C: ('FlagLacing', 'uint'),
+    0x23E383: ('DefaultDuration', 'uint'),
+    0x536E: ('Name', 'string'),
+    0x22B59C: ('Language', 'string'),
+    0x22B59D: ('LanguageIETF', 'string'),
+    0x86: ('CodecID', 'string'),
+    0x63A2: ('CodecPrivate', 'binary'),
+    0x56AA: ('CodecDelay', 'uint'),
+    0x56BB: ('SeekPreRoll', 'uint'),
+    0xE0: ('Video', 'master'),
+    0xB0: ('PixelWidth', 'uint'),
+    0xBA: ('PixelHeight', 'uint'),
+    0x54B0: ('DisplayWidth', 'uint'),
+    0x54BA: ('DisplayHeight', 'uint'),
+    0x54B2: ('DisplayUnit', 'uint'),
+    0x55B0: ('Colour', 'master'),
+    0x55B1: ('MatrixCoefficients', 'uint'),
+    0x55B2: ('BitsPerChannel', 'uint'),
+    0x55B3: ('ChromaSubsamplingHorz', 'uint'),
+    0x55B4: ('ChromaSubsamplingVert', 'uint'),
+    0x55B7: ('ChromaSitingHorz', 'uint'),
+    0x55B8: ('ChromaSitingVert', 'uint'),
+    0x55B9: ('Range', 'uint'),
+    0x55BA: ('TransferCharacteristics', 'uint'),
+    0x55BB: ('Primaries', 'uint'),
+    0x55BC: ('MaxCLL', 'uint'),
+    0x55BD: ('MaxFALL', 'uint'),
+    0x55D0: ('MasteringMetadata', 'master'),
+    0x55D1: ('PrimaryRChromaticityX', 'float'),
+    0x55D2: ('PrimaryRChromaticityY', 'float'),
+    0x55D3: ('PrimaryGChromaticityX', 'float'),
+    0x55D4: ('PrimaryGChromaticityY', 'float'),
+    0x55D5: ('PrimaryBChromaticityX', 'float'),
+    0x55D6: ('PrimaryBChromaticityY', 'float'),
+    0x55D7: ('WhitePointChromaticityX', 'float'),
+    0x55D8: ('WhitePointChromaticityY', 'float'),
+    0x55D9: ('LuminanceMax', 'float'),
+    0x55DA: ('LuminanceMin', 'float'),
+    0xE1: ('Audio', 'master'),
+    0xB5: ('SamplingFrequency', 'float'),
+    0x78B5: ('OutputSamplingFrequency', 'float'),
+    0x9F: ('Channels', 'uint'),
+    0x6264: ('BitDepth', 'uint'),
+    0x1941A469: ('Attachments', 'master'),
+    0x61A7: ('AttachedFile', 'master'),
+    0x467E: ('FileDescription', 'string'),
+    0x466E: ('FileName', 'string'),
+    0x4660: ('FileMediaType', 'string'),
+    0x465C: ('FileData', 'binary'),
+    0x46AE: ('FileUID', 'uint'),
+    0x1F43B675: ('Cluster', 'master'),
+    0xE7: ('Timestamp', 'uint'),
+    0xAB: ('PrevSize', 'uint'),
+    0xA7: ('Position', 'uint'),
+    0xA3: ('SimpleBlock', 'block'),
+    0xA0: ('BlockGroup', 'master'),
+    0xA1: ('Block', 'block'),
+    0x9B: ('BlockDuration', 'uint'),
+    0xFB: ('ReferenceBlock', 'int'),
+    0x1C53BB6B: ('Cues', 'master'),
+    0xBB: ('CuePoint', 'master'),
+    0xB3: ('CueTime', 'uint'),
+    0xB7: ('CueTrackPositions', 'master'),
+    0xF7: ('CueTrack', 'uint'),
+    0xF1: ('CueClusterPosition', 'uint'),
+    0xF0: ('CueRelativePosition', 'uint'),
+    0xB2: ('CueDuration', 'uint'),
+    0x1043A770: ('Chapters', 'master'),
+    0x45B9: ('EditionEntry', 'master'),
+    0xB6: ('ChapterAtom', 'master'),
+    0x73C4: ('ChapterUID', 'uint'),
+    0x91: ('ChapterTimeStart', 'uint'),
+    0x92: ('ChapterTimeEnd', 'uint'),
+    0x80: ('ChapterDisplay', 'master'),
+    0x85: ('ChapString', 'string'),
+    0x1254C367: ('Tags', 'master'),
+    0x7373: ('Tag', 'master'),
+    0x63C0: ('Targets', 'master'),
+    0x67C8: ('SimpleTag', 'master'),
+    0x45A3: ('TagName', 'string'),
+    0x4487: ('TagString', 'string'),
+}
+
+# Enum-valued Colour children are labelled with the same text as the HDR
+# panel's combos ("18 - ARIB STD-B67 (HLG)").
+_MKV_ENUM_LABELS = {
+    MKV_ID_MATRIX: HDR_MATRIX_OPTIONS,
+    MKV_ID_RANGE: HDR_RANGE_OPTIONS,
+    MKV_ID_TRANSFER: HDR_TRANSFER_OPTIONS,
+    MKV_ID_PRIMARIES: HDR_PRIMARIES_OPTIONS,
+}
+
+# Matroska dates count nanoseconds from 2001-01-01T00:00:00 UTC.
+_MKV_EPOCH_OFFSET = 978307200
+
+
+class MkvElementBrowser:
+    """On-demand access to a Matroska file's element tree.
+
+    Elements are (element_id, header_pos, data_pos, data_size) tuples, the
+    same shape iter_ebml() yields. Apart from the segment's TimestampScale,
+    nothing is cached between calls; each call maps the file, reads what it
+    needs and unmaps again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file_size = os.path.getsize(path)
+        if self.file_size == 0:
+            raise ValueError('File is empty')
+        self._timestamp_scale = None
+
+    def _map(self):
+        f = open(self.path, 'rb')
+        try:
+            return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+
+    @staticmethod
+    def is_master(element):
+        return MKV_ELEMENT_NAMES.get(element[0], ('', 'binary'))[1] == 'master'
+
+    def roots(self):
+        """Top-level elements (EBML header, Segment) — never a long list."""
+        elements, _resume = self.children(None)
+        return elements
+
+    def children(self, element, start=None, limit=MKV_TREE_PAGE_SIZE):
+        """Up to limit children of element (None = the file itself).
+
+        start resumes a previous page. Returns (elements, resume_pos) where
+        resume_pos is None once the parent has no more children.
+        """
+        if element is None:
+            begin, end = 0, self.file_size
+        else:
+            begin, end = element[2], min(element[2] + element[3], self.file_size)
+        f, buf = self._map()
+        try:
+            elements = []
+            for child in iter_ebml(buf, begin if start is None else start, end):
+                if len(elements) == limit:
+                    return elements, child[1]
+                elements.append(child)
+            return elements, None
+        finally:
+            buf.close()
+            f.close()
+
+    def pinned(self):
+        """[(label, element, value)] for every Colour block and attachment.
+
+        Walks the Segment's level-1 elements up to the first Cluster and
+        follows the SeekHead for Tracks / Attachments written after the
+        media, the same way read_mkv_summary() does.
+        """
+        f, buf = self._map()
+        try:
+            top = list(itertools.islice(iter_ebml(buf, 0, len(buf)), 2))
+            if len(top) < 2 or top[1][0] != MKV_ID_SEGMENT:
+                return []
+            seg_start = top[1][2]
+            seg_end = min(seg_start + top[1][3], len(buf))
+            found = {}
+            seek_targets = {}
+            for eid, header_pos, pos, size in iter_ebml(buf, seg_start, seg_end):
+                if eid == MKV_ID_CLUSTER:
+                    break
+                if eid in (MKV_ID_TRACKS, MKV_ID_ATTACHMENTS):
+                    found.setdefault(eid, (eid, header_pos, pos, size))
+                elif eid == MKV_ID_SEEKHEAD:
+                    for _sid, _x, spos, ssize in iter_ebml(buf, pos, pos + size):
+                        target_id = target_pos = None
+                        for kid, _y, kpos, ksize in iter_ebml(buf, spos, spos + ssize):
+                            if kid == MKV_ID_SEEK_ID:
+                                target_id = _ebml_uint(buf, kpos, ksize)
+                            elif kid == MKV_ID_SEEK_POSITION:
+                                target_pos = _ebml_uint(buf, kpos, ksize)
+                        if target_id is not None and target_pos is not None:
+                            seek_targets.setdefault(target_id, seg_start + target_pos)
+            for target_id in (MKV_ID_TRACKS, MKV_ID_ATTACHMENTS):
+                target = seek_targets.get(target_id)
+                if target_id in found or target is None or target >= seg_end:
+                    continue
+                element = next(iter_ebml(buf, target, seg_end), None)
+                if element and element[0] == target_id:
+                    found[target_id] = element
+
+            pins = []
+            if MKV_ID_TRACKS in found:
+                _eid, _h, pos, size = found[MKV_ID_TRACKS]
+                for tid, _x, tpos, tsize in iter_ebml(buf, pos, pos + size):
+                    if tid != MKV_ID_TRACK_ENTRY:
+                        continue
+                    number = '?'
+                    for cid, _y, cpos, csize in iter_ebml(buf, tpos, tpos + tsize):
+                        if cid == 0xD7:     # TrackNumber
+                            number = _ebml_uint(buf, cpos, csize)
+                        elif cid == MKV_ID_VIDEO:
+                            for vid, vh, vpos, vsize in iter_ebml(buf, cpos, cpos + csize):
+                                if vid == MKV_ID_COLOUR:
+                                    tags = _parse_mkv_colour(buf, vpos, vpos + vsize)
+                                    pins.append((f'Colour (track {number})', (vid, vh, vpos, vsize),
+                                                 ', '.join(f'{k}={v}' for k, v in tags.items())))
+            if MKV_ID_ATTACHMENTS in found:
+                _eid, _h, pos, size = found[MKV_ID_ATTACHMENTS]
+                for aid, ah, apos, asize in iter_ebml(buf, pos, pos + size):
+                    if aid != MKV_ID_ATTACHED_FILE:
+                        continue
+                    fields = {fid: (fpos, fsize) for fid, _y, fpos, fsize in iter_ebml(buf, apos, apos + asize)}
+                    name = _ebml_string(buf, *fields[MKV_ID_FILE_NAME]) if MKV_ID_FILE_NAME in fields else ''
+                    mime = _ebml_string(buf, *fields[MKV_ID_FILE_MIME]) if MKV_ID_FILE_MIME in fields else ''
+                    data_size = fields.get(0x465C, (0, 0))[1]     # FileData
+                    pins.append((f'Attachment: {name}', (aid, ah, apos, asize),
+                                 f'{mime}, {data_size:,} bytes'))
+            return pins
+        finally:
+            buf.close()
+            f.close()
+
+    def describe(self, elements):
+        """[(name, value text)] for elements, reading at most a few bytes of each."""
+        f, buf = self._map()
+        try:
+            if self._timestamp_scale is None:
+                self._timestamp_scale = self._read_timestamp_scale(buf)
+            return [self._describe(buf, element, self._timestamp_scale) for element in elements]
+        finally:
+            buf.close()
+            f.close()
+
+    @staticmethod
+    def _read_timestamp_scale(buf):
+        """Segment Info's TimestampScale (ns per tick); the spec default if absent."""
+        top = list(itertools.islice(iter_ebml(buf, 0, len(buf)), 2))
+        if len(top) == 2 and top[1][0] == MKV_ID_SEGMENT:
+            seg_start = top[1][2]
+            seg_end = min(seg_start + top[1][3], len(buf))
+            for eid, _header_pos, pos, size in iter_ebml(buf, seg_start, seg_end):
+                if eid == MKV_ID_CLUSTER:
+                    break
+                if eid == MKV_ID_INFO:
+                    for iid, _x, ipos, isize in iter_ebml(buf, pos, pos + size):
+                        if iid == MKV_ID_TIMESTAMP_SCALE:
+                            return _ebml_uint(buf, ipos, isize) or 1000000
+                    break
+        return 1000000
+
+    @staticmethod
+    def _describe(buf, element, timestamp_scale=1000000):
+        eid, _header_pos, pos, size = element
+        name, kind = MKV_ELEMENT_NAMES.get(eid, (f'0x{eid:X}', 'binary'))
+        if kind == 'master':
+            return name, f'{size:,} bytes'
+        try:
+            if kind == 'uint':
+                value = _ebml_uint(buf, pos, size)
+                label = next((text for text, raw in _MKV_ENUM_LABELS.get(eid, [])
+                              if raw == str(value)), '')
+                return name, label or str(value)
+            if kind == 'int':
+                return name, str(int.from_bytes(buf[pos:pos + size], 'big', signed=True))
+            if kind == 'float':
+                return name, _format_float(_ebml_float(buf, pos, size))
+            if kind == 'string':
+                return name, _ebml_string(buf, pos, size)
+            if kind == 'date':
+                nanoseconds = int.from_bytes(buf[pos:pos + size], 'big', signed=True)
+                return name, time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(
+                    _MKV_EPOCH_OFFSET + nanoseconds / 1e9))
+            if kind == 'block':
+                track, track_len = _ebml_read_size(buf, pos)
+                relative = int.from_bytes(buf[pos + track_len:pos + track_len + 2], 'big', signed=True)
+                flags = buf[pos + track_len + 2]
+                key = ', key' if eid == 0xA3 and flags & 0x80 else ''
+                # The relative timestamp is in TimestampScale ticks.
+                offset = f'{relative * timestamp_scale / 1e6:+.6g} ms'
+                if timestamp_scale != 1000000:
+                    offset = f'{relative:+d} ticks ({offset})'
+                return name, f'track {track}, {offset}{key}, {size - track_len - 3:,} bytes'
+            preview = bytes(buf[pos:pos + min(size, MKV_TREE_BINARY_PREVIEW)]).hex(' ')
+            more = ' ...' if size > MKV_TREE_BINARY_PREVIEW else ''
+            return name, f'{size:,} bytes: {preview}{more}'
+        except (IndexError, ValueError, OverflowError, OSError) as e:
+            return name, f'[unreadable: {e}]'
+
+
+class MkvElementTree(tk.Frame):
+    """ttk.Treeview over an MkvElementBrowser, expanding nodes on demand.
+
+    Pinned Colour / attachment nodes sit above the real tree. Master
+    elements get a single placeholder child so Tk draws the expander; it is
+    replaced with the real children on <<TreeviewOpen>>. A trailing
+    "more..." row loads the next page of a long child list when opened.
+    """
+
+    _PLACEHOLDER = '_placeholder'
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.browser = None
+        self._elements = {}     # iid -> element tuple
+        self._more = {}         # iid of a "more..." row -> (parent iid, parent element, resume pos)
+        self.tree = ttk.Treeview(self, columns=('value', 'offset'), selectmode='browse')
+        self.tree.heading('#0', text='Element')
+        self.tree.heading('value', text='Value')
+        self.tree.heading('offset', text='Offset')
+        self.tree.column('#0', width=220)
+        self.tree.column('value', width=320)
+        self.tree.column('offset', width=90, stretch=False, anchor='e')
+        self.tree.tag_configure('pinned', foreground='#1f5fbf')
+        self.tree.tag_configure('more', foreground='gray')
+        scrollbar = tk.Scrollbar(self, command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.config(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill='both', expand=True)
+        self.tree.bind('<<TreeviewOpen>>', self._on_open)
+
+    def load(self, path):
+        """Show path's top level and pinned elements. Raises ValueError/OSError."""
+        browser = MkvElementBrowser(path)
+        pins = browser.pinned()
+        roots = browser.roots()
+        if not roots or roots[0][0] != EBML_ID_HEADER:
+            raise ValueError('Not an EBML file')
+        self.browser = browser
+        self._elements.clear()
+        self._more.clear()
+        self.tree.delete(*self.tree.get_children())
+        for label, element, value in pins:
+            self._insert('', element, f'★ {label}', value, tags=('pinned',))
+        for element, (name, value) in zip(roots, browser.describe(roots)):
+            self._insert('', element, name, value)
+
+    def _insert(self, parent, element, text, value, tags=()):
+        iid = self.tree.insert(parent, tk.END, text=text, tags=tags,
+                               values=(value, f'{element[1]:,}'))
+        self._elements[iid] = element
+        if MkvElementBrowser.is_master(element) and element[3] > 0:
+            self.tree.insert(iid, tk.END, iid=iid + self._PLACEHOLDER, text='')
+        return iid
+
+    def _on_open(self, _event=None):
+        iid = self.tree.focus()
+        if iid in self._more:
+            parent, element, resume = self._more.pop(iid)
+            self.tree.delete(iid)
+            self._load_page(parent, element, resume)
+        elif self.tree.exists(iid + self._PLACEHOLDER):
+            self.tree.delete(iid + self._PLACEHOLDER)
+            self._load_page(iid, self._elements[iid], None)
+
+    def _load_page(self, parent, element, start):
+        try:
+            children, resume = self.browser.children(element, start)
+            described = self.browser.describe(children)
+        except (OSError, ValueError) as e:
+            self.tree.insert(parent, tk.END, text=f'[read error: {e}]')
+            return
+        for child, (name, value) in zip(children, described):
+            self._insert(parent, child, name, value)
+        if resume is not None:
+            more = self.tree.insert(parent, tk.END, text=f'more... (next {MKV_TREE_PAGE_SIZE})',
+                                    tags=('more',), values=('', f'{resume:,}'))
+            self.tree.insert(more, tk.END, text='')   # makes it openable
+            self._more[more] = (parent, element, resume)
+
+
+# ----------------------------------------------------------------------------
+# Tiered output verification.
+# ----------------------------------------------------------------------------
+# Confidence vs. throughput is a per-batch choice, so verification comes in
+# three levels:
+#
+#   quick    file size + parse the EBML header with read_mkv_summary() and
+#            check the Colour block / LUT attachment match what we asked
+#            mkvmerge to write. No subprocess, milliseconds per file.
+#   sampled  quick, then decode VERIFY_SAMPLE_COUNT randomly chosen GOP-sized
+#            windows with ffmpeg input seeking (-ss before -i), in parallel.
+#            A file without a Duration can't be sampled at random, so it
+#            gets the full decode instead (within the sampled budget); a
+#            file shorter than one window is decoded once, whole.
+#   full     quick, then stream-decode the whole file to the null muxer with
+#            ffmpeg's automatic (maximum) thread count.
+#
+# Every level has a wall-clock budget. Blowing the budget fails verification
+# rather than passing it — an unverified output must never get its original
+# trashed.
+# ----------------------------------------------------------------------------
+VERIFY_LEVELS = ['quick', 'sampled', 'full']
+VERIFY_LEVEL_OPTIONS = [
+    ('Quick - header & colour tags',     'quick'),
+    ('Sampled - decode random GOPs',     'sampled'),
+    ('Full - decode entire file',        'full'),
+]
+VERIFY_BUDGETS = {          # seconds
+    'quick': 5,
+    'sampled': 120,
+    'full': 4 * 60 * 60,
+}
+VERIFY_SAMPLE_COUNT = 6     # windows decoded by the 'sampled' level
+VERIFY_SAMPLE_SECONDS = 2.0 # roughly one GOP for typical camera footage
+
+# HDR_PRESETS keys whose values are stored as floats in the output and so
+# are compared numerically rather than as strings.
+_VERIFY_FLOAT_KEYS = ('chromaticity', 'white_point', 'max_luminance', 'min_luminance')
+
+
+def _hdr_values_match(key, expected, actual):
+    """Compare one requested HDR field with what read_mkv_summary() found."""
+    if key not in _VERIFY_FLOAT_KEYS:
+        try:
+            return int(expected) == int(actual)
+        except ValueError:
+            return expected == actual
+    try:
+        want = [float(v) for v in expected.split(',')]
+        got = [float(v) for v in actual.split(',')]
+    except ValueError:
+        return False
+    # Mastering values may be stored as 32-bit floats.
+    return len(want) == len(got) and all(
+        abs(w - g) <= max(1e-4, abs(w) * 1e-5) for w, g in zip(want, got))
+
+
+def _verify_quick(input_path, output_path, expected_hdr, expected_attachment):
+    """Size check + EBML header parse. Returns (ok, detail, summary)."""
+    if not os.path.exists(output_path):
+        return False, 'Output file does not exist', None
+    # The mux only adds container overhead and the LUT, so a smaller output
+    # means mkvmerge dropped data.
+    if input_path and os.path.exists(input_path):
+        if os.path.getsize(output_path) < os.path.getsize(input_path):
+            return False, 'Output is smaller than the input', None
+    try:
+        summary = read_mkv_summary(output_path)
+    except (OSError, ValueError) as e:
+        return False, f'Could not parse Matroska header: {e}', None
+    if not summary['has_clusters']:
+        return False, 'No media clusters found', summary
+
+    colour = summary['colour']
+    for key, expected in (expected_hdr or {}).items():
+        expected = (expected or '').strip()
+        if not expected:
+            continue
+        actual = colour.get(key)
+        if actual is None:
+            return False, f'Colour tag {key} missing (expected {expected})', summary
+        if not _hdr_values_match(key, expected, actual):
+            return False, f'Colour tag {key} is {actual}, expected {expected}', summary
+
+    if expected_attachment:
+        names = [name for name, _mime in summary['attachments']]
+        if os.path.basename(expected_attachment) not in names:
+            return False, 'LUT attachment missing', summary
+    return True, 'Header and colour tags OK', summary
+
+
+def _decode_window(ffmpeg, path, start, seconds, timeout):
+    """Decode [start, start + seconds) of the video track. Returns error text or ''."""
+    # -ss before -i seeks on the demuxer (keyframe-accurate, no decode of the
+    # skipped part), which is what makes sampling cheap on long files.
+    cmd = [ffmpeg, '-nostdin', '-v', 'error', '-ss', f'{start:.3f}', '-i', path,
+           '-t', f'{seconds:.3f}', '-map', '0:v:0', '-f', 'null', '-']
+    try:
+        result = subprocess.run(prioritized(cmd), capture_output=True, text=True,
+                                timeout=timeout, creationflags=child_creationflags())
+    except subprocess.TimeoutExpired:
+        return f'decode at {start:.1f}s timed out'
+    if result.returncode != 0 or result.stderr.strip():
+        first_line = (result.stderr.strip().splitlines() or ['exit %d' % result.returncode])[0]
+        return f'decode at {start:.1f}s: {first_line}'
+    return ''
+
+
+def _verify_sampled(output_path, duration, deadline, ffmpeg):
+    """Decode VERIFY_SAMPLE_COUNT random windows concurrently."""
+    span = max(duration - VERIFY_SAMPLE_SECONDS, 0.0)
+    if not span:
+        # Every window would start at 0 and decode the same frames.
+        starts = [0.0]
+    else:
+        starts = sorted(random.uniform(0.0, span) for _ in range(VERIFY_SAMPLE_COUNT))
+    remaining = max(deadline - time.monotonic(), 0.1)
+    # Each window is its own ffmpeg process, so a thread per window is all
+    # the parallelism we need on our side.
+    workers = max(1, min(len(starts), os.cpu_count() or 1))
+    pool = ThreadPoolExecutor(max_workers=workers, initializer=pin_analysis_thread)
+    try:
+        futures = [pool.submit(_decode_window, ffmpeg, output_path, s,
+                               VERIFY_SAMPLE_SECONDS, remaining)
+                   for s in starts]
+        done, not_done = futures_wait(futures, timeout=remaining)
+        if not_done:
+            return False, f'Budget exceeded with {len(not_done)} sample(s) pending'
+        errors = [f.result() for f in done if f.result()]
+        if errors:
+            return False, errors[0]
+        if len(starts) == 1:
+            return True, f'Whole {duration:.1f}s file decoded cleanly'
+        return True, f'{len(starts)} sampled GOPs decoded cleanly'
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _verify_full(output_path, deadline, ffmpeg):
+    """Decode every stream of the file to the null muxer."""
+    cmd = [ffmpeg, '-nostdin', '-v', 'error', '-threads', '0', '-i', output_path,
+           '-map', '0', '-f', 'null', '-']
+    try:
+        result = subprocess.run(prioritized(cmd), capture_output=True, text=True,
+                                timeout=max(deadline - time.monotonic(), 0.1),
+                                creationflags=child_creationflags())
+    except subprocess.TimeoutExpired:
+        return False, 'Budget exceeded during full decode'
+    if result.returncode != 0 or result.stderr.strip():
+        first_line = (result.stderr.strip().splitlines() or ['exit %d' % result.returncode])[0]
+        return False, f'Full decode failed: {first_line}'
+    return True, 'Full decode clean'
+
+
+def verify_output(input_path, output_path, level='quick', expected_hdr=None,
+                  expected_attachment=None, budget=None):
+    """Verify a muxed output at the requested level.
+
+    expected_hdr is an HDR_PRESETS-style dict of the values passed to
+    mkvmerge (blank entries are skipped); expected_attachment is the LUT
+    path that should show up as an attachment.
+
+    Returns a report dict: level (actually run), requested, ok, detail,
+    seconds, budget. The level can drop back to 'quick' when ffmpeg is not
+    installed — that is recorded in detail rather than silently passing.
+    """
+    if level not in VERIFY_LEVELS:
+        level = 'quick'
+    budget = VERIFY_BUDGETS[level] if budget is None else budget
+    started = time.monotonic()
+    deadline = started + budget
+    report = {'requested': level, 'level': level, 'budget': budget}
+
+    ok, detail, summary = _verify_quick(input_path, output_path,
+                                        expected_hdr, expected_attachment)
+    if ok and level != 'quick':
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            report['level'] = 'quick'
+            detail += f' (ffmpeg not found, {level} decode skipped)'
+        elif level == 'sampled' and summary['duration_s'] > 0:
+            ok, detail = _verify_sampled(output_path, summary['duration_s'], deadline, ffmpeg)
+        elif level == 'sampled':
+            report['level'] = 'full'
+            ok, detail = _verify_full(output_path, deadline, ffmpeg)
+            detail = f'Duration unknown, decoded in full instead of sampling: {detail}'
+        else:
+            ok, detail = _verify_full(output_path, deadline, ffmpeg)
+
+    report['seconds'] = time.monotonic() - started
+    if ok and report['seconds'] > budget:
+        ok, detail = False, f'Budget of {budget}s exceeded ({detail})'
+    report['ok'] = ok
+    report['detail'] = detail
+    METRICS.observe('hdr_verify_seconds', report['seconds'], level=report['level'])
+    return report
+
+# ----------------------------------------------------------------------------
+# Profiling mode.
+# ----------------------------------------------------------------------------
+# When the GUI feels sluggish or a worker's memory keeps growing, turn on
+# profiling (GUI checkbox or --profile DIR) and every probe and mux job
+# runs under cProfile and tracemalloc. Per job, PROFILE_DIR gets:
+#
+#   {stamp}_{seq}_{kind}_{name}.pstats      load with pstats / snakeviz
+#   {stamp}_{seq}_{kind}_{name}_alloc.txt   top allocation sites still held
+#                                           at the end of the job
+#
+# {seq} counts profiled jobs in this process, so two same-named clips
+# finishing in the same second don't overwrite each other's dumps.
+#
+# and a one-line summary is returned for the app to show: wall time, time
+# spent in Tk's update() (the GUI mux loop pumps events through
+# _log_output), peak traced memory, and the hottest function and
+# allocation site. Allocation sites are attributed to the nearest frame in
+# this file, so text buffered inside subprocess.py shows up at the
+# _run_mkvinfo line that kept it around.
+#
+# cProfile only sees the thread it's enabled on; pool threads a job hands
+# work to (sampled verify windows, segment parts) show up as waits. Only one
+# job is CPU-profiled at a time (newer Pythons allow a single profiler per
+# process); jobs overlapping it, like concurrent probes, get memory only.
+# tracemalloc is process-wide and stays on while any job is profiled. Its
+# peak is too: the peak is only reset when no other profiled job is
+# running, and a job that overlapped another reports its peak as shared
+# (the high-water mark of everything running alongside it, not its own).
+# ----------------------------------------------------------------------------
+PROFILE_DIR = 'profiles'
+PROFILE_TOP_N = 20
+PROFILE_TRACE_FRAMES = 16
+
+_profile_dir = None
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_active = set()
+_profile_seq = itertools.count(1)
+_cpu_profile_lock = threading.Lock()
+
+
+def set_profiling(directory):
+    """Profile jobs into directory from now on (None/'' turns profiling off)."""
+    global _profile_dir
+    _profile_dir = directory or None
+
+
+def profiling_enabled():
+    return _profile_dir is not None
+
+
+def _allocation_site(traceback_):
+    """'hdr_gui.py:123 (in subprocess.py)' for a tracemalloc traceback."""
+    innermost = traceback_[-1]
+    # Frames run oldest to most recent; walk back to the closest one in our
+    # own code.
+    for depth, frame in enumerate(reversed(traceback_)):
+        if os.path.abspath(frame.filename) == os.path.abspath(__file__):
+            site = f'{os.path.basename(frame.filename)}:{frame.lineno}'
+            return site if depth == 0 else f'{site} (in {os.path.basename(innermost.filename)})'
+    return f'{os.path.basename(innermost.filename)}:{innermost.lineno}'
+
+
+class JobProfiler:
+    """Context manager profiling one unit of work; summary is set on exit.
+
+    A no-op when profiling is off, so call sites can wrap unconditionally:
+
+        with JobProfiler('mux', input_path) as profiler:
+            ...
+        if profiler.summary: show(profiler.summary)
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = os.path.basename(name)
+        self.directory = _profile_dir
+        self.summary = None
+        self._active = False
+        self._profile = None
+        self._baseline = None
+        self._started = 0.0
+        self._seq = 0
+        self._peak_shared = False
+
+    def __enter__(self):
+        global _tracemalloc_users
+        if self.directory is None:
+            return self
+        with _tracemalloc_lock:
+            if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACE_FRAMES)
+            _tracemalloc_users += 1
+            self._seq = next(_profile_seq)
+            if _tracemalloc_active:
+                # Resetting would clobber the running jobs' peaks.
+                self._peak_shared = True
+                for other in _tracemalloc_active:
+                    other._peak_shared = True
+            else:
+                tracemalloc.reset_peak()
+            _tracemalloc_active.add(self)
+        self._baseline = tracemalloc.take_snapshot()
+        self._active = True
+        self._started = time.monotonic()
+        if _cpu_profile_lock.acquire(blocking=False):
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _tracemalloc_users
+        if not self._active:
+            return False
+        if self._profile is not None:
+            self._profile.disable()
+            _cpu_profile_lock.release()
+        seconds = time.monotonic() - self._started
+        snapshot = tracemalloc.take_snapshot()
+        with _tracemalloc_lock:
+            _current, peak = tracemalloc.get_traced_memory()
+            _tracemalloc_active.discard(self)
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+        try:
+            self.summary = self._write(seconds, peak, snapshot)
+        except OSError as e:
+            print(f'[JobProfiler.__exit__] Error writing profile: {str(e)}')
+        return False
+
+    def _write(self, seconds, peak, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', self.name)[:60]
+        base = os.path.join(self.directory,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}_{self._seq:04d}_{self.kind}_{safe_name}")
+        ui_seconds, hottest = 0.0, None
+        if self._profile is not None:
+            self._profile.dump_stats(f'{base}.pstats')
+            stats = pstats.Stats(self._profile)
+            # stats.stats: (file, line, func) -> (calls, ncalls, tottime, cumtime, callers)
+            ui_seconds = sum(entry[3] for (filename, _line, func), entry in stats.stats.items()
+                             if func == 'update' and 'tkinter' in filename)
+            hottest = max(((key, entry[2]) for key, entry in stats.stats.items()),
+                          key=lambda item: item[1], default=None)
+
+        # Several tracebacks usually share one site of ours; merge them.
+        sites = {}
+        for stat in snapshot.compare_to(self._baseline, 'traceback'):
+            site = sites.setdefault(_allocation_site(stat.traceback), [0, 0])
+            site[0] += stat.size_diff
+            site[1] += stat.count_diff
+        top = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:PROFILE_TOP_N]
+        shared = ' (shared with concurrent jobs)' if self._peak_shared else ''
+        lines = [f'{self.kind} {self.name}: {seconds:.2f}s, peak traced {peak / 1024 ** 2:.1f} MiB{shared}',
+                 'Top allocation sites still held at job end:']
+        for site, (size, count) in top:
+            lines.append(f'  {size / 1024:+10.1f} KiB  {count:+7d} blocks  {site}')
+        with open(f'{base}_alloc.txt', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        summary = {'kind': self.kind, 'name': self.name, 'seconds': seconds,
+                   'ui_seconds': ui_seconds, 'peak_bytes': peak,
+                   'peak_shared': self._peak_shared,
+                   'pstats': f'{base}.pstats' if self._profile is not None else '',
+                   'alloc': f'{base}_alloc.txt',
+                   'hottest': '', 'top_alloc': ''}
+        if hottest:
+            (filename, line, func), tottime = hottest
+            summary['hottest'] = f'{func} ({os.path.basename(filename)}:{line}) {tottime:.2f}s'
+        if top:
+            summary['top_alloc'] = f'{top[0][0]} {top[0][1][0] / 1024:+.0f} KiB'
+        return summary
+
+
+def format_profile_summary(summary):
+    """One log line for a JobProfiler summary."""
+    text = (f"[profile] {summary['kind']} {summary['name']}: {summary['seconds']:.2f}s"
+            f", Tk update {summary['ui_seconds']:.2f}s"
+            f", peak {summary['peak_bytes'] / 1024 ** 2:.1f} MiB")
+    if summary.get('peak_shared'):
+        text += ' (shared with concurrent jobs)'
+    if summary['hottest']:
+        text += f"; hottest {summary['hottest']}"
+    if summary['top_alloc']:
+        text += f"; top held {summary['top_alloc']}"
+    return text
+
+
+# ----------------------------------------------------------------------------
+# Pipeline stage hooks (plugins).
+# ----------------------------------------------------------------------------
+# Shop-specific steps (rename by camera metadata, sidecar JSON, archive
+# copies) hook into run_mux_job() instead of wrapping the GUI, so they run
+# wherever the mux runs: the GUI, every headless worker, every machine.
+#
+#   pre_probe      before anything reads the input; may rewrite the spec
+#                  (e.g. move/rename the input)
+#   pre_mux        spec validated, just before the muxer starts; may
+#                  rewrite the spec (e.g. output_prefix)
+#   post_verify    output written and verified (context has 'report')
+#   post_finalize  job result is final (context has 'result'); runs on a
+#                  small background pool so the next mux doesn't wait
+#
+# A hook is hook(context) -> None or a dict of spec updates (pre_* stages
+# only). context = {'stage', 'spec', 'output', 'log'} plus 'report' /
+# 'result' where noted. Each call runs on its own thread, timed, limited to
+# its timeout and isolated: an exception or overrun is recorded in the
+# job's metrics['hooks'] and the event log. context['log'] is safe to call
+# from the hook's thread; lines are queued and handed to the job's log by
+# the calling thread once the hook returns (the GUI's log touches Tk).
+#
+# A hook that overruns keeps running in its thread; Python can't kill it,
+# only stop waiting for it. An exception, or an overrun in a post_* hook,
+# is logged and the job carries on. An overrun in a pre_* hook fails the
+# job: the hook may still be moving or rewriting the input, so nothing
+# muxes it until the hook is fixed or given a longer timeout.
+#
+# Plugins are .py files in PLUGIN_DIR that define register(register_hook);
+# the GUI, --serve and --worker all load them at start-up and log each file
+# they executed. PLUGIN_DIR sits next to this script, not in the current
+# directory, so starting the app from some other folder never runs code
+# from that folder's hdr_plugins; --plugin-dir points elsewhere explicitly.
+# ----------------------------------------------------------------------------
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hdr_plugins')
+HOOK_STAGES = ('pre_probe', 'pre_mux', 'post_verify', 'post_finalize')
+HOOK_DEFAULT_TIMEOUT = 60
+HOOK_FINALIZE_WORKERS = 2
+
+_hooks = {stage: [] for stage in HOOK_STAGES}   # stage -> [(name, func, timeout)]
+_hooks_lock = threading.Lock()
+_finalize_pool = None
+
+
+def register_hook(stage, func=None, name=None, timeout=HOOK_DEFAULT_TIMEOUT):
+    """Register func for stage; usable directly or as @register_hook('pre_mux')."""
+    if stage not in HOOK_STAGES:
+        raise ValueError(f'Unknown hook stage {stage!r} (expected one of {", ".join(HOOK_STAGES)})')
+    if func is None:
+        return lambda f: register_hook(stage, f, name, timeout)
+    with _hooks_lock:
+        _hooks[stage].append((name or getattr(func, '__name__', repr(func)), func, timeout))
+    return func
+
+
+def clear_hooks():
+    """Drop every registered hook (plugins are reloaded from scratch)."""
+    with _hooks_lock:
+        for stage in HOOK_STAGES:
+            _hooks[stage] = []
+
+
+def load_plugins(plugin_dir=PLUGIN_DIR):
+    """Import every plugin in plugin_dir and let it register its hooks.
+
+    Returns (absolute paths of the loaded plugin files, [error messages]).
+    A broken plugin is reported and skipped; it never stops the others
+    from loading.
+    """
+    loaded, errors = [], []
+    if not plugin_dir or not os.path.isdir(plugin_dir):
+        return loaded, errors
+    plugin_dir = os.path.abspath(plugin_dir)
+    for filename in sorted(os.listdir(plugin_dir)):
+        if not filename.endswith('.py') or filename.startswith('_'):
+            continue
+        name = filename[:-3]
+        path = os.path.join(plugin_dir, filename)
+        try:
+            module_spec = importlib.util.spec_from_file_location(f'hdr_plugin_{name}', path)
+            module = importlib.util.module_from_spec(module_spec)
+            module_spec.loader.exec_module(module)
+            # Plugins get register_hook passed in rather than importing this
+            # file, which runs as __main__ and would otherwise load twice.
+            module.register(register_hook)
+            loaded.append(path)
+        except Exception as e:
+            errors.append(f'{filename}: {e}')
+    return loaded, errors
+
+
+def run_hooks(stage, spec, log=None, **context):
+    """Run stage's hooks in order. Returns (spec, [per-hook records]).
+
+    pre_* hooks see the spec as updated by the hooks before them. Records
+    are {'stage', 'hook', 'seconds', 'ok', 'timed_out', 'detail'}. Lines a
+    hook logs are passed to log on this thread, after the hook returns.
+    """
+    with _hooks_lock:
+        hooks = list(_hooks[stage])
+    records = []
+    log = log or (lambda _line: None)
+    lines = queue.SimpleQueue()
+
+    def drain():
+        while True:
+            try:
+                log(lines.get_nowait())
+            except queue.Empty:
+                return
+
+    for name, func, timeout in hooks:
+        ctx = dict(context, stage=stage, spec=dict(spec), log=lines.put,
+                   output=output_path_for(spec['input'], spec['output_prefix']))
+        outcome = {}
+
+        def call(func=func, ctx=ctx, outcome=outcome):
+            try:
+                outcome['value'] = func(ctx)
+            except Exception as e:
+                outcome['error'] = f'{type(e).__name__}: {e}'
+
+        started = time.monotonic()
+        thread = threading.Thread(target=call, name=f'hook-{stage}-{name}', daemon=True)
+        thread.start()
+        thread.join(timeout)
+        seconds = time.monotonic() - started
+        drain()
+        timed_out = thread.is_alive()
+        if timed_out:
+            detail = f'timed out after {timeout}s'
+        elif 'error' in outcome:
+            detail = outcome['error']
+        else:
+            detail = ''
+            updates = outcome.get('value')
+            if stage.startswith('pre_') and isinstance(updates, dict):
+                spec = dict(spec, **updates)
+        record = {'stage': stage, 'hook': name, 'seconds': seconds, 'ok': not detail,
+                  'timed_out': timed_out, 'detail': detail}
+        records.append(record)
+        METRICS.observe('hdr_hook_seconds', seconds, stage=stage)
+        EVENT_LOG.emit('hook', input=spec['input'], **record)
+        if detail:
+            METRICS.inc('hdr_failures_total', stage='hook')
+            log(f"Hook {stage}/{name} failed: {detail}")
+    # Whatever an overrunning hook logged while we waited on the ones after it.
+    drain()
+    return spec, records
+
+
+def _finalize_hooks_async(spec, result):
+    """Queue post_finalize hooks on the background pool; returns the future or None."""
+    global _finalize_pool
+    with _hooks_lock:
+        if not _hooks['post_finalize']:
+            return None
+        if _finalize_pool is None:
+            _finalize_pool = ThreadPoolExecutor(max_workers=HOOK_FINALIZE_WORKERS,
+                                                thread_name_prefix='hook-finalize')
+    return _finalize_pool.submit(run_hooks, 'post_finalize', spec, result=result)
+
+
+def wait_for_hooks():
+    """Block until queued post_finalize hooks have finished (call before exit)."""
+    global _finalize_pool
+    with _hooks_lock:
+        pool, _finalize_pool = _finalize_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+# ----------------------------------------------------------------------------
+# Mux engine.
+# ----------------------------------------------------------------------------
+# Everything needed to turn one job spec into a verified, tagged MKV, with no
+# Tk state involved so the same code runs in the GUI, in headless workers
+# and on other machines. A job spec is a plain JSON-able dict:
+#
+#   input          source clip path (must be reachable from the worker)
+#   lut            .cube file to attach
+#   hdr            HDR_PRESETS-style dict, or None to skip HDR tagging
+#   output_prefix  appended to the input stem -> {stem}{prefix}.mkv
+#   verify_level   one of VERIFY_LEVELS
+#   backend        'mkvmerge' (default) or 'native' (see MUX_BACKENDS)
+# ----------------------------------------------------------------------------
+MKVMERGE_PROGRESS_RE = re.compile(r'Progress: (\d+)%')
+
+
+def default_mkvmerge_path():
+    """Determine mkvmerge path based on platform"""
+    system = platform.system()
+    if system == "Windows":
+        if platform.machine().endswith('64'):
+            return "./windows/64bits/mkvmerge.exe"
+        else:
+            return "./windows/32bits/mkvmerge.exe"
+    else:  # MacOS or Linux
+        return "./macos/mkvmerge.app/Contents/MacOS/mkvmerge"
+
+
+def default_mkvinfo_path():
+    """Determine mkvinfo path based on platform"""
+    system = platform.system()
+    if system == "Windows":
+        if platform.machine().endswith('64'):
+            return "./windows/64bits/mkvinfo.exe"
+        else:
+            return "./windows/32bits/mkvinfo.exe"
+    else:  # MacOS or Linux
+        return "./macos/mkvinfo.app/Contents/MacOS/mkvinfo"
+
+
+def build_hdr_flags(values):
+    """The mkvmerge HDR/colour flag list for an HDR_PRESETS-style dict.
+
+    Returns a flat list of CLI args. Each flag is only included when the
+    corresponding field is non-empty, so HLG users (who leave the
+    mastering-display fields blank) don't end up with bogus zero-valued
+    metadata in their output.
+
+    All flags target track ID 0 because the source mov/mp4 has the video
+    as its first track (confirmed via the user's mkvinfo dumps). The work
+    is done once per distinct value set by compile_hdr_profile(), which
+    raises HDRProfileError for malformed fields.
+    """
+    return list(compile_hdr_profile(values).flags)
+
+
+def output_path_for(input_path, output_prefix):
+    """{stem}{output_prefix}.mkv next to the input."""
+    return str(Path(input_path).parent / f"{Path(input_path).stem}{output_prefix}.mkv")
+
+
+def build_mux_command(mkvmerge_path, input_path, output_path, lut_path, hdr_flags):
+    """The full mkvmerge argv for one job.
+
+    mkvmerge applies --colour-* / --max-* / --chromaticity-coordinates /
+    --white-colour-coordinates / --max-luminance / --min-luminance to the
+    NEXT input file's tracks, so the HDR flags are inserted immediately
+    before the input path.
+    """
+    return [
+        mkvmerge_path,
+        '-o', output_path,
+        '--attachment-mime-type', 'application/x-cube',
+        '--attach-file', lut_path,
+    ] + hdr_flags + [
+        input_path
+    ]
+
+
+def run_mkvmerge(cmd, on_line=None):
+    """Run mkvmerge, streaming each output line to on_line. Returns the exit code."""
+    process = subprocess.Popen(prioritized(cmd), stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True,
+                               creationflags=child_creationflags())
+    # Read output in real-time
+    for line in process.stdout:
+        line = line.strip()
+        if line and on_line:
+            on_line(line)
+    return process.wait()
+
+
+def run_mux_job(spec, mkvmerge_path=None, on_line=None):
+    """Mux + verify one job spec (see the section comment).
+
+    on_line receives human-readable progress lines (mkvmerge's own output
+    included). Returns {'ok', 'output', 'detail', 'metrics'} where metrics
+    holds bytes in/out, mux time and throughput, and the verify report.
+
+    spec['backend'] == 'native' selects the in-process remuxer
+    (run_native_mux_job); otherwise inputs at or above
+    spec['segment_threshold_bytes'] (when set) go through
+    run_segmented_mux_job() instead of a single mkvmerge pass.
+
+    Registered pipeline hooks (see run_hooks) run around the mux; their
+    timings land in metrics['hooks'], and result['input'] is the input
+    after any pre_* hook rewrote it. A pre_* hook that times out fails the
+    job before anything reads the input.
+    """
+    def fail(detail):
+        result = _fail_mux_job(spec['input'], output_path_for(spec['input'], spec['output_prefix']),
+                               detail, {'hooks': hook_records})
+        result['input'] = spec['input']
+        return result
+
+    def overrun(records):
+        late = next((r for r in records if r['timed_out']), None)
+        return late and f"Hook {late['stage']}/{late['hook']} {late['detail']} and may still be running"
+
+    spec, hook_records = run_hooks('pre_probe', spec, on_line)
+    stalled = overrun(hook_records)
+    if stalled:
+        return fail(stalled)
+    if spec.get('hdr'):
+        # Reject malformed tags before any process (or part) is started.
+        try:
+            compile_hdr_profile(spec['hdr'])
+        except HDRProfileError as e:
+            return fail(f'Invalid HDR profile: {e}')
+    spec, records = run_hooks('pre_mux', spec, on_line)
+    hook_records += records
+    stalled = overrun(records)
+    if stalled:
+        return fail(stalled)
+    if spec.get('backend') == 'native':
+        result = run_native_mux_job(spec, on_line)
+    else:
+        threshold = spec.get('segment_threshold_bytes') or 0
+        if threshold and os.path.exists(spec['input']) and os.path.getsize(spec['input']) >= threshold:
+            result = run_segmented_mux_job(spec, mkvmerge_path, on_line)
+        else:
+            result = run_single_pass_mux_job(spec, mkvmerge_path, on_line)
+    result['input'] = spec['input']
+    result['metrics']['hooks'] = hook_records + result['metrics'].get('hooks', [])
+    _finalize_hooks_async(spec, result)
+    return result
+
+
+def run_single_pass_mux_job(spec, mkvmerge_path=None, on_line=None):
+    """The classic path: one mkvmerge process for the whole input."""
+    mkvmerge_path = mkvmerge_path or default_mkvmerge_path()
+    log = on_line or (lambda _line: None)
+    input_path = spec['input']
+    output_path = output_path_for(input_path, spec['output_prefix'])
+    hdr = spec.get('hdr')
+    cmd = build_mux_command(mkvmerge_path, input_path, output_path, spec['lut'],
+                            build_hdr_flags(hdr) if hdr else [])
+
+    log("Starting video processing...")
+    log(f"Command: {' '.join(cmd)}\n")
+    EVENT_LOG.emit('job_start', input=input_path, output=output_path,
+                   verify_level=spec.get('verify_level', 'quick'), hdr=hdr)
+    started = time.monotonic()
+    try:
+        returncode = run_mkvmerge(cmd, log)
+    except OSError as e:
+        _fail_mux_job(input_path, output_path, str(e))
+        raise
+    metrics = _mux_metrics(input_path, output_path, time.monotonic() - started)
+    if returncode != 0:
+        return _fail_mux_job(input_path, output_path, 'mkvmerge failed', metrics,
+                             f'mkvmerge exit {returncode}')
+    return _finish_mux_job(spec, output_path, metrics, log)
+
+
+def _mux_metrics(input_path, output_path, mux_seconds, **extra):
+    """Size/throughput metrics for a finished mux, also fed into METRICS."""
+    bytes_in = os.path.getsize(input_path) if os.path.exists(input_path) else 0
+    bytes_out = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    metrics = {
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'mux_seconds': mux_seconds,
+        'mux_mb_per_s': bytes_in / (1024 * 1024) / mux_seconds if mux_seconds > 0 else 0.0,
+    }
+    metrics.update(extra)
+    METRICS.observe('hdr_mux_seconds', mux_seconds)
+    METRICS.observe('hdr_mux_throughput_mb_per_s', metrics['mux_mb_per_s'])
+    METRICS.inc('hdr_bytes_in_total', bytes_in)
+    METRICS.inc('hdr_bytes_out_total', bytes_out)
+    return metrics
+
+
+def _fail_mux_job(input_path, output_path, detail, metrics=None, log_detail=None):
+    """Record a failed mux and build its result dict."""
+    metrics = metrics or {}
+    METRICS.inc('hdr_failures_total', stage='mux')
+    METRICS.inc('hdr_jobs_total', result='failed')
+    EVENT_LOG.emit('job_end', input=input_path, output=output_path, ok=False,
+                   stage='mux', detail=log_detail or detail, **metrics)
+    return {'ok': False, 'output': output_path, 'detail': detail, 'metrics': metrics}
+
+
+def _finish_mux_job(spec, output_path, metrics, log):
+    """Verify a muxed output at the spec's level and build the result dict."""
+    input_path = spec['input']
+    hdr = spec.get('hdr')
+    # Only check tags we actually asked mkvmerge to write.
+    level = spec.get('verify_level', 'quick')
+    log(f"\nVerifying output ({level})...")
+    report = verify_output(input_path, output_path, level,
+                           expected_hdr=hdr, expected_attachment=spec['lut'])
+    metrics['verify'] = report
+    if report['ok']:
+        _spec, metrics['hooks'] = run_hooks('post_verify', spec, log, report=report)
+    else:
+        METRICS.inc('hdr_failures_total', stage='verify')
+    METRICS.inc('hdr_jobs_total', result='ok' if report['ok'] else 'failed')
+    EVENT_LOG.emit('job_end', input=input_path, output=output_path, ok=report['ok'],
+                   stage='verify', detail=report['detail'], **metrics)
+    log(f"Verification [{report['level']}] "
+        f"{'passed' if report['ok'] else 'FAILED'} in "
+        f"{report['seconds']:.2f}s: {report['detail']}")
+    return {'ok': report['ok'], 'output': output_path,
+            'detail': 'OK' if report['ok'] else 'Output file verification failed',
+            'metrics': metrics}
+
+
+# ----------------------------------------------------------------------------
+# Parallel segmented muxing for very large single recordings.
+# ----------------------------------------------------------------------------
+# A multi-hour 100+ GB recording is one serial mkvmerge pass. In segmented
+# mode the recording is cut into SEGMENT_COUNT time ranges at keyframes,
+# each range is muxed + HDR-tagged by its own mkvmerge (--split parts:S-E)
+# concurrently, and the parts are then appended losslessly ("a + b + c")
+# into the final file with the HDR flags and the LUT attachment.
+#
+# Boundaries are placed on real keyframes read straight out of the MP4
+# sample tables, at their presentation times (stts + ctts, edit list
+# applied) so neighbouring parts meet exactly where mkvmerge cuts. For
+# inputs we can't index, evenly spaced times are used and mkvmerge snaps
+# both sides of each cut to the same keyframe.
+# ----------------------------------------------------------------------------
+SEGMENT_DEFAULT_THRESHOLD_GB = 0         # 0 = segmented mode off
+SEGMENT_MAX_PARALLEL = max(2, min(8, (os.cpu_count() or 2) // 2))
+
+
+def _iter_mp4_boxes(buf, start, end):
+    """Yield (box_type, payload_start, box_end) for ISO-BMFF boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size = int.from_bytes(buf[pos:pos + 4], 'big')
+        kind = bytes(buf[pos + 4:pos + 8])
+        header = 8
+        if size == 1:
+            size = int.from_bytes(buf[pos + 8:pos + 16], 'big')
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _mp4_child(buf, start, end, *path):
+    """Payload (start, end) of the first box at path under buf[start:end], or None."""
+    for name in path:
+        for kind, payload, box_end in _iter_mp4_boxes(buf, start, end):
+            if kind == name:
+                start, end = payload, box_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def mp4_keyframe_times(path):
+    """Return (keyframe_seconds, duration_seconds) of the first video track.
+
+    Keyframe times are presentation times (decode time + ctts offset - the
+    edit list's start), the timeline mkvmerge's --split parts: works in, so
+    a cut lands on the keyframe it names even with B-frame reordering.
+    Returns (None, 0.0) when the file isn't an indexable MP4/MOV.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None, 0.0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            moov = _find_mp4_box(buf, b'moov')
+            if not moov:
+                return None, 0.0
+            for kind, tstart, tend in _iter_mp4_boxes(buf, *moov):
+                if kind != b'trak':
+                    continue
+                hdlr = _mp4_child(buf, tstart, tend, b'mdia', b'hdlr')
+                if not hdlr or bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) != b'vide':
+                    continue
+                mdhd = _mp4_child(buf, tstart, tend, b'mdia', b'mdhd')
+                stbl = _mp4_child(buf, tstart, tend, b'mdia', b'minf', b'stbl')
+                if not mdhd or not stbl or not _mp4_child(buf, *stbl, b'stts'):
+                    continue
+                version = buf[mdhd[0]]
+                timescale = _be(buf, mdhd[0] + (20 if version == 1 else 12), 4) or 1
+                # No stss box means every sample is a sync sample (intra-only
+                # codecs like ProRes); the table reader handles that too.
+                table = _read_mp4_sample_table(buf, stbl, timescale, _mp4_edit_start(buf, tstart, tend))
+                pts, sync = table['pts'], table['sync']
+                times = sorted(pts[i] / timescale for i in range(len(pts)) if sync[i])
+                return times, table['end_ticks'] / timescale
+    return None, 0.0
+
+
+def plan_segments(input_path, count):
+    """Split input_path into up to count keyframe-aligned (start, end) ranges.
+
+    end is None for the final range (runs to the end of the file).
+    Returns [] when the input can't be planned (unknown duration).
+    """
+    keyframes, duration = None, 0.0
+    try:
+        keyframes, duration = mp4_keyframe_times(input_path)
+        if keyframes is None and input_path.lower().endswith(MKV_EXTENSIONS):
+            duration = read_mkv_summary(input_path)['duration_s']
+    except (OSError, ValueError):
+        return []
+    if duration <= 0 or count < 2:
+        return []
+
+    boundaries = []
+    previous = 0.0
+    for i in range(1, count):
+        target = duration * i / count
+        if keyframes:
+            # First keyframe at or after the target that still moves us
+            # forward; bisect keeps this O(log n) on 100k-keyframe files.
+            index = bisect.bisect_left(keyframes, target)
+            if index >= len(keyframes):
+                break
+            target = keyframes[index]
+        if target > previous:
+            boundaries.append(target)
+            previous = target
+    starts = [0.0] + boundaries
+    ends = boundaries + [None]
+    return list(zip(starts, ends))
+
+
+def _mkvmerge_timestamp(seconds):
+    """HH:MM:SS.nnnnnnnnn as accepted by --split parts:"""
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{secs:012.9f}'
+
+
+def run_segmented_mux_job(spec, mkvmerge_path=None, on_line=None, segments=None):
+    """Segmented variant of run_mux_job(): same spec in, same result shape out.
+
+    segments overrides the planned range count (defaults to spec['segments']
+    or SEGMENT_MAX_PARALLEL). Falls back to run_mux_job() when the input
+    can't be planned into more than one range. Must be called from a single
+    thread; on_line is only invoked from that thread.
+    """
+    mkvmerge_path = mkvmerge_path or default_mkvmerge_path()
+    log = on_line or (lambda _line: None)
+    input_path = spec['input']
+    output_path = output_path_for(input_path, spec['output_prefix'])
+    hdr = spec.get('hdr')
+    hdr_flags = build_hdr_flags(hdr) if hdr else []
+    count = segments or spec.get('segments') or SEGMENT_MAX_PARALLEL
+
+    ranges = plan_segments(input_path, count)
+    if len(ranges) < 2:
+        log("Segmented mux: could not plan segments, falling back to a single pass")
+        return run_single_pass_mux_job(spec, mkvmerge_path, on_line)
+
+    EVENT_LOG.emit('job_start', input=input_path, output=output_path, segments=len(ranges),
+                   verify_level=spec.get('verify_level', 'quick'), hdr=hdr)
+    log(f"Segmented mux: {len(ranges)} parts, up to {SEGMENT_MAX_PARALLEL} in parallel")
+    # Parts live next to the output so the join never crosses volumes.
+    work_dir = tempfile.mkdtemp(prefix='.segments_', dir=os.path.dirname(output_path) or '.')
+    started = time.monotonic()
+    try:
+        def mux_part(index, start, end):
+            split = f"{_mkvmerge_timestamp(start)}-{_mkvmerge_timestamp(end) if end is not None else ''}"
+            pattern = os.path.join(work_dir, f'part{index:04d}_%02d.mkv')
+            lines = []
+            cmd = [mkvmerge_path, '-o', pattern, '--split', f'parts:{split}'] + hdr_flags + [input_path]
+            returncode = run_mkvmerge(cmd, lines.append)
+            produced = sorted(n for n in os.listdir(work_dir) if n.startswith(f'part{index:04d}_'))
+            if returncode != 0 or len(produced) != 1:
+                raise RuntimeError(f"part {index + 1} failed: {(lines or ['no output'])[-1]}")
+            return os.path.join(work_dir, produced[0])
+
+        parts = [None] * len(ranges)
+        with ThreadPoolExecutor(max_workers=SEGMENT_MAX_PARALLEL) as pool:
+            futures = {pool.submit(mux_part, i, s, e): i for i, (s, e) in enumerate(ranges)}
+            for future in as_completed(futures):
+                index = futures[future]
+                parts[index] = future.result()
+                log(f"  part {index + 1}/{len(ranges)} done")
+        segment_seconds = time.monotonic() - started
+
+        # Lossless append: "first + second + ...". Track properties come from
+        # the first part, but the HDR flags are repeated so the final Colour
+        # block never depends on that.
+        join_started = time.monotonic()
+        cmd = [mkvmerge_path, '-o', output_path,
+               '--attachment-mime-type', 'application/x-cube',
+               '--attach-file', spec['lut']] + hdr_flags + [parts[0]]
+        for part in parts[1:]:
+            cmd += ['+', part]
+        log(f"Joining: {' '.join(cmd)}\n")
+        returncode = run_mkvmerge(cmd, log)
+        join_seconds = time.monotonic() - join_started
+    except (RuntimeError, OSError) as e:
+        return _fail_mux_job(input_path, output_path, f'Segmented mux failed: {e}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    metrics = _mux_metrics(input_path, output_path, time.monotonic() - started,
+                           segments=len(ranges), segment_seconds=segment_seconds,
+                           join_seconds=join_seconds)
+    if returncode != 0:
+        return _fail_mux_job(input_path, output_path, 'mkvmerge join failed', metrics,
+                             f'mkvmerge join exit {returncode}')
+    return _finish_mux_job(spec, output_path, metrics, log)
+
+
+# ----------------------------------------------------------------------------
+# Native MP4 -> Matroska remuxer.
+# ----------------------------------------------------------------------------
+# A pure-Python alternative to the bundled mkvmerge binaries (which only
+# exist for macOS / Windows, and cost a process start per file). It walks
+# the MP4 sample tables (stsz / stco|co64 / stsc / stts / ctts / stss /
+# elst), then streams every sample into Matroska SimpleBlocks in timestamp
+# order. Each sample is read with readinto() into one reused buffer and
+# written straight through a large buffered writer, so memory stays flat
+# regardless of clip length.
+#
+# The output mirrors what mkvmerge writes for our jobs: 1 ms timestamp
+# scale, keyframe-started clusters of at most NATIVE_CLUSTER_MAX_MS /
+# NATIVE_CLUSTER_MAX_BYTES, Cues on video keyframes, a SeekHead, the
+# Colour / MasteringMetadata block on the first video track (mkvmerge's
+# track "0:") and the .cube as an application/x-cube attachment.
+#
+# Supported codecs: H.264, HEVC, ProRes video; AAC and PCM audio. PCM is
+# written one block per MP4 chunk, sized from the sample entry's frame size
+# (stsz is often a placeholder 1 for QuickTime PCM). Anything else raises
+# ValueError so the job fails loudly instead of producing a file mkvmerge
+# would have written differently.
+# ----------------------------------------------------------------------------
+NATIVE_READ_BUFFER = 8 * 1024 * 1024
+NATIVE_WRITE_BUFFER = 8 * 1024 * 1024
+NATIVE_CLUSTER_MAX_MS = 5000
+NATIVE_CLUSTER_MAX_BYTES = 5 * 1024 * 1024
+NATIVE_SEEKHEAD_RESERVE = 160   # bytes kept free after the Segment header
+
+MUX_BACKENDS = ['mkvmerge', 'native']
+MUX_BACKEND_OPTIONS = [
+    ('mkvmerge (bundled)',      'mkvmerge'),
+    ('Built-in Python remuxer', 'native'),
+]
+
+# Additional Matroska IDs used only by the writer (reader IDs are above).
+EBML_ID_VERSION = 0x4286
+EBML_ID_READ_VERSION = 0x42F7
+EBML_ID_MAX_ID_LENGTH = 0x42F2
+EBML_ID_MAX_SIZE_LENGTH = 0x42F3
+EBML_ID_DOCTYPE_VERSION = 0x4287
+EBML_ID_DOCTYPE_READ_VERSION = 0x4285
+EBML_ID_VOID = 0xEC
+MKV_ID_SEGMENT_UID = 0x73A4
+MKV_ID_MUXING_APP = 0x4D80
+MKV_ID_WRITING_APP = 0x5741
+MKV_ID_TRACK_NUMBER = 0xD7
+MKV_ID_TRACK_UID = 0x73C5
+MKV_ID_FLAG_LACING = 0x9C
+MKV_ID_LANGUAGE = 0x22B59C
+MKV_ID_CODEC_ID = 0x86
+MKV_ID_CODEC_PRIVATE = 0x63A2
+MKV_ID_DEFAULT_DURATION = 0x23E383
+MKV_ID_PIXEL_WIDTH = 0xB0
+MKV_ID_PIXEL_HEIGHT = 0xBA
+MKV_ID_AUDIO = 0xE1
+MKV_ID_SAMPLING_FREQUENCY = 0xB5
+MKV_ID_CHANNELS = 0x9F
+MKV_ID_BIT_DEPTH = 0x6264
+MKV_ID_FILE_DATA = 0x465C
+MKV_ID_FILE_UID = 0x46AE
+MKV_ID_CLUSTER_TIMESTAMP = 0xE7
+MKV_ID_SIMPLE_BLOCK = 0xA3
+MKV_ID_CUES = 0x1C53BB6B
+MKV_ID_CUE_POINT = 0xBB
+MKV_ID_CUE_TIME = 0xB3
+MKV_ID_CUE_TRACK_POSITIONS = 0xB7
+MKV_ID_CUE_TRACK = 0xF7
+MKV_ID_CUE_CLUSTER_POSITION = 0xF1
+
+# MP4 sample-entry fourcc -> (Matroska CodecID, config box holding CodecPrivate)
+_MP4_VIDEO_CODECS = {
+    b'avc1': ('V_MPEG4/ISO/AVC', b'avcC'),
+    b'avc3': ('V_MPEG4/ISO/AVC', b'avcC'),
+    b'hvc1': ('V_MPEGH/ISO/HEVC', b'hvcC'),
+    b'hev1': ('V_MPEGH/ISO/HEVC', b'hvcC'),
+    b'apch': ('V_PRORES', None), b'apcn': ('V_PRORES', None),
+    b'apcs': ('V_PRORES', None), b'apco': ('V_PRORES', None),
+    b'ap4h': ('V_PRORES', None), b'ap4x': ('V_PRORES', None),
+}
+# PCM sample-entry fourcc -> default byte order (True = big-endian). 'lpcm'
+# states its order in the v2 format flags; in24 may flip it with wave/enda.
+_MP4_PCM_CODECS = {b'sowt': False, b'twos': True, b'lpcm': True, b'in24': True}
+
+
+def _be(buf, pos, size):
+    return int.from_bytes(buf[pos:pos + size], 'big')
+
+
+def _mp4_descriptor(buf, pos):
+    """Return (tag, payload_start, payload_end) of an MPEG-4 descriptor."""
+    tag = buf[pos]
+    pos += 1
+    size = 0
+    for _ in range(4):
+        b = buf[pos]
+        pos += 1
+        size = (size << 7) | (b & 0x7F)
+        if not b & 0x80:
+            break
+    return tag, pos, pos + size
+
+
+def _aac_config_from_esds(buf, start, end):
+    """AudioSpecificConfig bytes from an esds box payload (after version/flags)."""
+    tag, pos, _end = _mp4_descriptor(buf, start + 4)
+    if tag != 0x03:
+        return b''
+    flags = buf[pos + 2]
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += 1 + buf[pos]
+    if flags & 0x20:
+        pos += 2
+    tag, pos, _end = _mp4_descriptor(buf, pos)
+    if tag != 0x04:
+        return b''
+    tag, pos, dsi_end = _mp4_descriptor(buf, pos + 13)
+    return bytes(buf[pos:dsi_end]) if tag == 0x05 else b''
+
+
+def _mp4_edit_start(buf, tstart, tend):
+    """Media time (track ticks) where presentation starts: the first non-empty edit."""
+    elst = _mp4_child(buf, tstart, tend, b'edts', b'elst')
+    if not elst:
+        return 0
+    version = buf[elst[0]]
+    pos = elst[0] + 8
+    for _ in range(_be(buf, elst[0] + 4, 4)):
+        if version == 1:
+            media_time = int.from_bytes(buf[pos + 8:pos + 16], 'big', signed=True)
+            pos += 20
+        else:
+            media_time = int.from_bytes(buf[pos + 4:pos + 8], 'big', signed=True)
+            pos += 12
+        if media_time != -1:
+            return media_time
+    return 0
+
+
+def _read_mp4_sample_table(buf, stbl, timescale, media_time, frame_size=0):
+    """Expand stbl into per-sample arrays: offsets, sizes, dts, pts (ticks) and sync flags.
+
+    frame_size is set for PCM tracks, where every stsz "sample" is one audio
+    frame (QuickTime often just writes a constant size of 1 there). Those
+    frames are sized from frame_size instead and merged into one entry per
+    chunk so the muxer writes a block per chunk rather than per frame.
+    """
+    def box(name):
+        return _mp4_child(buf, *stbl, name)
+
+    stsz = box(b'stsz')
+    if not stsz:
+        raise ValueError('Unsupported MP4: no stsz box (compact stz2 sample sizes)')
+    constant = _be(buf, stsz[0] + 4, 4)
+    count = _be(buf, stsz[0] + 8, 4)
+    if frame_size:
+        sizes = array.array('I', [frame_size]) * count
+    elif constant:
+        sizes = array.array('I', [constant]) * count
+    else:
+        sizes = array.array('I', bytes(buf[stsz[0] + 12:stsz[0] + 12 + count * 4]))
+        if sys.byteorder == 'little':
+            sizes.byteswap()
+
+    stco, co64 = box(b'stco'), box(b'co64')
+    if stco:
+        chunks = [_be(buf, stco[0] + 8 + i * 4, 4) for i in range(_be(buf, stco[0] + 4, 4))]
+    elif co64:
+        chunks = [_be(buf, co64[0] + 8 + i * 8, 8) for i in range(_be(buf, co64[0] + 4, 4))]
+    else:
+        raise ValueError('Unsupported MP4: no chunk offset table')
+
+    stsc = box(b'stsc')
+    runs = [(_be(buf, stsc[0] + 8 + i * 12, 4), _be(buf, stsc[0] + 12 + i * 12, 4))
+            for i in range(_be(buf, stsc[0] + 4, 4))]
+    offsets = array.array('Q')
+    chunk_starts = array.array('Q')        # first sample of each non-empty chunk
+    sample = 0
+    for run_index, (first_chunk, per_chunk) in enumerate(runs):
+        last_chunk = runs[run_index + 1][0] - 1 if run_index + 1 < len(runs) else len(chunks)
+        for chunk in range(first_chunk, last_chunk + 1):
+            position = chunks[chunk - 1]
+            if per_chunk and sample < count:
+                chunk_starts.append(sample)
+            for _ in range(per_chunk):
+                if sample >= count:
+                    break
+                offsets.append(position)
+                position += sizes[sample]
+                sample += 1
+    if len(offsets) != count:
+        raise ValueError('Corrupt MP4 sample table (stsc does not cover stsz)')
+
+    stts = box(b'stts')
+    dts = array.array('q')
+    ticks = 0
+    for i in range(_be(buf, stts[0] + 4, 4)):
+        n, delta = _be(buf, stts[0] + 8 + i * 8, 4), _be(buf, stts[0] + 12 + i * 8, 4)
+        for _ in range(n):
+            dts.append(ticks)
+            ticks += delta
+    dts = dts[:count]
+    end_ticks = ticks
+
+    # Presentation time = decode time + composition offset - edit-list start.
+    # ctts offsets are signed in practice even in version 0 boxes.
+    pts = array.array('q', (t - media_time for t in dts))
+    ctts = box(b'ctts')
+    if ctts:
+        sample = 0
+        for i in range(_be(buf, ctts[0] + 4, 4)):
+            n = _be(buf, ctts[0] + 8 + i * 8, 4)
+            offset = int.from_bytes(buf[ctts[0] + 12 + i * 8:ctts[0] + 16 + i * 8], 'big', signed=True)
+            for _ in range(n):
+                if sample < count:
+                    pts[sample] += offset
+                sample += 1
+
+    stss = box(b'stss')
+    if stss:
+        sync = bytearray(count)
+        for i in range(_be(buf, stss[0] + 4, 4)):
+            index = _be(buf, stss[0] + 8 + i * 4, 4) - 1
+            if 0 <= index < count:
+                sync[index] = 1
+    else:
+        sync = bytearray(b'\x01') * count
+
+    if frame_size:
+        bounds = list(chunk_starts) + [count]
+        offsets = array.array('Q', (offsets[i] for i in chunk_starts))
+        sizes = array.array('I', ((bounds[i + 1] - bounds[i]) * frame_size
+                                  for i in range(len(chunk_starts))))
+        dts = array.array('q', (dts[i] for i in chunk_starts))
+        pts = array.array('q', (pts[i] for i in chunk_starts))
+        sync = bytearray(b'\x01') * len(chunk_starts)
+
+    delta = _be(buf, stts[0] + 12, 4) if _be(buf, stts[0] + 4, 4) == 1 else 0
+    return {'offsets': offsets, 'sizes': sizes, 'dts': dts, 'pts': pts, 'sync': sync,
+            'end_ticks': end_ticks - media_time, 'constant_delta': delta}
+
+
+def _mp4_pcm_format(buf, fourcc, sound_version, payload, children, entry_end, channels, bit_depth):
+    """(codec_id, bit_depth, bytes per frame) of a PCM sound sample entry.
+
+    v1 entries add bytesPerFrame; v2 entries keep the real bit depth, byte
+    order and int/float choice in their own fields (the v0 slots hold fixed
+    placeholders). Raises ValueError for layouts Matroska can't carry as-is.
+    """
+    big_endian = _MP4_PCM_CODECS[fourcc]
+    floating, signed = False, True
+    frame_size = 0
+    if fourcc == b'in24':
+        bit_depth = 24
+    if sound_version == 1:
+        frame_size = _be(buf, payload + 36, 4)
+    elif sound_version == 2:
+        bit_depth = _be(buf, payload + 48, 4)
+        flags = _be(buf, payload + 52, 4)
+        frames_per_packet = _be(buf, payload + 60, 4)
+        if frames_per_packet:
+            frame_size = _be(buf, payload + 56, 4) // frames_per_packet
+        if fourcc == b'lpcm':
+            floating = bool(flags & 0x1)        # kAudioFormatFlagIsFloat
+            big_endian = bool(flags & 0x2)      # kAudioFormatFlagIsBigEndian
+            signed = bool(flags & 0x4)          # kAudioFormatFlagIsSignedInteger
+    enda = _mp4_child(buf, children, entry_end, b'wave', b'enda')
+    if enda and enda[1] - enda[0] >= 2:
+        big_endian = not _be(buf, enda[0], 2)
+
+    sample_bytes = (bit_depth + 7) // 8
+    if not frame_size:
+        frame_size = channels * sample_bytes
+    if not bit_depth or not channels or frame_size != channels * sample_bytes:
+        raise ValueError(f'Unsupported PCM layout in {fourcc!r} ({channels} ch, {bit_depth}-bit, '
+                         f'{frame_size} bytes/frame) for the native remuxer')
+    if floating:
+        if big_endian or bit_depth not in (32, 64):
+            raise ValueError('Big-endian or non 32/64-bit float PCM is not supported by the native remuxer')
+        return 'A_PCM/FLOAT/IEEE', bit_depth, frame_size
+    # Matroska's 8-bit PCM is unsigned, wider PCM is signed.
+    if signed != (bit_depth > 8):
+        raise ValueError(f'{"Signed" if signed else "Unsigned"} {bit_depth}-bit PCM is not '
+                         f'supported by the native remuxer')
+    return ('A_PCM/INT/BIG' if big_endian else 'A_PCM/INT/LIT'), bit_depth, frame_size
+
+
+def read_mp4_tracks(path):
+    """Parse every video/audio track of an MP4/MOV into a remux-ready dict.
+
+    Each dict has: kind ('video'/'audio'), codec_id, private, timescale,
+    width/height or sample_rate/channels/bit_depth, fourcc, and the
+    per-sample arrays from _read_mp4_sample_table().
+    """
+    tracks = []
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            moov = _find_mp4_box(buf, b'moov')
+            if not moov:
+                raise ValueError('Not an MP4/MOV file (no moov box)')
+            for kind, tstart, tend in _iter_mp4_boxes(buf, *moov):
+                if kind != b'trak':
+                    continue
+                hdlr = _mp4_child(buf, tstart, tend, b'mdia', b'hdlr')
+                handler = bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) if hdlr else b''
+                if handler not in (b'vide', b'soun'):
+                    continue    # timecode / metadata tracks are not muxed
+                mdhd = _mp4_child(buf, tstart, tend, b'mdia', b'mdhd')
+                stbl = _mp4_child(buf, tstart, tend, b'mdia', b'minf', b'stbl')
+                version = buf[mdhd[0]]
+                timescale = _be(buf, mdhd[0] + (20 if version == 1 else 12), 4) or 1
+
+                media_time = _mp4_edit_start(buf, tstart, tend)
+
+                stsd = _mp4_child(buf, *stbl, b'stsd')
+                entry_start = stsd[0] + 8
+                fourcc = bytes(buf[entry_start + 4:entry_start + 8])
+                entry_end = entry_start + _be(buf, entry_start, 4)
+                payload = entry_start + 8
+                track = {'fourcc': fourcc.decode('latin-1'), 'timescale': timescale}
+                frame_size = 0              # set for PCM audio only
+
+                if handler == b'vide':
+                    if fourcc not in _MP4_VIDEO_CODECS:
+                        raise ValueError(f'Unsupported video codec {fourcc!r} for the native remuxer')
+                    codec_id, config_box = _MP4_VIDEO_CODECS[fourcc]
+                    private = fourcc if codec_id == 'V_PRORES' else b''
+                    if config_box:
+                        config = _mp4_child(buf, payload + 78, entry_end, config_box)
+                        if not config:
+                            raise ValueError(f'{fourcc!r} track has no {config_box!r} box')
+                        private = bytes(buf[config[0]:config[1]])
+                    track.update(kind='video', codec_id=codec_id, private=private,
+                                 width=_be(buf, payload + 24, 2), height=_be(buf, payload + 26, 2))
+                else:
+                    sound_version = _be(buf, payload + 8, 2)
+                    if sound_version == 2:
+                        sample_rate = struct.unpack('>d', buf[payload + 32:payload + 40])[0]
+                        channels = _be(buf, payload + 40, 4)
+                        bit_depth = _be(buf, payload + 48, 4)
+                    else:
+                        channels = _be(buf, payload + 16, 2)
+                        bit_depth = _be(buf, payload + 18, 2)
+                        sample_rate = _be(buf, payload + 24, 4) / 65536.0
+                    children = payload + 28 + {1: 16, 2: 36}.get(sound_version, 0)
+                    if fourcc == b'mp4a':
+                        esds = _mp4_child(buf, children, entry_end, b'esds')
+                        if not esds:
+                            # QuickTime nests it one level down in 'wave'.
+                            esds = _mp4_child(buf, children, entry_end, b'wave', b'esds')
+                        if not esds:
+                            raise ValueError('AAC track has no esds box')
+                        codec_id, private = 'A_AAC', _aac_config_from_esds(buf, *esds)
+                    elif fourcc in _MP4_PCM_CODECS:
+                        codec_id, bit_depth, frame_size = _mp4_pcm_format(
+                            buf, fourcc, sound_version, payload, children, entry_end,
+                            channels, bit_depth)
+                        private = b''
+                    else:
+                        raise ValueError(f'Unsupported audio codec {fourcc!r} for the native remuxer')
+                    track.update(kind='audio', codec_id=codec_id, private=private,
+                                 channels=channels, bit_depth=bit_depth, sample_rate=sample_rate)
+
+                track.update(_read_mp4_sample_table(buf, stbl, timescale, media_time, frame_size))
+                tracks.append(track)
+    if not tracks:
+        raise ValueError('No audio or video tracks found')
+    return tracks
+
+
+def _ebml_id_bytes(eid):
+    return eid.to_bytes((eid.bit_length() + 7) // 8, 'big')
+
+
+def _ebml_size_bytes(size, length=None):
+    if length is None:
+        length = 1
+        while size >= (1 << (7 * length)) - 1:
+            length += 1
+    return ((1 << (7 * length)) | size).to_bytes(length, 'big')
+
+
+def _ebml_el(eid, payload):
+    return _ebml_id_bytes(eid) + _ebml_size_bytes(len(payload)) + payload
+
+
+def _ebml_uint_el(eid, value):
+    return _ebml_el(eid, int(value).to_bytes(max(1, (int(value).bit_length() + 7) // 8), 'big'))
+
+
+def _ebml_float_el(eid, value):
+    return _ebml_el(eid, struct.pack('>d', float(value)))
+
+
+def _ebml_str_el(eid, text):
+    return _ebml_el(eid, text.encode('utf-8'))
+
+
+def _ebml_void(total):
+    """A Void element occupying exactly total bytes (total >= 2)."""
+    if total - 2 <= 126:
+        return bytes([EBML_ID_VOID]) + _ebml_size_bytes(total - 2, 1) + b'\0' * (total - 2)
+    return bytes([EBML_ID_VOID]) + _ebml_size_bytes(total - 3, 2) + b'\0' * (total - 3)
+
+
+def _mkv_colour_element(hdr):
+    """Colour element for an HDR_PRESETS-style dict (blank fields omitted)."""
+    def value(key):
+        return (hdr.get(key) or '').strip()
+
+    body = b''
+    for key, eid in (('colour_matrix', MKV_ID_MATRIX), ('colour_range', MKV_ID_RANGE),
+                     ('transfer', MKV_ID_TRANSFER), ('primaries', MKV_ID_PRIMARIES),
+                     ('max_cll', MKV_ID_MAX_CLL), ('max_fall', MKV_ID_MAX_FALL)):
+        if value(key):
+            body += _ebml_uint_el(eid, int(value(key)))
+
+    mastering = b''
+    if value('chromaticity'):
+        coords = [float(v) for v in value('chromaticity').split(',')]
+        if len(coords) != 6:
+            raise ValueError('Chromaticity needs six comma-separated values')
+        for i, coord in enumerate(coords):
+            mastering += _ebml_float_el(MKV_ID_PRIMARY_R_X + i, coord)
+    if value('white_point'):
+        white = [float(v) for v in value('white_point').split(',')]
+        if len(white) != 2:
+            raise ValueError('White point needs two comma-separated values')
+        mastering += _ebml_float_el(MKV_ID_WHITE_X, white[0]) + _ebml_float_el(MKV_ID_WHITE_Y, white[1])
+    if value('max_luminance'):
+        mastering += _ebml_float_el(MKV_ID_LUMINANCE_MAX, float(value('max_luminance')))
+    if value('min_luminance'):
+        mastering += _ebml_float_el(MKV_ID_LUMINANCE_MIN, float(value('min_luminance')))
+    if mastering:
+        body += _ebml_el(MKV_ID_MASTERING, mastering)
+    return _ebml_el(MKV_ID_COLOUR, body) if body else b''
+
+
+def _track_sample_order(track_index, track):
+    """(dts_ms, track_index, sample_index) for every sample of one track, in order."""
+    scale = 1000.0 / track['timescale']
+    dts = track['dts']
+    for i in range(len(dts)):
+        yield dts[i] * scale, track_index, i
+
+
+def native_remux(input_path, output_path, lut_path, hdr=None, on_progress=None):
+    """Remux input_path (MP4/MOV) into output_path (Matroska) in-process.
+
+    on_progress(percent) is called as samples are written. Raises ValueError
+    for inputs the native backend doesn't support.
+    """
+    tracks = read_mp4_tracks(input_path)
+    first_video = next((i for i, t in enumerate(tracks) if t['kind'] == 'video'), None)
+
+    # Millisecond presentation timestamps, shifted so nothing is negative.
+    for track in tracks:
+        scale = 1000.0 / track['timescale']
+        track['pts_ms'] = array.array('q', (round(p * scale) for p in track['pts']))
+    shift = min(min(t['pts_ms'], default=0) for t in tracks)
+    if shift < 0:
+        for track in tracks:
+            track['pts_ms'] = array.array('q', (p - shift for p in track['pts_ms']))
+    duration_ms = max(t['end_ticks'] * 1000.0 / t['timescale'] - min(shift, 0) for t in tracks)
+
+    # ---- Segment-level metadata, all known before the first sample --------
+    header = _ebml_el(EBML_ID_HEADER,
+                      _ebml_uint_el(EBML_ID_VERSION, 1) + _ebml_uint_el(EBML_ID_READ_VERSION, 1) +
+                      _ebml_uint_el(EBML_ID_MAX_ID_LENGTH, 4) + _ebml_uint_el(EBML_ID_MAX_SIZE_LENGTH, 8) +
+                      _ebml_str_el(EBML_ID_DOCTYPE, 'matroska') +
+                      _ebml_uint_el(EBML_ID_DOCTYPE_VERSION, 4) +
+                      _ebml_uint_el(EBML_ID_DOCTYPE_READ_VERSION, 2))
+    info = _ebml_el(MKV_ID_INFO,
+                    _ebml_el(MKV_ID_SEGMENT_UID, os.urandom(16)) +
+                    _ebml_uint_el(MKV_ID_TIMESTAMP_SCALE, 1000000) +
+                    _ebml_str_el(MKV_ID_MUXING_APP, 'hdr_gui native remuxer') +
+                    _ebml_str_el(MKV_ID_WRITING_APP, 'HDR Video Processor') +
+                    _ebml_float_el(MKV_ID_DURATION, duration_ms))
+
+    entries = b''
+    for index, track in enumerate(tracks):
+        body = (_ebml_uint_el(MKV_ID_TRACK_NUMBER, index + 1) +
+                _ebml_uint_el(MKV_ID_TRACK_UID, random.getrandbits(63) or 1) +
+                _ebml_uint_el(MKV_ID_TRACK_TYPE, 1 if track['kind'] == 'video' else 2) +
+                _ebml_uint_el(MKV_ID_FLAG_LACING, 0) +
+                _ebml_str_el(MKV_ID_LANGUAGE, 'und') +
+                _ebml_str_el(MKV_ID_CODEC_ID, track['codec_id']))
+        if track['private']:
+            body += _ebml_el(MKV_ID_CODEC_PRIVATE, track['private'])
+        if track['kind'] == 'video':
+            if track['constant_delta']:
+                body += _ebml_uint_el(MKV_ID_DEFAULT_DURATION,
+                                      round(track['constant_delta'] * 1e9 / track['timescale']))
+            video = (_ebml_uint_el(MKV_ID_PIXEL_WIDTH, track['width']) +
+                     _ebml_uint_el(MKV_ID_PIXEL_HEIGHT, track['height']))
+            if hdr and index == first_video:
+                video += _mkv_colour_element(hdr)
+            body += _ebml_el(MKV_ID_VIDEO, video)
+        else:
+            audio = (_ebml_float_el(MKV_ID_SAMPLING_FREQUENCY, track['sample_rate']) +
+                     _ebml_uint_el(MKV_ID_CHANNELS, track['channels']))
+            if track['codec_id'].startswith('A_PCM'):
+                audio += _ebml_uint_el(MKV_ID_BIT_DEPTH, track['bit_depth'])
+            body += _ebml_el(MKV_ID_AUDIO, audio)
+        entries += _ebml_el(MKV_ID_TRACK_ENTRY, body)
+    tracks_el = _ebml_el(MKV_ID_TRACKS, entries)
+
+    with open(lut_path, 'rb') as f:
+        lut_data = f.read()
+    attachments = _ebml_el(MKV_ID_ATTACHMENTS, _ebml_el(
+        MKV_ID_ATTACHED_FILE,
+        _ebml_str_el(MKV_ID_FILE_NAME, os.path.basename(lut_path)) +
+        _ebml_str_el(MKV_ID_FILE_MIME, 'application/x-cube') +
+        _ebml_el(MKV_ID_FILE_DATA, lut_data) +
+        _ebml_uint_el(MKV_ID_FILE_UID, random.getrandbits(63) or 1)))
+
+    total_samples = sum(len(t['sizes']) for t in tracks)
+    max_sample = max(max(t['sizes'], default=0) for t in tracks)
+    read_buffer = bytearray(max_sample)
+    view = memoryview(read_buffer)
+    cues = []               # (time_ms, cluster position relative to segment data)
+
+    with open(input_path, 'rb', buffering=NATIVE_READ_BUFFER) as src, \
+            open(output_path, 'wb', buffering=NATIVE_WRITE_BUFFER) as out:
+        out.write(header)
+        segment_pos = out.tell()
+        out.write(_ebml_id_bytes(MKV_ID_SEGMENT) + _ebml_size_bytes(0, 8))
+        data_start = out.tell()
+        out.write(_ebml_void(NATIVE_SEEKHEAD_RESERVE))
+        positions = {}
+        for eid, element in ((MKV_ID_INFO, info), (MKV_ID_TRACKS, tracks_el),
+                             (MKV_ID_ATTACHMENTS, attachments)):
+            positions[eid] = out.tell() - data_start
+            out.write(element)
+
+        cluster_pos = None
+        cluster_ts = 0
+        cluster_bytes = 0
+
+        def close_cluster():
+            end = out.tell()
+            out.seek(cluster_pos + 4)
+            out.write(_ebml_size_bytes(end - cluster_pos - 12, 8))
+            out.seek(end)
+
+        written = 0
+        last_percent = -1
+        order = heapq.merge(*(_track_sample_order(i, t) for i, t in enumerate(tracks)))
+        for _dts, track_index, sample in order:
+            track = tracks[track_index]
+            pts = track['pts_ms'][sample]
+            keyframe = bool(track['sync'][sample])
+            is_video_key = keyframe and track_index == first_video
+            relative = pts - cluster_ts
+            if (cluster_pos is None or is_video_key and relative > 0
+                    or not -32768 <= relative <= NATIVE_CLUSTER_MAX_MS
+                    or cluster_bytes >= NATIVE_CLUSTER_MAX_BYTES):
+                if cluster_pos is not None:
+                    close_cluster()
+                cluster_pos = out.tell()
+                cluster_ts = pts
+                cluster_bytes = 0
+                relative = 0
+                out.write(_ebml_id_bytes(MKV_ID_CLUSTER) + _ebml_size_bytes(0, 8))
+                out.write(_ebml_uint_el(MKV_ID_CLUSTER_TIMESTAMP, cluster_ts))
+                if is_video_key or first_video is None:
+                    cues.append((cluster_ts, cluster_pos - data_start))
+
+            size = track['sizes'][sample]
+            src.seek(track['offsets'][sample])
+            if src.readinto(view[:size]) != size:
+                raise ValueError(f'Truncated input: sample at offset {track["offsets"][sample]}')
+            frame = view[:size]
+            # Matroska stores ProRes frames without the 8-byte size+'icpf' header.
+            if track['codec_id'] == 'V_PRORES' and size >= 8 and frame[4:8] == b'icpf':
+                frame = frame[8:]
+            out.write(_ebml_id_bytes(MKV_ID_SIMPLE_BLOCK) + _ebml_size_bytes(4 + len(frame)))
+            out.write(_ebml_size_bytes(track_index + 1) +
+                      struct.pack('>hB', relative, 0x80 if keyframe else 0))
+            out.write(frame)
+            cluster_bytes += len(frame)
+
+            written += 1
+            if on_progress:
+                percent = written * 100 // total_samples
+                if percent != last_percent:
+                    last_percent = percent
+                    on_progress(percent)
+        if cluster_pos is not None:
+            close_cluster()
+
+        positions[MKV_ID_CUES] = out.tell() - data_start
+        cue_track = (first_video if first_video is not None else 0) + 1
+        out.write(_ebml_el(MKV_ID_CUES, b''.join(
+            _ebml_el(MKV_ID_CUE_POINT,
+                     _ebml_uint_el(MKV_ID_CUE_TIME, time_ms) +
+                     _ebml_el(MKV_ID_CUE_TRACK_POSITIONS,
+                              _ebml_uint_el(MKV_ID_CUE_TRACK, cue_track) +
+                              _ebml_uint_el(MKV_ID_CUE_CLUSTER_POSITION, position)))
+            for time_ms, position in cues)))
+
+        # Patch the Segment size and drop the SeekHead into its reserved slot.
+        end = out.tell()
+        out.seek(segment_pos + 4)
+        out.write(_ebml_size_bytes(end - data_start, 8))
+        seek_head = _ebml_el(MKV_ID_SEEKHEAD, b''.join(
+            _ebml_el(MKV_ID_SEEK, _ebml_el(MKV_ID_SEEK_ID, _ebml_id_bytes(eid)) +
+                     _ebml_uint_el(MKV_ID_SEEK_POSITION, position))
+            for eid, position in positions.items()))
+        out.seek(data_start)
+        out.write(seek_head + _ebml_void(NATIVE_SEEKHEAD_RESERVE - len(seek_head)))
+
+
+def run_native_mux_job(spec, on_line=None):
+    """run_mux_job() equivalent using native_remux() instead of mkvmerge."""
+    log = on_line or (lambda _line: None)
+    input_path = spec['input']
+    output_path = output_path_for(input_path, spec['output_prefix'])
+    hdr = spec.get('hdr')
+
+    log("Starting video processing (native remuxer)...")
+    log(f"{input_path} -> {output_path}\n")
+    EVENT_LOG.emit('job_start', input=input_path, output=output_path, backend='native',
+                   verify_level=spec.get('verify_level', 'quick'), hdr=hdr)
+    started = time.monotonic()
+    try:
+        # Same "Progress: NN%" lines as mkvmerge so workers' heartbeat and
+        # anything scraping the log keep working.
+        native_remux(input_path, output_path, spec['lut'], hdr,
+                     on_progress=lambda percent: log(f"Progress: {percent}%") if percent % 10 == 0 else None)
+    except (OSError, ValueError) as e:
+        return _fail_mux_job(input_path, output_path, f'Native remux failed: {e}',
+                             _mux_metrics(input_path, output_path, time.monotonic() - started))
+    metrics = _mux_metrics(input_path, output_path, time.monotonic() - started, backend='native')
+    return _finish_mux_job(spec, output_path, metrics, log)
+
+
+def default_mux_backend():
+    """mkvmerge where the bundled binary exists, the native remuxer elsewhere (Linux)."""
+    return 'mkvmerge' if os.path.exists(default_mkvmerge_path()) else 'native'
+
+
+def run_benchmark(input_path, lut_path, mkvmerge_path=None, segments=None, output_prefix='_bench'):
+    """Time single-pass mkvmerge, segmented mkvmerge and the native remuxer on one input."""
+    spec = {'input': input_path, 'lut': lut_path, 'output_prefix': output_prefix,
+            'hdr': dict(HDR_PRESETS['DJI Osmo Pocket 3 (HLG)']), 'verify_level': 'quick'}
+    output_path = output_path_for(input_path, output_prefix)
+    size_mb = os.path.getsize(input_path) / (1024 * 1024)
+    rows = []
+    for name, runner in (('single-pass', lambda: run_single_pass_mux_job(spec, mkvmerge_path)),
+                         ('segmented', lambda: run_segmented_mux_job(spec, mkvmerge_path,
+                                                                     segments=segments)),
+                         ('native', lambda: run_native_mux_job(spec))):
+        started = time.monotonic()
+        result = runner()
+        seconds = time.monotonic() - started
+        rows.append((name, seconds, result))
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    print(f"Benchmark: {input_path} ({size_mb:.1f} MiB)")
+    print(f"{'mode':<14}{'wall (s)':>10}{'MiB/s':>10}{'speedup':>10}  result")
+    baseline = rows[0][1]
+    for name, seconds, result in rows:
+        extra = f" ({result['metrics']['segments']} parts)" if 'segments' in result['metrics'] else ''
+        print(f"{name:<14}{seconds:>10.2f}{size_mb / seconds if seconds else 0:>10.1f}"
+              f"{baseline / seconds if seconds else 0:>9.2f}x  "
+              f"{'ok' if result['ok'] else 'FAILED: ' + result['detail']}{extra}")
+    return rows
+
+
+# ----------------------------------------------------------------------------
+# Deferred trash queue.
+# ----------------------------------------------------------------------------
+# send2trash can take seconds per file on network shares, and the old flow
+# asked (and trashed) once per processed file right in the middle of the
+# pipeline. Verified originals are now *staged* while a batch runs, the user
+# confirms the whole batch once, and a background thread moves them to the
+# trash in batches with retries. Items sit in the queue for a short grace
+# period first, which is the undo window: anything not yet handed to the
+# backend can be pulled back out with undo(). A path the worker has already
+# started trashing is in flight and can no longer be undone.
+# ----------------------------------------------------------------------------
+TRASH_BATCH_SIZE = 16        # files handed to the backend per wake-up
+TRASH_GRACE_SECONDS = 10.0   # undo window before a confirmed file is trashed
+TRASH_MAX_ATTEMPTS = 3       # backend attempts per file before giving up
+TRASH_RETRY_DELAY = 5.0      # seconds between attempts (doubles each retry)
+TRASH_CLOSE_TIMEOUT = 30.0   # max seconds closing the window waits for pending trash
+
+
+class TrashQueue:
+    """Background, batched, retrying wrapper around send2trash.
+
+    Lifecycle of a path:  stage() -> confirm() -> [grace period] -> trashed
+                                                \\-> undo()          \\-> failed
+    on_event(kind, path, detail) is called from the worker thread for
+    'trashed', 'retry' and 'failed' events; GUI callers must marshal it
+    back onto the Tk thread themselves.
+    """
+
+    def __init__(self, backend=send2trash, on_event=None,
+                 batch_size=TRASH_BATCH_SIZE, grace_seconds=TRASH_GRACE_SECONDS,
+                 max_attempts=TRASH_MAX_ATTEMPTS, retry_delay=TRASH_RETRY_DELAY):
+        self.backend = backend
+        self.on_event = on_event
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.staged = []        # verified originals awaiting batch confirmation
+        self.pending = {}       # path -> {'due': monotonic time, 'attempts': n}
+        self.in_flight = set()  # pending paths the worker is trashing right now
+        self.trashed = []       # (path, wall-clock time) history
+        self.failed = []        # (path, error text)
+        self._cond = threading.Condition()
+        self._flush = False
+        self._stopping = False
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+        METRICS.track('hdr_queue_depth', lambda: len(self.pending), queue='trash')
+
+    def stage(self, path):
+        """Hold a verified original until the batch is confirmed."""
+        abs_path = os.path.abspath(os.path.normpath(path))
+        with self._cond:
+            if abs_path not in self.staged and abs_path not in self.pending:
+                self.staged.append(abs_path)
+
+    def discard_staged(self):
+        """Drop everything staged (the user declined the batch prompt)."""
+        with self._cond:
+            self.staged.clear()
+
+    def confirm(self):
+        """Queue every staged path for trashing after the grace period."""
+        with self._cond:
+            due = time.monotonic() + self.grace_seconds
+            for path in self.staged:
+                self.pending[path] = {'due': due, 'attempts': 0}
+            count = len(self.staged)
+            self.staged.clear()
+            self._cond.notify_all()
+        return count
+
+    def undo(self, path=None):
+        """Pull a queued path (or every queued path) back out. Returns the count.
+
+        Paths already in flight are left alone: the backend may be moving
+        them right now, so they are not counted as undone.
+        """
+        with self._cond:
+            paths = list(self.pending) if path is None else [os.path.abspath(os.path.normpath(path))]
+            count = 0
+            for queued in paths:
+                if queued in self.pending and queued not in self.in_flight:
+                    del self.pending[queued]
+                    count += 1
+            return count
+
+    def pending_paths(self):
+        with self._cond:
+            return list(self.pending)
+
+    def flush(self, timeout=None):
+        """Trash everything pending now (skipping the grace period) and wait."""
+        with self._cond:
+            self._flush = True
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._flush = False
+            return not self.pending
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def _emit(self, kind, path, detail=''):
+        EVENT_LOG.emit(f'trash_{kind}', path=path, detail=detail)
+        if kind == 'failed':
+            METRICS.inc('hdr_failures_total', stage='trash')
+        if self.on_event:
+            try:
+                self.on_event(kind, path, detail)
+            except Exception as e:
+                print(f'[TrashQueue._emit] Event handler error: {e}')
+
+    def _next_batch(self):
+        """Wait (holding the lock) until some pending paths are due; return them."""
+        while not self._stopping:
+            now = time.monotonic()
+            due = [p for p, item in self.pending.items()
+                   if self._flush or item['due'] <= now]
+            if due:
+                return due[:self.batch_size]
+            wake = min((item['due'] for item in self.pending.values()), default=None)
+            self._cond.wait(None if wake is None else max(wake - now, 0.05))
+        return []
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                if not batch:
+                    return
+            # The slow backend calls happen without holding the lock so the
+            # GUI can keep staging / undoing in the meantime.
+            results = []
+            for path in batch:
+                # Re-check right before each call: undo() may have pulled the
+                # path while earlier files in this batch were being trashed.
+                with self._cond:
+                    if path not in self.pending:
+                        continue
+                    self.in_flight.add(path)
+                try:
+                    if not os.path.exists(path):
+                        raise FileNotFoundError(f'Could not find file: {path}')
+                    self.backend(path)
+                    results.append((path, None))
+                except Exception as e:
+                    results.append((path, str(e)))
+
+            events = []
+            with self._cond:
+                for path, error in results:
+                    self.in_flight.discard(path)
+                    item = self.pending.get(path)
+                    if item is None:
+                        continue
+                    if error is None:
+                        del self.pending[path]
+                        self.trashed.append((path, time.time()))
+                        events.append(('trashed', path, ''))
+                        continue
+                    item['attempts'] += 1
+                    if item['attempts'] >= self.max_attempts:
+                        del self.pending[path]
+                        self.failed.append((path, error))
+                        events.append(('failed', path, error))
+                    else:
+                        item['due'] = time.monotonic() + self.retry_delay * 2 ** (item['attempts'] - 1)
+                        events.append(('retry', path, error))
+                self._cond.notify_all()
+            for event in events:
+                self._emit(*event)
+
+# ----------------------------------------------------------------------------
+# Prioritized, bounded probe scheduler.
+# ----------------------------------------------------------------------------
+# Dropping 200 clips used to mean 200 raw threads each starting an ffprobe at
+# once (or, before that, only probing files[0]). Probes now go through a
+# fixed pool of worker threads pulling from a priority queue:
+#
+#   * the file currently selected in the UI is bumped to the front,
+#   * every new drop starts a new *generation*; anything queued for an older
+#     generation is skipped and results still in flight are dropped, so a
+#     slow stale probe can never overwrite the panel for a newer drop.
+# ----------------------------------------------------------------------------
+PROBE_MAX_WORKERS = max(2, min(8, os.cpu_count() or 2))
+PROBE_PRIORITY_SELECTED = 0
+PROBE_PRIORITY_NORMAL = 10
+FILE_LIST_COLUMNS = ('size', 'duration', 'transfer', 'status')
+
+# Input extensions the instant-info / mux pipeline accepts. Matroska family
+# goes to mkvinfo, everything else to ffprobe.
+VIDEO_EXTENSIONS = ('.mov', '.mp4', '.mkv', '.mka', '.mks', '.webm', '.m4v')
+MKV_EXTENSIONS = ('.mkv', '.mka', '.mks', '.webm')
+
+
+class ProbeScheduler:
+    """Run probe_fn(path) on a bounded worker pool, most important path first.
+
+    probe_fn returns (ok, output). on_result(path, ok, output, generation) is
+    called from a worker thread for every probe that finished while its
+    generation was still current.
+    """
+
+    def __init__(self, probe_fn, on_result, max_workers=PROBE_MAX_WORKERS):
+        self.probe_fn = probe_fn
+        self.on_result = on_result
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._done = set()      # paths finished (or running) this generation
+        for _ in range(max_workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+        METRICS.track('hdr_queue_depth', self._queue.qsize, queue='probe')
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def submit(self, paths, selected=None):
+        """Replace everything queued with a new set of paths. Returns the generation."""
+        with self._lock:
+            self._generation += 1
+            self._done = set()
+            generation = self._generation
+        for path in paths:
+            priority = PROBE_PRIORITY_SELECTED if path == selected else PROBE_PRIORITY_NORMAL
+            self._queue.put((priority, next(self._seq), generation, path))
+        return generation
+
+    def prioritize(self, path):
+        """Move a not-yet-started path to the front of the current generation."""
+        with self._lock:
+            if path in self._done:
+                return
+            generation = self._generation
+        # The original (lower priority) entry is still queued; whichever copy
+        # a worker sees second is skipped via _done.
+        self._queue.put((PROBE_PRIORITY_SELECTED, next(self._seq), generation, path))
+
+    def cancel(self):
+        """Drop everything queued or in flight."""
+        with self._lock:
+            self._generation += 1
+            self._done = set()
+
+    def _worker(self):
+        pin_analysis_thread()
+        while True:
+            _priority, _seq, generation, path = self._queue.get()
+            with self._lock:
+                if generation != self._generation or path in self._done:
+                    continue
+                self._done.add(path)
+            started = time.monotonic()
+            try:
+                ok, output = self.probe_fn(path)
+            except Exception as e:
+                ok, output = False, f"[Instant Info error] {e}"
+            seconds = time.monotonic() - started
+            if not ok:
+                METRICS.inc('hdr_failures_total', stage='probe')
+            METRICS.observe('hdr_probe_seconds', seconds)
+            EVENT_LOG.emit('probe', path=path, seconds=seconds, ok=ok)
+            if generation == self._generation:
+                self.on_result(path, ok, output, generation)
+
+
+def summarize_probe_output(text):
+    """Pull list-view columns (duration seconds, codec, transfer) out of probe text.
+
+    Understands both ffprobe's key=value dump and mkvinfo's tree output.
+    Missing values come back as '' (or 0.0 for duration).
+    """
+    summary = {'duration': 0.0, 'codec': '', 'transfer': ''}
+    m = re.search(r'^duration=([\d.]+)', text, re.M)
+    if m:
+        summary['duration'] = float(m.group(1))
+    else:
+        m = re.search(r'Duration: (\d+):(\d+):([\d.]+)', text)
+        if m:
+            summary['duration'] = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    m = re.search(r'^codec_name=(\S+)', text, re.M) or re.search(r'Codec ID: (\S+)', text)
+    if m:
+        summary['codec'] = m.group(1)
+    m = (re.search(r'^color_transfer=(\S+)', text, re.M)
+         or re.search(r'Colour transfer(?: characteristics)?: (\d+)', text))
+    if m:
+        summary['transfer'] = m.group(1)
+    return summary
+
+# ----------------------------------------------------------------------------
+# Scopes: histogram, waveform and nits heatmap on a sampled frame.
+# ----------------------------------------------------------------------------
+# Checking range and highlight clipping used to mean opening another tool.
+# A single frame is pulled out of ffmpeg as raw 16-bit planes (-ss before
+# -i, so seeking is cheap) and analysed with NumPy:
+#
+#   histogram  luma + R/G/B code-value distribution, legal-range markers
+#   waveform   luma level vs. horizontal position, log intensity
+#   nits       display luminance per block through the PQ / HLG / SDR EOTF
+#
+# Without a LUT the frame is taken as yuv444p16le so the *coded* values
+# survive untouched (an rgb conversion would clamp exactly the out-of-range
+# values we want to see). With a LUT, ffmpeg's lut3d is applied and the
+# result is analysed as full-range SDR RGB.
+#
+# Frames are scaled to SCOPE_PREVIEW_WIDTH for interactive speed unless
+# full resolution is asked for. Results are cached per (file, timestamp,
+# LUT hash, resolution). NumPy is optional and imported on first use only.
+# ----------------------------------------------------------------------------
+SCOPE_PREVIEW_WIDTH = 480
+SCOPE_IMAGE_WIDTH = 256      # histogram bins / waveform columns
+SCOPE_IMAGE_HEIGHT = 128     # histogram height / waveform levels
+SCOPE_CACHE_ENTRIES = 32
+SCOPE_GRAB_TIMEOUT = 60
+HLG_NOMINAL_PEAK_NITS = 1000.0
+SDR_REFERENCE_NITS = 100.0
+
+# MatrixCoefficients value -> (Kr, Kb)
+_SCOPE_LUMA_COEFFICIENTS = {
+    '1': (0.2126, 0.0722),
+    '5': (0.299, 0.114),
+    '6': (0.299, 0.114),
+    '9': (0.2627, 0.0593),
+    '10': (0.2627, 0.0593),
+}
+# log10(nits) stops for the heatmap palette: black, blue, green at SDR
+# white, yellow at HDR reference white (203), red at 1000, white at 4000.
+_NITS_PALETTE = (
+    (-1.0, (0, 0, 0)),
+    (0.0, (0, 0, 160)),
+    (2.0, (0, 180, 0)),
+    (2.3075, (230, 230, 0)),
+    (3.0, (230, 0, 0)),
+    (3.602, (255, 255, 255)),
+)
+
+_numpy = None
+
+
+def _import_numpy():
+    """NumPy, imported on first use; None when it isn't installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        _numpy = numpy
+    return _numpy
+
+
+def _ffmpeg_filter_path(path):
+    """Quote a file path for use inside an ffmpeg filter argument."""
+    return path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+
+
+def _probe_video_size(ffmpeg, path):
+    """(width, height) of the first video stream via ffprobe."""
+    ffprobe = shutil.which('ffprobe') or os.path.join(os.path.dirname(ffmpeg), 'ffprobe')
+    result = subprocess.run(prioritized([ffprobe, '-v', 'error', '-select_streams', 'v:0',
+                                         '-show_entries', 'stream=width,height', '-of', 'csv=p=0',
+                                         path]),
+                            capture_output=True, text=True, timeout=SCOPE_GRAB_TIMEOUT,
+                            creationflags=child_creationflags())
+    width, _sep, height = result.stdout.strip().partition(',')
+    if not width.isdigit() or not height.isdigit():
+        raise RuntimeError(f'Could not read the video size: {result.stderr.strip()}')
+    return int(width), int(height)
+
+
+def grab_scope_frame(path, timestamp, lut_path=None, full_resolution=False,
+                     width=SCOPE_PREVIEW_WIDTH):
+    """Decode one frame at timestamp. Returns a (3, height, width) uint16 array.
+
+    Planes are Y/Cb/Cr without a LUT and R/G/B with one. The frame is
+    scaled to width unless full_resolution is set.
+    """
+    np = _import_numpy()
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError('ffmpeg not found on PATH')
+    filters = []
+    height = None
+    if full_resolution:
+        width, height = _probe_video_size(ffmpeg, path)
+    else:
+        filters.append(f'scale={width}:-2')
+    if lut_path:
+        filters.append(f"lut3d=file='{_ffmpeg_filter_path(lut_path)}'")
+    pix_fmt = 'rgb48le' if lut_path else 'yuv444p16le'
+    cmd = [ffmpeg, '-nostdin', '-v', 'error', '-ss', f'{timestamp:.3f}', '-i', path,
+           '-frames:v', '1', '-an', '-sn']
+    if filters:
+        cmd += ['-vf', ','.join(filters)]
+    cmd += ['-pix_fmt', pix_fmt, '-f', 'rawvideo', '-']
+    result = subprocess.run(prioritized(cmd), capture_output=True, timeout=SCOPE_GRAB_TIMEOUT,
+                            creationflags=child_creationflags())
+    if result.returncode != 0 or not result.stdout:
+        detail = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(detail[-1] if detail else f'No frame decoded at {timestamp:.3f}s')
+    data = np.frombuffer(result.stdout, dtype='<u2')
+    height = height or data.size // (3 * width)
+    data = data[:3 * width * height]
+    if lut_path:
+        return data.reshape(height, width, 3).transpose(2, 0, 1)
+    return data.reshape(3, height, width)
+
+
+def _nits_from_signal(np, signal, transfer):
+    """Display luminance (cd/m2) for a normalised non-linear signal array."""
+    signal = np.clip(signal, 0.0, 1.0)
+    if transfer == '16':
+        # SMPTE ST 2084 (PQ) EOTF.
+        m1, m2 = 2610 / 16384, 2523 / 4096 * 128
+        c1, c2, c3 = 3424 / 4096, 2413 / 4096 * 32, 2392 / 4096 * 32
+        p = signal ** (1 / m2)
+        return 10000.0 * (np.maximum(p - c1, 0.0) / (c2 - c3 * p)) ** (1 / m1)
+    if transfer == '18':
+        # ARIB STD-B67 inverse OETF, then the BT.2100 OOTF for a 1000-nit display.
+        a, b, c = 0.17883277, 0.28466892, 0.55991073
+        scene = np.where(signal <= 0.5, signal * signal / 3.0,
+                         (np.exp((signal - c) / a) + b) / 12.0)
+        return HLG_NOMINAL_PEAK_NITS * scene ** 1.2
+    return SDR_REFERENCE_NITS * signal ** 2.4
+
+
+def _block_max(np, plane, columns):
+    """Max-pool plane down to about `columns` columns (square blocks)."""
+    factor = max(1, -(-plane.shape[1] // columns))
+    height = plane.shape[0] // factor * factor
+    width = plane.shape[1] // factor * factor
+    if not height or not width:
+        return plane
+    return plane[:height, :width].reshape(height // factor, factor, width // factor, factor).max(axis=(1, 3))
+
+
+def compute_scopes(frame, hdr=None, rgb=False):
+    """Histogram / waveform / nits arrays and range stats for one frame.
+
+    frame is grab_scope_frame()'s (3, h, w) uint16 array. hdr supplies the
+    colour_range / transfer / colour_matrix used to interpret YCbCr frames;
+    rgb frames (LUT applied) are treated as full-range BT.709 SDR.
+
+    Everything works on 10-bit code values: luma-only scopes are integer
+    bincounts, and the EOTF runs once over the 1024 possible codes as a
+    lookup table instead of once per pixel.
+    """
+    np = _import_numpy()
+    hdr = hdr or {}
+    limited = not rgb and (hdr.get('colour_range') or '1') != '2'
+    transfer = '1' if rgb else (hdr.get('transfer') or '1')
+    kr, kb = _SCOPE_LUMA_COEFFICIENTS.get('1' if rgb else (hdr.get('colour_matrix') or '1'),
+                                          _SCOPE_LUMA_COEFFICIENTS['1'])
+    kg = 1.0 - kr - kb
+    codes = frame >> 6                      # 64 / 940 / 1023 landmarks
+    codes_axis = np.arange(1024, dtype=np.float32)
+    bins = SCOPE_IMAGE_WIDTH
+
+    if rgb:
+        signal = codes_axis / 1023.0
+        channels = codes.astype(np.float32) / 1023.0
+        luma10 = np.clip((kr * channels[0] + kg * channels[1] + kb * channels[2]) * 1023.0 + 0.5,
+                         0, 1023).astype(np.uint16)
+        below = float(np.mean(np.all(codes == 0, axis=0)))
+        above = 0.0
+        at_peak = float(np.mean(np.any(codes == 1023, axis=0)))
+        rgb_bins = [(plane >> 2).ravel() for plane in codes]
+    else:
+        luma10 = codes[0]
+        if limited:
+            signal = (codes_axis - 64.0) / 876.0
+            cb = (codes[1].astype(np.float32) - 512.0) / 896.0
+            cr = (codes[2].astype(np.float32) - 512.0) / 896.0
+            below = float(np.mean(luma10 < 64))
+            above = float(np.mean(luma10 > 940))
+        else:
+            signal = codes_axis / 1023.0
+            cb = (codes[1].astype(np.float32) - 512.0) / 1023.0
+            cr = (codes[2].astype(np.float32) - 512.0) / 1023.0
+            below = float(np.mean(luma10 == 0))
+            above = 0.0
+        at_peak = float(np.mean(luma10 >= 1019))
+        y = signal[luma10]
+        r = y + 2.0 * (1.0 - kr) * cr
+        b = y + 2.0 * (1.0 - kb) * cb
+        g = (y - kr * r - kb * b) / kg
+        rgb_bins = [np.clip(channel * (bins - 1) + 0.5, 0, bins - 1).astype(np.intp).ravel()
+                    for channel in (r, g, b)]
+
+    code_counts = np.bincount(luma10.ravel(), minlength=1024)
+    histogram = {'luma': code_counts.reshape(bins, -1).sum(axis=1)}
+    for name, values in zip(('r', 'g', 'b'), rgb_bins):
+        histogram[name] = np.bincount(values, minlength=bins)
+
+    levels = SCOPE_IMAGE_HEIGHT
+    height, width = luma10.shape
+    level = (luma10 >> 3).astype(np.intp)           # 1024 codes -> 128 levels
+    column = (np.arange(width) * bins // width).astype(np.intp)
+    waveform = np.bincount((level * bins + column[None, :]).ravel(),
+                           minlength=levels * bins).reshape(levels, bins)
+
+    nits_lut = _nits_from_signal(np, signal, transfer).astype(np.float32)
+    p99_code = int(np.searchsorted(np.cumsum(code_counts), 0.99 * luma10.size))
+    return {
+        'histogram': histogram,
+        'waveform': waveform,
+        'nits': _block_max(np, nits_lut[luma10], SCOPE_IMAGE_WIDTH),
+        'limited': limited,
+        'stats': {
+            'width': width,
+            'height': height,
+            'transfer': transfer,
+            'below_black': below,
+            'above_white': above,
+            'at_peak': at_peak,
+            'peak_nits': float(nits_lut[int(luma10.max())]),
+            'average_nits': float(np.dot(code_counts, nits_lut) / luma10.size),
+            'p99_nits': float(nits_lut[min(p99_code, 1023)]),
+        },
+    }
+
+
+def _ppm(np, image):
+    """Binary PPM bytes for an (h, w, 3) uint8 array — Tk's PhotoImage reads these natively."""
+    height, width = image.shape[:2]
+    return b'P6 %d %d 255\n' % (width, height) + np.ascontiguousarray(image, dtype=np.uint8).tobytes()
+
+
+def render_scope_images(scopes):
+    """PPM bytes for the histogram, waveform and nits heatmap of compute_scopes() output."""
+    np = _import_numpy()
+    bins, levels = SCOPE_IMAGE_WIDTH, SCOPE_IMAGE_HEIGHT
+    rows = np.arange(levels)[:, None]
+    legal = [64 >> 2, 940 >> 2] if scopes['limited'] else []
+
+    histogram = np.zeros((levels, bins, 3), dtype=np.uint8)
+    peak = max(int(max(h.max() for h in scopes['histogram'].values())), 1)
+    for index, name in enumerate(('r', 'g', 'b')):
+        heights = scopes['histogram'][name] * (levels - 1) // peak
+        histogram[..., index] = np.where(rows >= levels - 1 - heights[None, :], 170, 0)
+    luma = scopes['histogram']['luma'] * (levels - 1) // peak
+    histogram[rows[:, 0][:, None] >= levels - 1 - luma[None, :]] |= np.uint8(0x50)
+    for x in legal:
+        histogram[:, x] = 110
+
+    counts = scopes['waveform'][::-1]
+    intensity = np.log1p(counts) / max(float(np.log1p(counts.max())), 1e-9)
+    waveform = np.zeros((levels, bins, 3), dtype=np.uint8)
+    waveform[..., 1] = (intensity * 255).astype(np.uint8)
+    waveform[..., 0] = waveform[..., 2] = (intensity * 90).astype(np.uint8)
+    for code in ((64, 940) if scopes['limited'] else ()):
+        waveform[levels - 1 - (code >> 3), :] = 110
+
+    log_nits = np.log10(np.maximum(scopes['nits'], 0.1))
+    stops = [stop for stop, _colour in _NITS_PALETTE]
+    heatmap = np.stack([np.interp(log_nits, stops, [colour[i] for _stop, colour in _NITS_PALETTE])
+                        for i in range(3)], axis=-1)
+    return {'histogram': _ppm(np, histogram), 'waveform': _ppm(np, waveform),
+            'nits': _ppm(np, heatmap)}
+
+
+class ScopeCache:
+    """Small thread-safe LRU of analysed frames.
+
+    Keys are (path, mtime, size, timestamp, LUT hash, full resolution), so
+    an edited clip or LUT never serves stale scopes.
+    """
+
+    def __init__(self, max_entries=SCOPE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, timestamp, lut_path=None, full_resolution=False):
+        st = os.stat(path)
+        lut_hash = lut_file_hash(lut_path) if lut_path else ''
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size, round(timestamp, 3),
+                lut_hash, bool(full_resolution))
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._entries[key] = value    # move to most-recent
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+
+def analyze_scopes(path, timestamp, hdr=None, lut_path=None, full_resolution=False, cache=None):
+    """Grab, analyse and render one frame, going through cache when given.
+
+    Returns compute_scopes() output plus an 'images' dict of PPM bytes.
+    Raises RuntimeError when NumPy or ffmpeg is missing or decoding fails.
+    """
+    if _import_numpy() is None:
+        raise RuntimeError('NumPy is not installed (pip install numpy)')
+    key = ScopeCache.key(path, timestamp, lut_path, full_resolution)
+    # The transfer/range used to read the frame are part of the answer too.
+    hdr_key = tuple(sorted((hdr or {}).items()))
+    if cache is not None:
+        cached = cache.get(key + (hdr_key,))
+        if cached is not None:
+            return cached
+    frame = grab_scope_frame(path, timestamp, lut_path, full_resolution)
+    scopes = compute_scopes(frame, hdr, rgb=bool(lut_path))
+    scopes['images'] = render_scope_images(scopes)
+    if cache is not None:
+        cache.put(key + (hdr_key,), scopes)
+    return scopes
+
+
+# ----------------------------------------------------------------------------
+# LUT chains baked into one composite .cube.
+# ----------------------------------------------------------------------------
+# mkvmerge attaches exactly one LUT, but grading often needs a technical
+# conversion followed by a creative look. A chain of .cube files (3D tables,
+# 1D shapers, or Resolve-style files carrying both) is baked into a single
+# 3D table: an identity lattice is pushed through every stage with
+# vectorised trilinear / linear interpolation, then written out as one
+# .cube. Everything downstream (attachment, verify, scopes, thumbnails)
+# sees a single LUT and does one lookup instead of N.
+#
+# Baked tables live in LUT_CHAIN_CACHE_DIR named by a hash of the chain's
+# file contents, order and lattice size, so re-picking the same chain is a
+# stat, not a bake.
+# ----------------------------------------------------------------------------
+LUT_CHAIN_CACHE_DIR = 'lut_cache'
+LUT_CHAIN_SIZES = [17, 33, 65]
+LUT_CHAIN_DEFAULT_SIZE = 33
+
+
+def read_cube(path):
+    """Parse a .cube file into its stages, in the order they apply.
+
+    Returns a list of {'kind': '1d' | '3d', 'size', 'domain_min',
+    'domain_max', 'table'}; a 1D shaper comes before the 3D table when a
+    file carries both. 3D tables are shaped (b, g, r, 3) — red varies
+    fastest in the file. Raises ValueError on malformed files.
+    """
+    np = _import_numpy()
+    if np is None:
+        raise RuntimeError('NumPy is not installed (pip install numpy)')
+    sizes = {}
+    domains = {'1d': [[0.0] * 3, [1.0] * 3], '3d': [[0.0] * 3, [1.0] * 3]}
+    rows = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            keyword, _sep, rest = line.partition(' ')
+            if keyword[0].isalpha():
+                values = rest.split()
+                if keyword in ('LUT_1D_SIZE', 'LUT_3D_SIZE'):
+                    sizes[keyword[4:6].lower()] = int(values[0])
+                elif keyword in ('DOMAIN_MIN', 'DOMAIN_MAX'):
+                    for kind in domains:
+                        domains[kind][keyword == 'DOMAIN_MAX'] = [float(v) for v in values[:3]]
+                elif keyword in ('LUT_1D_INPUT_RANGE', 'LUT_3D_INPUT_RANGE'):
+                    kind = keyword[4:6].lower()
+                    domains[kind] = [[float(values[0])] * 3, [float(values[1])] * 3]
+                continue
+            rows.append(line)
+    if not sizes:
+        raise ValueError(f'{os.path.basename(path)}: no LUT_1D_SIZE or LUT_3D_SIZE')
+    try:
+        data = np.array(' '.join(rows).split(), dtype=np.float32).reshape(-1, 3)
+    except ValueError:
+        raise ValueError(f'{os.path.basename(path)}: table rows are not RGB triplets')
+    expected = sizes.get('1d', 0) + sizes.get('3d', 0) ** 3
+    if len(data) != expected:
+        raise ValueError(f'{os.path.basename(path)}: {len(data)} rows, expected {expected}')
+
+    stages = []
+    if '1d' in sizes:
+        n = sizes['1d']
+        stages.append({'kind': '1d', 'size': n, 'table': data[:n],
+                       'domain_min': np.array(domains['1d'][0], np.float32),
+                       'domain_max': np.array(domains['1d'][1], np.float32)})
+    if '3d' in sizes:
+        n = sizes['3d']
+        stages.append({'kind': '3d', 'size': n,
+                       'table': data[len(data) - n ** 3:].reshape(n, n, n, 3),
+                       'domain_min': np.array(domains['3d'][0], np.float32),
+                       'domain_max': np.array(domains['3d'][1], np.float32)})
+    return stages
+
+
+def _lut_positions(np, stage, rgb):
+    """rgb (..., 3) scaled to fractional table indices for stage."""
+    span = np.maximum(stage['domain_max'] - stage['domain_min'], 1e-6)
+    return np.clip((rgb - stage['domain_min']) / span, 0.0, 1.0) * (stage['size'] - 1)
+
+
+def apply_lut_stage(stage, rgb):
+    """Push an (..., 3) float32 array through one read_cube() stage."""
+    np = _import_numpy()
+    pos = _lut_positions(np, stage, rgb)
+    table = stage['table']
+    if stage['kind'] == '1d':
+        grid = np.arange(stage['size'], dtype=np.float32)
+        return np.stack([np.interp(pos[..., c], grid, table[:, c]) for c in range(3)],
+                        axis=-1).astype(np.float32)
+    # Trilinear: the eight lattice corners around each point, weighted by
+    # the fractional position. Indices are clamped so 1.0 lands on the edge.
+    low = np.minimum(pos.astype(np.intp), stage['size'] - 2)
+    frac = (pos - low).astype(np.float32)
+    r0, g0, b0 = low[..., 0], low[..., 1], low[..., 2]
+    fr, fg, fb = frac[..., 0:1], frac[..., 1:2], frac[..., 2:3]
+    c000 = table[b0, g0, r0]
+    c001 = table[b0, g0, r0 + 1]
+    c010 = table[b0, g0 + 1, r0]
+    c011 = table[b0, g0 + 1, r0 + 1]
+    c100 = table[b0 + 1, g0, r0]
+    c101 = table[b0 + 1, g0, r0 + 1]
+    c110 = table[b0 + 1, g0 + 1, r0]
+    c111 = table[b0 + 1, g0 + 1, r0 + 1]
+    c00 = c000 + (c001 - c000) * fr
+    c01 = c010 + (c011 - c010) * fr
+    c10 = c100 + (c101 - c100) * fr
+    c11 = c110 + (c111 - c110) * fr
+    c0 = c00 + (c01 - c00) * fg
+    c1 = c10 + (c11 - c10) * fg
+    return c0 + (c1 - c0) * fb
+
+
+def bake_lut_chain(paths, size=LUT_CHAIN_DEFAULT_SIZE):
+    """Composite the .cube files in paths (applied in order) into one (size,)*3 table.
+
+    The lattice covers the first stage's input domain, so a chain that
+    starts from a log or extended-range shaper keeps its input range.
+    Returns (table, domain_min, domain_max).
+    """
+    np = _import_numpy()
+    if np is None:
+        raise RuntimeError('NumPy is not installed (pip install numpy)')
+    stages = [stage for path in paths for stage in read_cube(path)]
+    if not stages:
+        raise ValueError('LUT chain is empty')
+    domain_min, domain_max = stages[0]['domain_min'], stages[0]['domain_max']
+    steps = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    b, g, r = np.meshgrid(steps, steps, steps, indexing='ij')
+    rgb = domain_min + np.stack([r, g, b], axis=-1) * (domain_max - domain_min)
+    for stage in stages:
+        rgb = apply_lut_stage(stage, rgb)
+    return rgb.astype(np.float32), domain_min, domain_max
+
+
+def write_cube(path, table, domain_min=None, domain_max=None, title=''):
+    """Write a (n, n, n, 3) (b, g, r)-ordered table as a .cube file."""
+    np = _import_numpy()
+    size = table.shape[0]
+    header = [f'TITLE "{title}"'] if title else []
+    header.append(f'LUT_3D_SIZE {size}')
+    if domain_min is not None and (np.any(domain_min != 0.0) or np.any(domain_max != 1.0)):
+        header.append('DOMAIN_MIN ' + ' '.join(f'{v:.6f}' for v in domain_min))
+        header.append('DOMAIN_MAX ' + ' '.join(f'{v:.6f}' for v in domain_max))
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(header) + '\n')
+        np.savetxt(f, table.reshape(-1, 3), fmt='%.6f')
+
+
+def lut_file_hash(path):
+    """Hex digest of a LUT file's contents.
+
+    Every cache keyed on a LUT (scopes, chains, the ingest index,
+    thumbnails, proxies) uses this, so they agree on what "same LUT" means.
+    Raises OSError if the file can't be read.
+    """
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def lut_chain_key(paths, size):
+    """Hash of the chain's file contents, order and lattice size."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f'{size}\n'.encode())
+    for path in paths:
+        digest.update(bytes.fromhex(lut_file_hash(path)))
+    return digest.hexdigest()
+
+
+def composite_lut(paths, size=LUT_CHAIN_DEFAULT_SIZE, cache_dir=LUT_CHAIN_CACHE_DIR):
+    """Path of a single .cube equivalent to applying paths in order.
+
+    A one-file chain is returned as is (no resampling). Longer chains are
+    baked once and reused from cache_dir. Returns (path, cached).
+    """
+    if len(paths) == 1:
+        return paths[0], True
+    key = lut_chain_key(paths, size)
+    stems = '+'.join(os.path.splitext(os.path.basename(p))[0] for p in paths)
+    output_path = os.path.join(cache_dir, f'{stems[:80]}_{size}_{key}.cube')
+    if os.path.exists(output_path):
+        return output_path, True
+    table, domain_min, domain_max = bake_lut_chain(paths, size)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Bake under a temporary name so an interrupted write is never reused.
+    partial = f'{output_path}.{os.getpid()}.tmp'
+    try:
+        write_cube(partial, table, domain_min, domain_max,
+                   title=' -> '.join(os.path.basename(p) for p in paths))
+        os.replace(partial, output_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return output_path, False
+
+
+# ----------------------------------------------------------------------------
+# Sampled signal-range detection.
+# ----------------------------------------------------------------------------
+# The Range / Transfer tags are whatever the HDR panel says, and a full-range
+# clip tagged limited (or the reverse) only shows up as crushed or washed
+# out blacks after the upload. Before muxing, check_signal_range() decodes
+# one low-resolution frame every SIGNAL_CHECK_INTERVAL seconds (at most
+# SIGNAL_CHECK_MAX_FRAMES, spread over the clip) on a small worker pool and
+# folds each frame into a single 1024-bin luma code histogram. Frames are
+# dropped as soon as they're counted, so memory doesn't grow with the clip.
+#
+# Range evidence:
+#   full     a real share of pixels below code 48 (limited black is 64,
+#            minus noise) or in the 1020+ codes limited range reserves
+#   limited  the darkest content sits on 64 instead of near 0
+# Anything in between is "inconclusive" and never flagged. The source
+# stream's own colour_range / color_transfer (ffprobe) are compared too,
+# and a PQ tag is flagged when it would put a large share of the picture
+# above 4000 nits, which real PQ grades don't do.
+# ----------------------------------------------------------------------------
+SIGNAL_CHECK_INTERVAL = 10.0      # seconds between sampled frames
+SIGNAL_CHECK_MAX_FRAMES = 24
+SIGNAL_CHECK_WIDTH = 160          # decode width; range stats don't need more
+SIGNAL_CHECK_BUDGET = 60.0        # wall-clock seconds per clip
+SIGNAL_CHECK_WORKERS = max(2, min(4, (os.cpu_count() or 2) // 2))
+SIGNAL_CHECK_CLIPS = 2            # clips checked at once by the GUI batch
+SIGNAL_EVIDENCE_FRACTION = 0.01   # share of pixels that counts as evidence
+SIGNAL_EXTREME_FRACTION = 0.001   # percentile used for "darkest"/"brightest"
+
+_FFPROBE_RANGES = {'tv': '1', 'pc': '2'}
+_FFPROBE_TRANSFERS = {
+    'bt709': '1', 'smpte170m': '6', 'bt2020-10': '14', 'bt2020-12': '15',
+    'smpte2084': '16', 'arib-std-b67': '18',
+}
+
+
+def probe_source_signal(path):
+    """Duration and the video stream's own range/transfer tags via ffprobe.
+
+    Returns {'duration', 'range', 'transfer'} with HDR panel values ('1',
+    '18', ...) or '' where the source doesn't say.
+    """
+    info = {'duration': 0.0, 'range': '', 'transfer': ''}
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe:
+        return info
+    try:
+        cmd = [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'format=duration:stream=color_range,color_transfer',
+               '-of', 'json', path]
+        result = subprocess.run(prioritized(cmd), capture_output=True, text=True,
+                                timeout=SCOPE_GRAB_TIMEOUT, creationflags=child_creationflags())
+        data = json.loads(result.stdout or '{}')
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return info
+    try:
+        info['duration'] = float(data.get('format', {}).get('duration') or 0.0)
+    except ValueError:
+        pass
+    stream = (data.get('streams') or [{}])[0]
+    info['range'] = _FFPROBE_RANGES.get(stream.get('color_range', ''), '')
+    info['transfer'] = _FFPROBE_TRANSFERS.get(stream.get('color_transfer', ''), '')
+    return info
+
+
+def _sample_luma_histogram(path, timestamp):
+    """1024-bin histogram of 10-bit luma codes for the frame at timestamp."""
+    np = _import_numpy()
+    frame = grab_scope_frame(path, timestamp, width=SIGNAL_CHECK_WIDTH)
+    return np.bincount((frame[0] >> 6).ravel(), minlength=1024)
+
+
+def check_signal_range(path, hdr, interval=SIGNAL_CHECK_INTERVAL,
+                       max_frames=SIGNAL_CHECK_MAX_FRAMES, budget=SIGNAL_CHECK_BUDGET):
+    """Sample path's luma codes and compare them with hdr's Range/Transfer.
+
+    Returns a report dict: frames, seconds, code_low / code_high (luma
+    codes at the SIGNAL_EXTREME_FRACTION tails), detected_range ('1', '2'
+    or ''), source (probe_source_signal output), issues (list of
+    human-readable mismatches), ok and detail.
+    """
+    np = _import_numpy()
+    started = time.monotonic()
+    source = probe_source_signal(path)
+    duration = source['duration']
+    count = max(1, min(max_frames, int(duration // interval)))
+    times = [(i + 0.5) * duration / count for i in range(count)] if duration else [0.0]
+
+    counts = np.zeros(1024, dtype=np.int64)
+    frames = 0
+    errors = []
+    pool = ThreadPoolExecutor(max_workers=SIGNAL_CHECK_WORKERS, initializer=pin_analysis_thread)
+    try:
+        futures = [pool.submit(_sample_luma_histogram, path, t) for t in times]
+        done, not_done = futures_wait(futures, timeout=budget)
+        for future in done:
+            try:
+                counts += future.result()
+                frames += 1
+            except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+                errors.append(str(e))
+        if not_done:
+            errors.append(f'budget of {budget:.0f}s reached')
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    report = {'frames': frames, 'seconds': time.monotonic() - started, 'source': source}
+    report.update(classify_luma_histogram(counts, hdr, source))
+    if errors:
+        report['detail'] += f' ({len(errors)} sample(s) failed: {errors[0]})'
+    return report
+
+
+def classify_luma_histogram(counts, hdr, source=None):
+    """Compare a 1024-bin luma code histogram with hdr's Range/Transfer.
+
+    source is probe_source_signal() output (only 'range' and 'transfer'
+    are read). Returns code_low, code_high, detected_range, issues, ok and
+    detail as described for check_signal_range().
+    """
+    np = _import_numpy()
+    source = source or {'range': '', 'transfer': ''}
+    result = {'code_low': 0, 'code_high': 0, 'detected_range': '', 'issues': []}
+    total = int(counts.sum())
+    if not total:
+        result.update(ok=True, detail='no frames decoded')
+        return result
+
+    cumulative = np.cumsum(counts)
+    code_low = int(np.searchsorted(cumulative, SIGNAL_EXTREME_FRACTION * total))
+    code_high = int(np.searchsorted(cumulative, (1 - SIGNAL_EXTREME_FRACTION) * total))
+    deep_black = float(counts[:48].sum()) / total
+    reserved = float(counts[1020:].sum()) / total
+    if deep_black > SIGNAL_EVIDENCE_FRACTION or reserved > SIGNAL_EVIDENCE_FRACTION:
+        detected = '2'
+    elif 56 <= code_low <= 96 and code_high <= 1019:
+        detected = '1'
+    else:
+        detected = ''
+    result.update(code_low=code_low, code_high=code_high, detected_range=detected)
+
+    tagged_range = (hdr.get('colour_range') or '').strip()
+    tagged_transfer = (hdr.get('transfer') or '').strip()
+    issues = result['issues']
+    if tagged_range == '1' and detected == '2':
+        issues.append(f'tagged limited range but {deep_black:.1%} of pixels are below code 48 '
+                      f'and {reserved:.1%} at 1020+ (looks full range)')
+    elif tagged_range == '2' and detected == '1':
+        issues.append(f'tagged full range but blacks sit at code {code_low} '
+                      f'(limited-range black is 64)')
+    if tagged_range and source['range'] and source['range'] != tagged_range:
+        issues.append(f"source stream says {'full' if source['range'] == '2' else 'limited'} range, "
+                      f"tag says {'full' if tagged_range == '2' else 'limited'}")
+    if tagged_transfer and source['transfer'] and source['transfer'] != tagged_transfer:
+        issues.append(f"source stream says transfer {source['transfer']}, tag says {tagged_transfer}")
+    if tagged_transfer == '16':
+        axis = np.arange(1024, dtype=np.float32)
+        signal = axis / 1023.0 if tagged_range == '2' else (axis - 64.0) / 876.0
+        nits = _nits_from_signal(np, signal, '16')
+        very_bright = float(counts[nits > 4000.0].sum()) / total
+        if very_bright > SIGNAL_EVIDENCE_FRACTION:
+            issues.append(f'tagged PQ but {very_bright:.1%} of pixels would display above '
+                          f'4000 nits (HLG or SDR footage?)')
+
+    result['ok'] = not issues
+    result['detail'] = '; '.join(issues) if issues else (
+        f"range looks {'full' if detected == '2' else 'limited' if detected == '1' else 'inconclusive'}")
+    return result
+
+
+# ----------------------------------------------------------------------------
+# JSON state files.
+# ----------------------------------------------------------------------------
+# The ingest index, dedupe history, thumbnail index and proxy index are
+# each one JSON file rewritten whole from several threads. save_json_state()
+# serialises and writes under the owner's lock, so two saves can't
+# interleave or land out of order, and writes a temp file that replaces the
+# old one, so a crash mid-write leaves the previous file rather than a
+# truncated one the loader would throw away.
+# ----------------------------------------------------------------------------
+def save_json_state(path, entries, lock):
+    """Atomically replace path with entries as JSON, holding lock throughout."""
+    with lock:
+        data = json.dumps(entries)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp',
+                                         dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+
+# ----------------------------------------------------------------------------
+# Ingest folder indexer.
+# ----------------------------------------------------------------------------
+# Card dumps are thousands of clips in nested DCIM folders. IngestIndexer
+# walks a tree with os.scandir (no per-directory listdir + stat round trips)
+# and sorts eligible inputs into "pending" and "done", where done means a
+# {stem}{output_prefix}.mkv sits next to the clip and passes the quick
+# header verification for the current HDR profile.
+#
+# Verification results are cached in INGEST_INDEX_FILE keyed by the
+# input's and output's (mtime, size) and the settings profile (prefix, HDR
+# values, LUT name + content hash), so a re-scan of an unchanged 10k-file
+# tree is just the directory walk and a dict lookup per clip.
+# ----------------------------------------------------------------------------
+INGEST_INDEX_FILE = 'ingest_index.json'
+
+
+class IngestIndexer:
+    def __init__(self, index_file=INGEST_INDEX_FILE):
+        self.index_file = index_file
+        self.entries = {}   # abs input path -> cached state, see scan()
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            print(f'[IngestIndexer.load] Error loading index: {str(e)}')
+            self.entries = {}
+
+    def save(self):
+        try:
+            save_json_state(self.index_file, self.entries, self._lock)
+        except Exception as e:
+            print(f'[IngestIndexer.save] Error saving index: {str(e)}')
+
+    @staticmethod
+    def profile_key(output_prefix, expected_hdr, expected_attachment):
+        """Identify the settings a cached 'done' verdict was computed for.
+
+        The LUT counts by name *and* contents: re-exporting a look under the
+        same file name must not leave old outputs marked done.
+        """
+        hdr = ','.join(f'{k}={(v or "").strip()}' for k, v in sorted((expected_hdr or {}).items()))
+        lut = ''
+        if expected_attachment:
+            try:
+                digest = lut_file_hash(expected_attachment)
+            except OSError:
+                digest = 'unreadable'
+            lut = f'{os.path.basename(expected_attachment)}:{digest}'
+        return f'{output_prefix}|{hdr}|{lut}'
+
+    @staticmethod
+    def iter_inputs(root, output_prefix):
+        """Yield os.DirEntry objects for every eligible input under root."""
+        output_suffix = f'{output_prefix}.mkv'.lower()
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        name = entry.name
+                        # Hidden folders on camera cards are OS junk
+                        # (.Trashes, .Spotlight-V100, ...), never footage.
+                        if name.startswith('.'):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                continue
+                        except OSError:
+                            continue
+                        lower = name.lower()
+                        if lower.endswith(VIDEO_EXTENSIONS) and not lower.endswith(output_suffix):
+                            yield entry
+            except OSError as e:
+                print(f'[IngestIndexer.iter_inputs] Cannot scan {directory}: {e}')
+
+    def scan(self, root, output_prefix, expected_hdr=None, expected_attachment=None):
+        """Index root and return {'pending', 'done', 'scanned', 'verified', 'seconds'}.
+
+        pending/done are sorted lists of absolute input paths. 'verified' is
+        how many outputs had to be (re)checked because the cache was stale.
+        """
+        started = time.monotonic()
+        key = self.profile_key(output_prefix, expected_hdr, expected_attachment)
+        pending, done = [], []
+        verified = changed = 0
+        for entry in self.iter_inputs(os.path.abspath(root), output_prefix):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            path = entry.path
+            output_path = os.path.join(os.path.dirname(path),
+                                       f'{os.path.splitext(entry.name)[0]}{output_prefix}.mkv')
+            try:
+                out_st = os.stat(output_path)
+                out_sig = [out_st.st_mtime, out_st.st_size]
+            except OSError:
+                out_sig = None
+
+            cached = self.entries.get(path)
+            if (cached and cached['mtime'] == st.st_mtime and cached['size'] == st.st_size
+                    and cached['output'] == out_sig and cached['profile'] == key):
+                ok = cached['done']
+            else:
+                ok = False
+                if out_sig is not None:
+                    ok = _verify_quick(path, output_path, expected_hdr, expected_attachment)[0]
+                    verified += 1
+                with self._lock:
+                    self.entries[path] = {'mtime': st.st_mtime, 'size': st.st_size,
+                                          'output': out_sig, 'profile': key, 'done': ok}
+                changed += 1
+            (done if ok else pending).append(path)
+
+        if changed:
+            self.save()
+        pending.sort()
+        done.sort()
+        return {'pending': pending, 'done': done, 'scanned': len(pending) + len(done),
+                'verified': verified, 'seconds': time.monotonic() - started}
+
+    def mark_done(self, input_path, output_path, output_prefix,
+                  expected_hdr=None, expected_attachment=None):
+        """Record a freshly verified job so the next scan skips it without re-checking."""
+        path = os.path.abspath(input_path)
+        try:
+            st = os.stat(path)
+            out_st = os.stat(output_path)
+        except OSError:
+            return
+        with self._lock:
+            self.entries[path] = {
+                'mtime': st.st_mtime, 'size': st.st_size,
+                'output': [out_st.st_mtime, out_st.st_size],
+                'profile': self.profile_key(output_prefix, expected_hdr, expected_attachment),
+                'done': True,
+            }
+        self.save()
+
+# ----------------------------------------------------------------------------
+# Duplicate-content detection.
+# ----------------------------------------------------------------------------
+# The same clip regularly shows up twice — copied off two cards, or renamed
+# by an offload tool. content_fingerprint() identifies a clip without
+# reading all of it: file size + a hash of the MP4 'moov' header (sample
+# tables, timestamps, encoder info — unique per recording) + FINGERPRINT_SAMPLES
+# fixed-offset windows read through mmap. DedupeHistory remembers which
+# tagged output each fingerprint produced under which profile, so a repeat
+# can reuse that output instead of paying for another full mkvmerge pass.
+# ----------------------------------------------------------------------------
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+FINGERPRINT_HEADER_BYTES = 1024 * 1024   # hashed instead of moov for non-MP4 inputs
+DEDUPE_HISTORY_FILE = 'fingerprint_history.json'
+
+# What to do when an input's content was already muxed with the same profile.
+#   link   hard-link the existing output to this input's output name (falls
+#          back to reuse when the filesystem can't link)
+#   reuse  skip the mux and just point the job at the existing output
+#   off    always run mkvmerge
+DEDUPE_MODES = ['link', 'reuse', 'off']
+DEDUPE_MODE_OPTIONS = [
+    ('Link existing output',  'link'),
+    ('Reuse existing output', 'reuse'),
+    ('Off (always mux)',      'off'),
+]
+
+
+def _find_mp4_box(buf, box_type):
+    """Return (start, end) of a top-level ISO-BMFF box's payload, or None."""
+    pos = 0
+    end = len(buf)
+    while pos + 8 <= end:
+        size = int.from_bytes(buf[pos:pos + 4], 'big')
+        kind = bytes(buf[pos + 4:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return None
+            size = int.from_bytes(buf[pos + 8:pos + 16], 'big')
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return None
+        if kind == box_type:
+            return pos + header, min(pos + size, end)
+        pos += size
+    return None
+
+
+def content_fingerprint(path):
+    """Cheap content identity for a clip (hex string); see the section comment."""
+    digest = hashlib.blake2b(digest_size=20)
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    if size == 0:
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            moov = _find_mp4_box(buf, b'moov')
+            if moov:
+                digest.update(b'moov')
+                digest.update(buf[moov[0]:moov[1]])
+            else:
+                digest.update(buf[:FINGERPRINT_HEADER_BYTES])
+            span = max(size - FINGERPRINT_SAMPLE_BYTES, 0)
+            for i in range(FINGERPRINT_SAMPLES):
+                offset = span * i // (FINGERPRINT_SAMPLES - 1)
+                digest.update(buf[offset:offset + FINGERPRINT_SAMPLE_BYTES])
+    return digest.hexdigest()
+
+
+class DedupeHistory:
+    """Persistent fingerprint -> tagged output map, scoped by profile key."""
+
+    def __init__(self, history_file=DEDUPE_HISTORY_FILE):
+        self.history_file = history_file
+        self.entries = {}   # '{fingerprint}|{profile}' -> {'input', 'output'}
+        self._lock = threading.Lock()
+        if os.path.exists(history_file):
+            try:
+                with open(history_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f'[DedupeHistory.__init__] Error loading history: {str(e)}')
+
+    def lookup(self, fingerprint, profile):
+        """Existing output for this content + profile, if it's still on disk."""
+        with self._lock:
+            entry = self.entries.get(f'{fingerprint}|{profile}')
+        if entry and os.path.exists(entry['output']):
+            return entry['output']
+        return None
+
+    def record(self, fingerprint, profile, input_path, output_path):
+        with self._lock:
+            self.entries[f'{fingerprint}|{profile}'] = {'input': input_path, 'output': output_path}
+        try:
+            save_json_state(self.history_file, self.entries, self._lock)
+        except Exception as e:
+            print(f'[DedupeHistory.record] Error saving history: {str(e)}')
+
+
+def find_duplicate_groups(fingerprints):
+    """Group paths by fingerprint; returns only groups with more than one path."""
+    groups = {}
+    for path, fingerprint in fingerprints.items():
+        groups.setdefault(fingerprint, []).append(path)
+    return [paths for paths in groups.values() if len(paths) > 1]
+
+# ----------------------------------------------------------------------------
+# Contact sheet thumbnails.
+# ----------------------------------------------------------------------------
+# Reviewing a 300-clip ingest means eyeballing one frame per clip plus its
+# transfer / range tags. generate_contact_sheet() pulls one keyframe per clip
+# with ffmpeg (-skip_frame nokey, -ss before -i, so only the nearest
+# keyframe is decoded), optionally through the .cube, on a pool of
+# concurrent ffmpeg processes, reporting each clip as soon as it's ready.
+#
+# Thumbnails are PNGs in THUMBNAIL_CACHE_DIR named by content fingerprint
+# (see content_fingerprint), LUT hash and width. The index file maps each
+# path's (mtime, size) to its fingerprint and source tags, so a re-run on an
+# unchanged folder is a stat + dict lookup + PNG read per clip: no
+# fingerprint reads, no ffprobe, no ffmpeg.
+# ----------------------------------------------------------------------------
+THUMBNAIL_CACHE_DIR = 'thumbnail_cache'
+THUMBNAIL_WIDTH = 192
+THUMBNAIL_POSITION = 0.1          # fraction into the clip to take the frame from
+THUMBNAIL_MAX_WORKERS = max(2, min(8, os.cpu_count() or 2))
+THUMBNAIL_TIMEOUT = 60
+CONTACT_SHEET_COLUMNS = 5
+
+# Transfer tag -> short badge text on the sheet.
+TRANSFER_BADGES = {'1': 'SDR', '6': 'SDR', '14': 'SDR', '15': 'SDR', '16': 'PQ', '18': 'HLG'}
+
+
+def transfer_badge(transfer, colour_range=''):
+    """'HLG limited' / 'PQ full' / '?' style label for a clip's source tags."""
+    badge = TRANSFER_BADGES.get(transfer, f'TRC {transfer}' if transfer else '?')
+    if colour_range:
+        badge += ' full' if colour_range == '2' else ' limited'
+    return badge
+
+
+class ThumbnailCache:
+    """Disk cache of contact-sheet thumbnails plus a path -> fingerprint index."""
+
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.entries = {}   # abs path -> {'mtime', 'size', 'fingerprint', 'transfer', 'range', 'duration'}
+        self._lock = threading.Lock()
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f'[ThumbnailCache.__init__] Error loading index: {str(e)}')
+
+    def save(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            save_json_state(self.index_file, self.entries, self._lock)
+        except Exception as e:
+            print(f'[ThumbnailCache.save] Error saving index: {str(e)}')
+
+    def describe(self, path):
+        """Fingerprint + source tags for path, recomputed only when it changed."""
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry
+        entry = {'mtime': st.st_mtime_ns, 'size': st.st_size,
+                 'fingerprint': content_fingerprint(path)}
+        if os.path.splitext(path)[1].lower() in MKV_EXTENSIONS:
+            try:
+                summary = read_mkv_summary(path)
+            except (OSError, ValueError):
+                summary = {'colour': {}, 'duration_s': 0.0}
+            entry.update(transfer=summary['colour'].get('transfer', ''),
+                         range=summary['colour'].get('colour_range', ''),
+                         duration=summary['duration_s'])
+        else:
+            source = probe_source_signal(path)
+            entry.update(transfer=source['transfer'], range=source['range'],
+                         duration=source['duration'])
+        with self._lock:
+            self.entries[key] = entry
+        return entry
+
+    def thumbnail_path(self, fingerprint, lut_hash=''):
+        return os.path.join(self.cache_dir,
+                            f'{fingerprint}_{lut_hash or "nolut"}_{THUMBNAIL_WIDTH}.png')
+
+
+def extract_thumbnail(input_path, thumbnail_path, timestamp, lut_path=None):
+    """Write one keyframe near timestamp as a THUMBNAIL_WIDTH-wide PNG."""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError('ffmpeg not found on PATH')
+    filters = [f'scale={THUMBNAIL_WIDTH}:-2']
+    if lut_path:
+        filters.append(f"lut3d=file='{_ffmpeg_filter_path(lut_path)}'")
+    os.makedirs(os.path.dirname(thumbnail_path) or '.', exist_ok=True)
+    # Write next to the final name and rename, so a killed run never leaves
+    # a truncated PNG that later runs would treat as cached.
+    partial = f'{thumbnail_path}.{os.getpid()}.{threading.get_ident()}.png'
+    cmd = [ffmpeg, '-nostdin', '-v', 'error', '-skip_frame', 'nokey',
+           '-ss', f'{timestamp:.3f}', '-i', input_path,
+           '-frames:v', '1', '-an', '-sn', '-vf', ','.join(filters), '-y', partial]
+    try:
+        result = subprocess.run(prioritized(cmd), capture_output=True, text=True,
+                                timeout=THUMBNAIL_TIMEOUT, creationflags=child_creationflags())
+        if result.returncode != 0 or not os.path.exists(partial):
+            detail = result.stderr.strip().splitlines()
+            raise RuntimeError(detail[-1] if detail else f'ffmpeg exit {result.returncode}')
+        os.replace(partial, thumbnail_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def generate_contact_sheet(paths, lut_path=None, on_result=None, cache=None, stop_event=None):
+    """Produce a cached thumbnail for every path, calling on_result as each finishes.
+
+    on_result(result) gets {'input', 'thumbnail' (PNG path or ''), 'transfer',
+    'range', 'cached', 'error'} from a worker thread. Returns totals:
+    {'total', 'cached', 'generated', 'failed', 'seconds'}.
+    """
+    cache = cache or ThumbnailCache()
+    started = time.monotonic()
+    lut_hash = lut_file_hash(lut_path) if lut_path else ''
+
+    def one(path):
+        result = {'input': path, 'thumbnail': '', 'transfer': '', 'range': '',
+                  'cached': False, 'error': ''}
+        try:
+            entry = cache.describe(path)
+            result.update(transfer=entry['transfer'], range=entry['range'])
+            thumbnail = cache.thumbnail_path(entry['fingerprint'], lut_hash)
+            if os.path.exists(thumbnail):
+                result['cached'] = True
+            else:
+                extract_thumbnail(path, thumbnail, entry['duration'] * THUMBNAIL_POSITION, lut_path)
+            result['thumbnail'] = thumbnail
+        except (RuntimeError, OSError, ValueError, subprocess.TimeoutExpired) as e:
+            result['error'] = str(e)
+        return result
+
+    totals = {'total': len(paths), 'cached': 0, 'generated': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=THUMBNAIL_MAX_WORKERS, initializer=pin_analysis_thread) as pool:
+        futures = [pool.submit(one, path) for path in paths]
+        for future in as_completed(futures):
+            if stop_event is not None and stop_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                break
+            result = future.result()
+            if result['error']:
+                totals['failed'] += 1
+            elif result['cached']:
+                totals['cached'] += 1
+            else:
+                totals['generated'] += 1
+            if on_result:
+                on_result(result)
+    cache.save()
+    totals['seconds'] = time.monotonic() - started
+    return totals
+
+
+# ----------------------------------------------------------------------------
+# SDR proxies.
+# ----------------------------------------------------------------------------
+# Editors cut on lightweight SDR proxies with the same .cube applied. With
+# proxies enabled, every clip that muxes successfully is also handed to a
+# ProxyBuilder, which encodes {clip dir}/proxies/{stem}_{ext}_proxy.mp4
+# through ffmpeg's scale + lut3d while the batch moves on to the next mux.
+# The extension stays in the name so clip.mov and clip.mp4 get their own.
+#
+# The LUT works on RGB, so the source is converted with its own matrix and
+# range (from the job's HDR tags; ffmpeg's guess otherwise, which is BT.601
+# for untagged streams), and the LUT's output goes back to limited-range
+# BT.709 YUV to match the BT.709 tags the proxy is written with.
+#
+# Encodes run as concurrent ffmpeg processes (PROXY_MAX_WORKERS at a time),
+# each limited to PROXY_FFMPEG_THREADS threads: x264 scales poorly past a
+# handful of threads at proxy sizes, so a few narrow encodes side by side
+# finish a batch sooner than one wide encode after another.
+#
+# proxy_index.json records, per proxy, the source fingerprint (see
+# content_fingerprint), LUT hash and encode settings it was made from; a
+# proxy whose record still matches is skipped without starting ffmpeg.
+#
+# Closing the window asks first while encodes are outstanding; stopping
+# cancels the queued ones and terminates the running ffmpeg children
+# (ProxyBuilder.shutdown), so no pool thread keeps the process alive.
+# ----------------------------------------------------------------------------
+PROXY_INDEX_FILE = 'proxy_index.json'
+PROXY_DIR_NAME = 'proxies'
+PROXY_HEIGHT = 540
+PROXY_CRF = 23
+PROXY_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 4))
+PROXY_FFMPEG_THREADS = max(1, (os.cpu_count() or 1) // PROXY_MAX_WORKERS)
+PROXY_TIMEOUT = 6 * 60 * 60
+
+# Matroska MatrixCoefficients / Range codes -> ffmpeg scale option values.
+_PROXY_MATRICES = {'1': 'bt709', '4': 'fcc', '5': 'bt470', '6': 'smpte170m',
+                   '7': 'smpte240m', '9': 'bt2020', '10': 'bt2020'}
+_PROXY_RANGES = {'1': 'tv', '2': 'pc'}
+
+
+def proxy_path_for(input_path):
+    """{clip dir}/proxies/{stem}_{ext}_proxy.mp4"""
+    path = Path(input_path)
+    ext = path.suffix[1:].lower()
+    return str(path.parent / PROXY_DIR_NAME / f"{path.stem}{'_' + ext if ext else ''}_proxy.mp4")
+
+
+def proxy_colour(hdr=None):
+    """(matrix, range) of the source for ffmpeg's scale, from HDR panel values."""
+    hdr = hdr or {}
+    return (_PROXY_MATRICES.get(str(hdr.get('colour_matrix') or '').strip(), 'auto'),
+            _PROXY_RANGES.get(str(hdr.get('colour_range') or '').strip(), 'auto'))
+
+
+def build_proxy(input_path, lut_path, proxy_path, threads=PROXY_FFMPEG_THREADS, hdr=None,
+                children=None):
+    """Encode a PROXY_HEIGHT-line H.264 SDR proxy of input_path through lut_path.
+
+    hdr (HDR panel values) says which matrix and range the source is in.
+    The ffmpeg Popen is added to children (a set) while it runs, so the
+    caller can terminate it.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError('ffmpeg not found on PATH')
+    os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+    matrix, signal_range = proxy_colour(hdr)
+    # Scale before the LUT so lut3d touches a quarter of the pixels; the
+    # same pass converts to RGB with the source's matrix and range. The
+    # second scale only converts the LUT's RGB to limited-range BT.709.
+    filters = (f"scale=-2:{PROXY_HEIGHT}:in_color_matrix={matrix}:in_range={signal_range},"
+               f"format=gbrp16le,lut3d=file='{_ffmpeg_filter_path(lut_path)}',"
+               f"scale=out_color_matrix=bt709:out_range=tv,format=yuv420p")
+    partial = f'{proxy_path}.partial.mp4'
+    cmd = [ffmpeg, '-nostdin', '-v', 'error', '-i', input_path,
+           '-map', '0:v:0', '-map', '0:a:0?', '-vf', filters,
+           '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(PROXY_CRF),
+           '-threads', str(threads),
+           '-colorspace', 'bt709', '-color_primaries', 'bt709', '-color_trc', 'bt709',
+           '-color_range', 'tv',
+           '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', '-y', partial]
+    children = set() if children is None else children
+    try:
+        process = subprocess.Popen(prioritized(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, creationflags=child_creationflags())
+        children.add(process)
+        try:
+            _stdout, stderr = process.communicate(timeout=PROXY_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            children.discard(process)
+        if process.returncode != 0 or not os.path.exists(partial):
+            detail = stderr.strip().splitlines()
+            raise RuntimeError(detail[-1] if detail else f'ffmpeg exit {process.returncode}')
+        os.replace(partial, proxy_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+class ProxyBuilder:
+    """Bounded pool of proxy encodes plus the index that keeps them up to date."""
+
+    def __init__(self, index_file=PROXY_INDEX_FILE, max_workers=PROXY_MAX_WORKERS):
+        self.index_file = index_file
+        self.entries = {}   # abs proxy path -> {'source', 'fingerprint', 'lut_hash', 'settings'}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='proxy',
+                                        initializer=pin_analysis_thread)
+        self._futures = set()    # submitted and not yet finished
+        self._children = set()   # running ffmpeg Popens
+        self._stopping = False
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f'[ProxyBuilder.__init__] Error loading index: {str(e)}')
+
+    def save(self):
+        try:
+            # Encodes finish on several threads.
+            save_json_state(self.index_file, self.entries, self._lock)
+        except Exception as e:
+            print(f'[ProxyBuilder.save] Error saving index: {str(e)}')
+
+    def submit(self, input_path, lut_path, fingerprint=None, hdr=None):
+        """Queue a proxy for input_path; returns a Future of the result dict.
+
+        Result: {'input', 'proxy', 'skipped', 'seconds', 'error'}. Pass the
+        batch's fingerprint when there is one to save re-reading the source,
+        and the clip's HDR values so its matrix and range are known.
+        """
+        future = self._pool.submit(self._run, input_path, lut_path, fingerprint, hdr)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def pending(self):
+        """Encodes queued or running."""
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self):
+        """Cancel queued encodes and terminate running ffmpeg children (app exit)."""
+        self._stopping = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for process in list(self._children):
+            try:
+                process.terminate()
+            except OSError:
+                pass
+
+    def _run(self, input_path, lut_path, fingerprint, hdr):
+        proxy_path = proxy_path_for(input_path)
+        result = {'input': input_path, 'proxy': proxy_path, 'skipped': False,
+                  'seconds': 0.0, 'error': ''}
+        started = time.monotonic()
+        try:
+            record = {'source': os.path.abspath(input_path),
+                      'fingerprint': fingerprint or content_fingerprint(input_path),
+                      'lut_hash': lut_file_hash(lut_path),
+                      'settings': '/'.join((f'{PROXY_HEIGHT}p', f'crf{PROXY_CRF}') + proxy_colour(hdr))}
+            key = os.path.abspath(proxy_path)
+            with self._lock:
+                current = self.entries.get(key) == record and os.path.exists(proxy_path)
+            if current:
+                result['skipped'] = True
+            elif self._stopping:
+                raise RuntimeError('stopped: the app is closing')
+            else:
+                build_proxy(input_path, lut_path, proxy_path, hdr=hdr, children=self._children)
+                with self._lock:
+                    self.entries[key] = record
+                self.save()
+        except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            result['error'] = str(e)
+        result['seconds'] = time.monotonic() - started
+        EVENT_LOG.emit('proxy', input=input_path, proxy=proxy_path, skipped=result['skipped'],
+                       seconds=result['seconds'], ok=not result['error'], detail=result['error'])
+        return result
+
+
+# ----------------------------------------------------------------------------
+# Local job server + distributed workers.
+# ----------------------------------------------------------------------------
+# One workstation only muxes so fast. JobServer holds a FIFO of run_mux_job()
+# specs behind a tiny JSON-over-HTTP API; workers on this or any other
+# machine pull jobs, run mkvmerge + verification, and report status and
+# metrics back. Input/LUT paths in a spec must resolve on the worker (shared
+# storage mounted at the same path), since only paths travel over the wire.
+#
+#   POST /jobs                 submit a spec            -> job
+#   GET  /jobs                 every job                -> [job, ...]
+#   GET  /jobs/<id>            one job                  -> job
+#   POST /claim                {"worker": name}         -> job, or 204 if idle
+#   POST /jobs/<id>/status     {"worker", "status", "progress", "detail", "metrics"}
+#   GET  /metrics              Prometheus text (METRICS)
+#
+# A running job whose worker stops reporting for JOB_LEASE_SECONDS goes back
+# on the queue, so a worker that dies mid-mux doesn't lose the job. Workers
+# heartbeat every JOB_HEARTBEAT_SECONDS for the whole job (verification
+# included), and a status update from anyone but the job's current lease
+# holder is refused with 409, so a worker that lost its lease can't
+# overwrite the result of the one now running the job.
+#
+# Specs name paths the workers write next to, so output_prefix must be a
+# plain suffix (no separators, no ".."). Only loopback binds work without
+# a shared token; any other bind needs one, and every request must then
+# carry "Authorization: Bearer <token>" (401 otherwise). The token comes
+# from --job-token or $HDR_JOB_TOKEN, and reaches local workers through
+# the environment rather than their command line.
+#
+# Everything runs on one box for testing:
+#   python hdr_gui.py --serve 8765 --local-workers 2
+# ----------------------------------------------------------------------------
+JOB_SERVER_DEFAULT_URL = 'http://127.0.0.1:8765'
+JOB_TOKEN_ENV = 'HDR_JOB_TOKEN'
+JOB_LEASE_SECONDS = 120
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 4
+JOB_POLL_SECONDS = 2.0
+JOB_PROGRESS_INTERVAL = 1.0   # min seconds between worker progress reports
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class JobLeaseError(Exception):
+    """A status update came from a worker that doesn't hold the job's lease."""
+
+
+def _is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class JobServer:
+    def __init__(self, host='127.0.0.1', port=8765, token=None):
+        if not token and not _is_loopback(host):
+            raise ValueError(f'Serving jobs on {host or "all interfaces"} needs a token '
+                             f'(--job-token or ${JOB_TOKEN_ENV})')
+        self.token = token or ''
+        self.jobs = {}          # id -> job dict
+        self._queue = []        # ids waiting for a worker, FIFO
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.httpd = ThreadingHTTPServer((host, port), _JobRequestHandler)
+        self.httpd.job_server = self
+        METRICS.track('hdr_queue_depth', lambda: len(self._queue), queue='jobs')
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def submit(self, spec):
+        for key in ('input', 'lut', 'output_prefix'):
+            if not isinstance(spec.get(key), str):
+                raise ValueError(f'Job spec is missing "{key}"')
+        # output_path_for() appends the prefix to the input's stem; anything
+        # path-like would let a spec write outside the input's folder. Both
+        # separators are refused, since workers needn't share this OS.
+        prefix = spec['output_prefix']
+        if '/' in prefix or '\\' in prefix or '..' in prefix:
+            raise ValueError(f'Job spec "output_prefix" must be a plain suffix: {prefix!r}')
+        if spec.get('hdr') is not None:
+            if not isinstance(spec['hdr'], dict):
+                raise ValueError('Job spec "hdr" must be an object')
+            # HDRProfileError is a ValueError, so the client gets a 400.
+            compile_hdr_profile(spec['hdr'])
+        with self._lock:
+            job_id = str(next(self._ids))
+            EVENT_LOG.emit('job_submitted', job_id=job_id, input=spec['input'])
+            job = {'id': job_id, 'spec': spec, 'status': 'queued', 'worker': '',
+                   'progress': 0, 'detail': '', 'metrics': {},
+                   'submitted': time.time(), 'started': None, 'finished': None,
+                   'heartbeat': None}
+            self.jobs[job_id] = job
+            self._queue.append(job_id)
+            return dict(job)
+
+    def claim(self, worker):
+        """Hand the oldest queued job to worker, re-queueing expired leases first."""
+        now = time.time()
+        with self._lock:
+            for job in self.jobs.values():
+                if job['status'] == 'running' and now - job['heartbeat'] > JOB_LEASE_SECONDS:
+                    job.update(status='queued', worker='', progress=0,
+                               detail=f'Lease expired on {job["worker"]}, re-queued')
+                    self._queue.append(job['id'])
+            while self._queue:
+                job = self.jobs[self._queue.pop(0)]
+                if job['status'] != 'queued':
+                    continue
+                job.update(status='running', worker=worker, started=now, heartbeat=now)
+                return dict(job)
+        return None
+
+    def update(self, job_id, fields):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job['status'] != 'running' or fields.get('worker') != job['worker']:
+                raise JobLeaseError(f'Job {job_id} is not leased to "{fields.get("worker")}"')
+            status = fields.get('status', job['status'])
+            if status not in JOB_STATUSES:
+                raise ValueError(f'Unknown status "{status}"')
+            job['status'] = status
+            job['heartbeat'] = time.time()
+            for key in ('progress', 'detail', 'metrics'):
+                if key in fields:
+                    job[key] = fields[key]
+            if status in ('done', 'failed'):
+                job['finished'] = job['heartbeat']
+                EVENT_LOG.emit('job_reported', job_id=job_id, worker=job['worker'],
+                               status=status, detail=job['detail'], metrics=job['metrics'])
+            return dict(job)
+
+    def snapshot(self, job_id=None):
+        with self._lock:
+            if job_id is not None:
+                job = self.jobs.get(job_id)
+                return dict(job) if job else None
+            return [dict(job) for job in self.jobs.values()]
+
+    def start(self):
+        """Serve on a daemon thread (GUI / tests). Returns the thread."""
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON request routing for JobServer (see the section comment)."""
+
+    def log_message(self, format, *args):
+        # The default handler writes every request to stderr; workers poll
+        # every couple of seconds, so that would drown the real output.
+        pass
+
+    def _reply(self, code, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        if not isinstance(body, dict):
+            raise ValueError('Request body must be a JSON object')
+        return body
+
+    def _authorized(self):
+        token = self.server.job_server.token
+        if not token:
+            return True
+        supplied = self.headers.get('Authorization') or ''
+        if hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return True
+        self._reply(401, {'error': 'missing or wrong job token'})
+        return False
+
+    def do_GET(self):
+        server = self.server.job_server
+        if not self._authorized():
+            return
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if parts == ['metrics']:
+            body = METRICS.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if parts == ['jobs']:
+            return self._reply(200, server.snapshot())
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = server.snapshot(parts[1])
+            return self._reply(200, job) if job else self._reply(404, {'error': 'no such job'})
+        self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        server = self.server.job_server
+        if not self._authorized():
+            return
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        try:
+            body = self._body()
+            if parts == ['jobs']:
+                return self._reply(201, server.submit(body))
+            if parts == ['claim']:
+                job = server.claim(str(body.get('worker') or self.client_address[0]))
+                return self._reply(200, job) if job else self._reply(204)
+            if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'status':
+                return self._reply(200, server.update(parts[1], body))
+        except KeyError:
+            return self._reply(404, {'error': 'no such job'})
+        except JobLeaseError as e:
+            return self._reply(409, {'error': str(e)})
+        except ValueError as e:
+            return self._reply(400, {'error': str(e)})
+        self._reply(404, {'error': 'not found'})
+
+
+class JobClient:
+    """Minimal urllib client for JobServer's API."""
+
+    def __init__(self, base_url=JOB_SERVER_DEFAULT_URL, timeout=10, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token = os.environ.get(JOB_TOKEN_ENV, '') if token is None else token
+
+    def _request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+        return json.loads(body) if body else None
+
+    def submit(self, spec):
+        return self._request('POST', '/jobs', spec)
+
+    def jobs(self):
+        return self._request('GET', '/jobs')
+
+    def claim(self, worker):
+        return self._request('POST', '/claim', {'worker': worker})
+
+    def update(self, job_id, **fields):
+        return self._request('POST', f'/jobs/{job_id}/status', fields)
+
+
+def run_worker(server_url, name=None, mkvmerge_path=None,
+               poll_interval=JOB_POLL_SECONDS, stop_event=None, token=None):
+    """Pull jobs from a JobServer until stop_event is set (forever by default)."""
+    client = JobClient(server_url, token=token)
+    name = name or f'{platform.node()}:{os.getpid()}'
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            job = client.claim(name)
+        except (urllib.error.URLError, OSError) as e:
+            print(f'[run_worker] Job server unreachable: {e}')
+            stop_event.wait(poll_interval)
+            continue
+        if not job:
+            stop_event.wait(poll_interval)
+            continue
+
+        print(f'[run_worker] {name} running job {job["id"]}: {job["spec"]["input"]}')
+        last_report = [0.0]
+
+        def on_line(line, job_id=job['id']):
+            match = MKVMERGE_PROGRESS_RE.search(line)
+            now = time.monotonic()
+            if match and now - last_report[0] >= JOB_PROGRESS_INTERVAL:
+                last_report[0] = now
+                try:
+                    client.update(job_id, worker=name, status='running', progress=int(match.group(1)))
+                except (urllib.error.URLError, OSError):
+                    pass
+
+        # Progress lines only come from the mux itself; probing, hooks and
+        # verification can run longer than the lease without printing any.
+        job_done = threading.Event()
+
+        def heartbeat(job_id=job['id']):
+            while not job_done.wait(JOB_HEARTBEAT_SECONDS):
+                try:
+                    client.update(job_id, worker=name, status='running')
+                except urllib.error.HTTPError as e:
+                    print(f'[run_worker] Lost the lease on job {job_id}: {e}')
+                    return
+                except (urllib.error.URLError, OSError):
+                    pass
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        profiler = JobProfiler('job', job['spec']['input'])
+        try:
+            with profiler:
+                result = run_mux_job(job['spec'], mkvmerge_path, on_line=on_line)
+        except Exception as e:
+            result = {'ok': False, 'detail': str(e), 'metrics': {}}
+        finally:
+            job_done.set()
+            heartbeat_thread.join()
+        if profiler.summary:
+            print(format_profile_summary(profiler.summary))
+            result['metrics']['profile'] = profiler.summary
+        try:
+            client.update(job['id'], worker=name, status='done' if result['ok'] else 'failed',
+                          progress=100 if result['ok'] else 0,
+                          detail=result['detail'], metrics=result['metrics'])
+        except (urllib.error.URLError, OSError) as e:
+            # The lease will expire and the job gets re-run elsewhere.
+            print(f'[run_worker] Could not report job {job["id"]}: {e}')
+
+
+def spawn_local_workers(server_url, count, mkvmerge_path=None, plugin_dir=PLUGIN_DIR, token=None):
+    """Start count worker processes on this machine (stand-ins for other boxes)."""
+    script = os.path.abspath(__file__)
+    # Through the environment: argv is visible to every user on the box.
+    env = dict(os.environ)
+    if token:
+        env[JOB_TOKEN_ENV] = token
+    extra = ['--mkvmerge', mkvmerge_path] if mkvmerge_path else []
+    extra += ['--priority', _process_priority_name, '--plugin-dir', os.path.abspath(plugin_dir)]
+    if _profile_dir:
+        extra += ['--profile', _profile_dir]
+    if EVENT_LOG.path:
+        extra += ['--event-log', EVENT_LOG.path]
+    return [subprocess.Popen([sys.executable, script, '--worker', server_url,
+                              '--worker-name', f'{platform.node()}-local{i + 1}'] + extra,
+                             env=env, creationflags=NO_WINDOW_FLAGS)
+            for i in range(count)]
 
 
 class HDRVideoProcessor:
-    def __init__(self):
+    def __init__(self, startup_messages=()):
         self.root = TkinterDnD.Tk()
         self.root.title("HDR Video Processor")
         self.root.geometry("1280x720")  # Set default window size
@@ -316,6 +5217,13 @@ class HDRVideoProcessor:
         self.save_video_path = tk.BooleanVar(value=True)  # Default to True
         self.save_lut_path = tk.BooleanVar(value=True)    # Default to True
         self.config = ConfigHandler()  # Load configuration
+        if self.config.event_log:
+            EVENT_LOG.configure(self.config.event_log)
+        if self.config.metrics_port:
+            try:
+                start_metrics_server(self.config.metrics_port)
+            except OSError as e:
+                print(f"[__init__] Could not start metrics endpoint: {e}")
         self.output_prefix = tk.StringVar(value=self.config.output_prefix)
 
         # Initialize variables with saved preferences
@@ -340,12 +5248,76 @@ class HDRVideoProcessor:
         self.hdr_white_point = tk.StringVar(value=self.config.hdr_white_point)
         self.hdr_max_luminance = tk.StringVar(value=self.config.hdr_max_luminance)
         self.hdr_min_luminance = tk.StringVar(value=self.config.hdr_min_luminance)
+        # Built-in presets + the user's profile library, compiled up front;
+        # the panel's own values are compiled lazily and dropped on edit.
+        self.hdr_profiles, profile_errors = load_hdr_profiles()
+        self._hdr_profile = None
+
+        # Verification level for muxed outputs (see VERIFY_LEVELS) and the
+        # per-job record of what was run and how long it took.
+        self.verify_level = tk.StringVar(value=self.config.verify_level)
+        self.job_history = []
+
+        # Multi-file probing: path -> probe output text, plus the column to
+        # re-sort by and its direction for the file list.
+        self.probe_results = {}
+        self.ingest_index = IngestIndexer()
+        self.dedupe_history = DedupeHistory()
+        self.thumbnail_cache = ThumbnailCache()
+        self.signal_check = tk.BooleanVar(value=self.config.signal_check)
+        self.make_proxies = tk.BooleanVar(value=self.config.make_proxies)
+        self.proxy_builder = ProxyBuilder()
+        # Profiling is a diagnostic switch, so it isn't persisted; --profile
+        # DIR turns it on at start-up and picks the dump folder.
+        self.profile_jobs = tk.BooleanVar(value=profiling_enabled())
+        self._profile_dir = _profile_dir or PROFILE_DIR
+        self.profile_summaries = []
+
+        # Scopes for the active video: seconds into the clip, whether to look
+        # through the LUT, and full vs. preview resolution.
+        self.scope_cache = ScopeCache()
+        self.scope_time = tk.StringVar(value='0')
+        self.scope_use_lut = tk.BooleanVar(value=False)
+        self.scope_full_res = tk.BooleanVar(value=False)
+        self._scope_images = {}
+        self.dedupe_mode = tk.StringVar(value=self.config.dedupe_mode)
+        self.mux_backend = tk.StringVar(value=self.config.mux_backend)
+        self.process_priority = tk.StringVar(value=self.config.process_priority)
+        set_process_priority(self.config.process_priority)
+
+        # Jobs submitted to a JobServer: job id -> {'input', 'status'}.
+        self.job_server_url = tk.StringVar(value=self.config.job_server_url)
+        self.remote_jobs = {}
+        self._remote_poll_pending = False
+
+        # Segmented mux for huge inputs — kept as text so a half-typed value
+        # doesn't throw inside a trace callback; parsed in _job_spec().
+        self.segment_threshold_gb = tk.StringVar(value=f'{self.config.segment_threshold_gb:g}')
+        self._file_list_sort = ('#0', False)
+        self.probe_scheduler = ProbeScheduler(
+            self._run_probe_worker,
+            lambda path, ok, output, generation: self.root.after(
+                0, lambda: self._on_probe_result(path, ok, output, generation)))
+
+        # Verified originals are trashed in the background; events come back
+        # on the worker thread and are marshalled onto Tk via after().
+        self.trash_queue = TrashQueue(
+            on_event=lambda kind, path, detail: self.root.after(
+                0, lambda: self._on_trash_event(kind, path, detail)))
 
         if self.config.last_video_path and os.path.exists(self.config.last_video_path):
             self.video_path.set(self.config.last_video_path)
         if self.config.last_lut_path and os.path.exists(self.config.last_lut_path):
             self.lut_path.set(self.config.last_lut_path)
         self._setup_ui()
+        self._closing = False
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        # Shown once the output pane exists, so a typo in hdr_profiles.json
+        # isn't only visible on a console the user never sees.
+        for error in profile_errors:
+            self._log_output(f"Skipping HDR profile {error}")
+        for message in startup_messages:
+            self._log_output(message)
 
         # If the restored video path actually points at a file (not just a
         # directory), prime the instant-info panel on startup so the user
@@ -358,25 +5330,11 @@ class HDRVideoProcessor:
         
     def _get_mkvmerge_path(self):
         """Determine mkvmerge path based on platform"""
-        system = platform.system()
-        if system == "Windows":
-            if platform.machine().endswith('64'):
-                return "./windows/64bits/mkvmerge.exe"
-            else:
-                return "./windows/32bits/mkvmerge.exe"
-        else:  # MacOS or Linux
-            return "./macos/mkvmerge.app/Contents/MacOS/mkvmerge"
-            
+        return default_mkvmerge_path()
+
     def _get_mkvinfo_path(self):
         """Determine mkvinfo path based on platform"""
-        system = platform.system()
-        if system == "Windows":
-            if platform.machine().endswith('64'):
-                return "./windows/64bits/mkvinfo.exe"
-            else:
-                return "./windows/32bits/mkvinfo.exe"
-        else:  # MacOS or Linux
-            return "./macos/mkvinfo.app/Contents/MacOS/mkvinfo"
+        return default_mkvinfo_path()
 
     def _setup_ui(self):
         """Setup the GUI elements"""
@@ -423,6 +5381,8 @@ class HDRVideoProcessor:
         self.lut_label = tk.Label(self.root, textvariable=self.lut_path, 
                                  wraplength=1100, font=self.default_font)
         self.lut_label.pack(pady=5)
+        tk.Button(self.root, text="LUT Chain...", command=self.show_lut_chain,
+                  font=self.default_font).pack()
         
         # Output prefix frame
         prefix_frame = tk.Frame(self.root)
@@ -457,6 +5417,115 @@ class HDRVideoProcessor:
                       variable=self.delete_original,
                       font=self.default_font).pack()
 
+        tk.Checkbutton(checkbox_frame, text="Check Range/Transfer tags against sampled frames before muxing?",
+                      variable=self.signal_check,
+                      command=lambda: self.config.update_signal_check(self.signal_check.get()),
+                      font=self.default_font).pack()
+
+        tk.Checkbutton(checkbox_frame, text="Also make SDR proxies with the LUT applied (proxies/ folder)",
+                      variable=self.make_proxies,
+                      command=lambda: self.config.update_make_proxies(self.make_proxies.get()),
+                      font=self.default_font).pack()
+
+        profile_frame = tk.Frame(checkbox_frame)
+        profile_frame.pack()
+        tk.Checkbutton(profile_frame, text="Profile jobs (cProfile + tracemalloc)",
+                       variable=self.profile_jobs,
+                       command=lambda: set_profiling(self._profile_dir if self.profile_jobs.get() else None),
+                       font=self.default_font).pack(side=tk.LEFT)
+        tk.Button(profile_frame, text="Profiles...", command=self._show_profiles,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+
+        # Verification level — trades confidence against throughput. Same
+        # display-label -> raw-value combo pattern as the HDR enum fields.
+        verify_frame = tk.Frame(self.root)
+        verify_frame.pack(pady=5)
+        tk.Label(verify_frame, text="Verify output:",
+                 font=self.default_font).pack(side=tk.LEFT, padx=5)
+        verify_display = tk.StringVar(value=next(
+            (label for label, raw in VERIFY_LEVEL_OPTIONS if raw == self.verify_level.get()),
+            VERIFY_LEVEL_OPTIONS[0][0]))
+        verify_combo = ttk.Combobox(verify_frame, textvariable=verify_display,
+                                    values=[label for label, _raw in VERIFY_LEVEL_OPTIONS],
+                                    state='readonly', width=32, font=self.default_font)
+        verify_combo.pack(side=tk.LEFT, padx=5)
+
+        def on_verify_pick(_event):
+            for label, raw in VERIFY_LEVEL_OPTIONS:
+                if label == verify_display.get():
+                    self.verify_level.set(raw)
+                    self.config.update_verify_level(raw)
+                    return
+        verify_combo.bind('<<ComboboxSelected>>', on_verify_pick)
+
+        tk.Label(verify_frame, text="Duplicates:",
+                 font=self.default_font).pack(side=tk.LEFT, padx=5)
+        dedupe_display = tk.StringVar(value=next(
+            (label for label, raw in DEDUPE_MODE_OPTIONS if raw == self.dedupe_mode.get()),
+            DEDUPE_MODE_OPTIONS[0][0]))
+        dedupe_combo = ttk.Combobox(verify_frame, textvariable=dedupe_display,
+                                    values=[label for label, _raw in DEDUPE_MODE_OPTIONS],
+                                    state='readonly', width=22, font=self.default_font)
+        dedupe_combo.pack(side=tk.LEFT, padx=5)
+
+        def on_dedupe_pick(_event):
+            for label, raw in DEDUPE_MODE_OPTIONS:
+                if label == dedupe_display.get():
+                    self.dedupe_mode.set(raw)
+                    self.config.update_dedupe_mode(raw)
+                    return
+        dedupe_combo.bind('<<ComboboxSelected>>', on_dedupe_pick)
+
+        tk.Label(verify_frame, text="Muxer:",
+                 font=self.default_font).pack(side=tk.LEFT, padx=5)
+        backend_display = tk.StringVar(value=next(
+            (label for label, raw in MUX_BACKEND_OPTIONS if raw == self.mux_backend.get()),
+            MUX_BACKEND_OPTIONS[0][0]))
+        backend_combo = ttk.Combobox(verify_frame, textvariable=backend_display,
+                                     values=[label for label, _raw in MUX_BACKEND_OPTIONS],
+                                     state='readonly', width=22, font=self.default_font)
+        backend_combo.pack(side=tk.LEFT, padx=5)
+
+        def on_backend_pick(_event):
+            for label, raw in MUX_BACKEND_OPTIONS:
+                if label == backend_display.get():
+                    self.mux_backend.set(raw)
+                    self.config.update_mux_backend(raw)
+                    return
+        backend_combo.bind('<<ComboboxSelected>>', on_backend_pick)
+
+        tk.Label(verify_frame, text="Priority:",
+                 font=self.default_font).pack(side=tk.LEFT, padx=5)
+        priority_display = tk.StringVar(value=next(
+            (label for label, raw in PROCESS_PRIORITY_OPTIONS if raw == self.process_priority.get()),
+            PROCESS_PRIORITY_OPTIONS[1][0]))
+        priority_combo = ttk.Combobox(verify_frame, textvariable=priority_display,
+                                      values=[label for label, _raw in PROCESS_PRIORITY_OPTIONS],
+                                      state='readonly', width=22, font=self.default_font)
+        priority_combo.pack(side=tk.LEFT, padx=5)
+
+        def on_priority_pick(_event):
+            for label, raw in PROCESS_PRIORITY_OPTIONS:
+                if label == priority_display.get():
+                    self.process_priority.set(raw)
+                    self.config.update_process_priority(raw)
+                    set_process_priority(raw)
+                    return
+        priority_combo.bind('<<ComboboxSelected>>', on_priority_pick)
+
+        tk.Label(verify_frame, text="Parallel segments over (GB, 0 = off):",
+                 font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Entry(verify_frame, textvariable=self.segment_threshold_gb,
+                 font=self.default_font, width=6).pack(side=tk.LEFT, padx=5)
+
+        def on_segment_change(*_args):
+            try:
+                threshold = float(self.segment_threshold_gb.get() or 0)
+            except ValueError:
+                return
+            self.config.update_segmenting(threshold, self.config.segment_count)
+        self.segment_threshold_gb.trace_add('write', on_segment_change)
+
         # ------------------------------------------------------------------
         # HDR Metadata Tagging panel
         # ------------------------------------------------------------------
@@ -503,13 +5572,16 @@ class HDRVideoProcessor:
             .grid(row=1, column=0, sticky='e', padx=(8, 2), pady=4)
 
         self.hdr_preset_var = tk.StringVar(value='DJI Osmo Pocket 3 (HLG)')
-        preset_combo = ttk.Combobox(hdr_frame, textvariable=self.hdr_preset_var,
-                                    values=list(HDR_PRESETS.keys()),
-                                    state='readonly', font=self.default_font)
-        # Span columns 1..3 so the dropdown gets a generous width on every
-        # window size.
-        preset_combo.grid(row=1, column=1, columnspan=3, sticky='ew',
+        self.preset_combo = preset_combo = ttk.Combobox(
+            hdr_frame, textvariable=self.hdr_preset_var,
+            values=list(self.hdr_profiles) + ['Custom (manual)'],
+            state='readonly', font=self.default_font)
+        # Span columns 1..2 so the dropdown gets a generous width on every
+        # window size; column 3 saves the current fields as a profile.
+        preset_combo.grid(row=1, column=1, columnspan=2, sticky='ew',
                           padx=(0, 8), pady=4)
+        tk.Button(hdr_frame, text="Save as Profile...", command=self.save_hdr_profile,
+                  font=self.default_font).grid(row=1, column=3, sticky='w', padx=(0, 8), pady=4)
         # Applying immediately on selection is the expected UX — no extra
         # button press to commit. We still leave the fields editable below
         # so a preset is a starting point, not a lock.
@@ -610,6 +5682,7 @@ class HDRVideoProcessor:
 
         # Persist HDR fields automatically as the user edits them.
         def on_hdr_change(*args):
+            self._hdr_profile = None
             self.config.update_hdr(
                 self.tag_hdr.get(),
                 self.hdr_colour_matrix.get(),
@@ -629,36 +5702,125 @@ class HDRVideoProcessor:
                          self.hdr_max_luminance, self.hdr_min_luminance):
             _hdr_var.trace_add('write', on_hdr_change)
 
-        # Process button
-        tk.Button(self.root, text="Process Video",
+        # Job server submission — same specs as local processing, muxed by
+        # whichever workers are attached to the server.
+        server_frame = tk.Frame(self.root)
+        server_frame.pack(pady=5)
+        tk.Label(server_frame, text="Job server:",
+                 font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Entry(server_frame, textvariable=self.job_server_url,
+                 font=self.default_font, width=30).pack(side=tk.LEFT, padx=5)
+        tk.Button(server_frame, text="Submit to Server",
+                  command=self.submit_to_server,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        self.job_server_url.trace_add(
+            'write', lambda *a: self.config.update_job_server_url(self.job_server_url.get()))
+
+        # Process button + trash queue viewer
+        action_frame = tk.Frame(self.root)
+        action_frame.pack(pady=10)
+        tk.Button(action_frame, text="Process Video",
                   command=self.process_video,
-                  font=self.button_font).pack(pady=10)
+                  font=self.button_font).pack(side=tk.LEFT, padx=5)
+        tk.Button(action_frame, text="Process All Listed",
+                  command=self.process_all_listed,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Button(action_frame, text="Index Folder...",
+                  command=self.index_folder,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Button(action_frame, text="Contact Sheet...",
+                  command=self.show_contact_sheet,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Button(action_frame, text="Trash Queue...",
+                  command=self._show_trash_queue,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
         
         # ------------------------------------------------------------------
         # Instant Info panel
         # ------------------------------------------------------------------
         # Fires the moment a video is dropped (before any processing), so the
-        # user can immediately inspect container/track metadata. Uses mkvinfo
-        # for Matroska files and falls back to ffprobe for mov/mp4/others.
+        # user can immediately inspect container/track metadata. Matroska files
+        # get a lazily expanded element tree (MkvElementTree); mov/mp4/others
+        # show ffprobe output.
         # ------------------------------------------------------------------
         self.instant_info_frame = tk.LabelFrame(self.root, text="Instant Info (on drop)",
                                                 font=self.default_font)
         self.instant_info_frame.pack(pady=10, padx=20, fill='both', expand=True)
 
+        # Sortable list of every dropped file, filled in as the probe pool
+        # finishes. Selecting a row makes it the active video and shows its
+        # cached probe output (probing it first if it hasn't run yet).
+        list_frame = tk.Frame(self.instant_info_frame)
+        list_frame.pack(side=tk.LEFT, fill='y', padx=(5, 0), pady=5)
+        self.file_list = ttk.Treeview(list_frame, columns=FILE_LIST_COLUMNS,
+                                      selectmode='extended', height=8)
+        self.file_list.heading('#0', text='File',
+                               command=lambda: self._sort_file_list('#0'))
+        self.file_list.column('#0', width=220, stretch=False)
+        for column, title, width in (('size', 'Size (MB)', 80), ('duration', 'Duration', 70),
+                                     ('transfer', 'Transfer', 90), ('status', 'Status', 70)):
+            self.file_list.heading(column, text=title,
+                                   command=lambda c=column: self._sort_file_list(c))
+            self.file_list.column(column, width=width, stretch=False, anchor='e')
+        self.file_list.pack(side=tk.LEFT, fill='y')
+        file_list_scrollbar = tk.Scrollbar(list_frame, command=self.file_list.yview)
+        file_list_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.file_list.config(yscrollcommand=file_list_scrollbar.set)
+        self.file_list.bind('<<TreeviewSelect>>', self._on_file_list_select)
+
+        # Scopes (histogram / waveform / nits) for the active video. Packed
+        # before the text/tree view so the expanding view can't squeeze it.
+        scope_frame = tk.Frame(self.instant_info_frame)
+        scope_frame.pack(side=tk.RIGHT, fill='y', padx=5, pady=5)
+        scope_controls = tk.Frame(scope_frame)
+        scope_controls.pack(fill='x')
+        tk.Label(scope_controls, text="At (s):", font=self.default_font).pack(side=tk.LEFT)
+        tk.Entry(scope_controls, textvariable=self.scope_time, width=6,
+                 font=self.default_font).pack(side=tk.LEFT, padx=2)
+        tk.Checkbutton(scope_controls, text="LUT", variable=self.scope_use_lut,
+                       font=self.default_font).pack(side=tk.LEFT)
+        tk.Checkbutton(scope_controls, text="Full res", variable=self.scope_full_res,
+                       font=self.default_font).pack(side=tk.LEFT)
+        scope_button = tk.Button(scope_controls, text="Scopes", command=self.update_scopes,
+                                 font=self.default_font)
+        scope_button.pack(side=tk.LEFT, padx=2)
+        scope_tabs = ttk.Notebook(scope_frame)
+        scope_tabs.pack(pady=(5, 0))
+        self.scope_labels = {}
+        # A blank image sizes the labels in pixels until the first analysis.
+        self._scope_images['blank'] = tk.PhotoImage(width=SCOPE_IMAGE_WIDTH, height=SCOPE_IMAGE_HEIGHT)
+        for key, title in (('histogram', 'Histogram'), ('waveform', 'Waveform'), ('nits', 'Nits')):
+            label = tk.Label(scope_tabs, bg='black', image=self._scope_images['blank'])
+            scope_tabs.add(label, text=title)
+            self.scope_labels[key] = label
+        self.scope_stats = tk.Label(scope_frame, text='', font=("Consolas", 9),
+                                    justify=tk.LEFT, anchor='w')
+        self.scope_stats.pack(fill='x')
+        # NumPy is optional; check without importing it so startup stays fast.
+        if importlib.util.find_spec('numpy') is None:
+            scope_button.config(state='disabled')
+            self.scope_stats.config(text="Scopes need NumPy\n(pip install numpy)")
+
         # Read-only text widget showing the probe output. Kept disabled by
         # default so the user does not accidentally type into it; we re-enable
         # it programmatically whenever we refresh the contents.
-        self.instant_info_text = tk.Text(self.instant_info_frame, wrap=tk.WORD,
+        self.instant_text_frame = tk.Frame(self.instant_info_frame)
+        self.instant_text_frame.pack(padx=5, pady=5, fill='both', expand=True, side=tk.LEFT)
+        self.instant_info_text = tk.Text(self.instant_text_frame, wrap=tk.WORD,
                                          font=("Consolas", 10), height=10,
                                          state='disabled')
-        self.instant_info_text.pack(padx=5, pady=5, fill='both', expand=True, side=tk.LEFT)
+        self.instant_info_text.pack(fill='both', expand=True, side=tk.LEFT)
 
-        # Dedicated scrollbar so long mkvinfo dumps remain navigable.
-        instant_scrollbar = tk.Scrollbar(self.instant_info_frame,
+        # Dedicated scrollbar so long ffprobe dumps remain navigable.
+        instant_scrollbar = tk.Scrollbar(self.instant_text_frame,
                                          command=self.instant_info_text.yview)
         instant_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.instant_info_text.config(yscrollcommand=instant_scrollbar.set)
 
+        # Matroska files get the lazy element tree instead of a text dump;
+        # it takes the text's place in the panel while one is selected.
+        self.element_tree = MkvElementTree(self.instant_info_frame)
+
         # Status/Output area
         self.status_frame = tk.LabelFrame(self.root, text="Status & Output",
                                         font=self.default_font)
@@ -730,6 +5892,96 @@ class HDRVideoProcessor:
             if self.save_lut_path.get():
                 self.config.update_lut_path(file_path)
 
+    def show_lut_chain(self, paths=None):
+        """Pick an ordered chain of .cube files and bake it into the active LUT."""
+        window = tk.Toplevel(self.root)
+        window.title("LUT Chain")
+        chain = list(paths or ([self.lut_path.get()] if os.path.exists(self.lut_path.get()) else []))
+
+        tk.Label(window, text="Applied top to bottom (e.g. technical conversion, then creative look):",
+                 font=self.default_font).pack(padx=10, pady=(10, 0), anchor='w')
+        listbox = tk.Listbox(window, width=80, height=8, font=("Consolas", 10))
+        listbox.pack(padx=10, pady=5, fill='both', expand=True)
+
+        def refresh(select=None):
+            listbox.delete(0, tk.END)
+            for index, path in enumerate(chain, 1):
+                listbox.insert(tk.END, f"{index}. {path}")
+            if select is not None and chain:
+                listbox.selection_set(select)
+
+        def add():
+            initial_dir = os.path.dirname(self.config.last_lut_path) if os.path.exists(self.config.last_lut_path) else os.getcwd()
+            chosen = filedialog.askopenfilenames(parent=window, initialdir=initial_dir,
+                                                 filetypes=[("LUT files", "*.cube"), ("All files", "*.*")])
+            chain.extend(chosen)
+            refresh()
+
+        def remove():
+            for index in reversed(listbox.curselection()):
+                del chain[index]
+            refresh()
+
+        def move(offset):
+            selection = listbox.curselection()
+            if not selection:
+                return
+            index = selection[0]
+            target = index + offset
+            if 0 <= target < len(chain):
+                chain[index], chain[target] = chain[target], chain[index]
+                refresh(target)
+
+        button_frame = tk.Frame(window)
+        button_frame.pack(padx=10, pady=5, fill='x')
+        for text, command in (("Add...", add), ("Remove", remove),
+                              ("Up", lambda: move(-1)), ("Down", lambda: move(1))):
+            tk.Button(button_frame, text=text, command=command,
+                      font=self.default_font).pack(side=tk.LEFT, padx=2)
+        tk.Label(button_frame, text="Lattice size:",
+                 font=self.default_font).pack(side=tk.LEFT, padx=(15, 2))
+        size = tk.StringVar(value=str(LUT_CHAIN_DEFAULT_SIZE))
+        ttk.Combobox(button_frame, textvariable=size, values=[str(n) for n in LUT_CHAIN_SIZES],
+                     state='readonly', width=5, font=self.default_font).pack(side=tk.LEFT)
+        status = tk.Label(window, text="", font=self.default_font)
+
+        def bake():
+            if not chain:
+                messagebox.showerror("Error", "Add at least one LUT file", parent=window)
+                return
+            if _import_numpy() is None and len(chain) > 1:
+                messagebox.showerror("Error", "Baking a LUT chain needs NumPy (pip install numpy)",
+                                     parent=window)
+                return
+            paths_to_bake, lattice = list(chain), int(size.get())
+            status.config(text=f"Baking {len(paths_to_bake)} LUT(s) at {lattice}^3...")
+            started = time.monotonic()
+
+            # Baking a 65^3 chain takes a second or so; keep it off the Tk thread.
+            def worker():
+                try:
+                    result, cached = composite_lut(paths_to_bake, lattice)
+                except (RuntimeError, ValueError, OSError) as e:
+                    self.root.after(0, lambda message=f"LUT chain error: {e}":
+                                    status.config(text=message) if window.winfo_exists() else None)
+                    return
+                self.root.after(0, lambda: on_baked(result, cached, time.monotonic() - started))
+            threading.Thread(target=worker, daemon=True).start()
+
+        def on_baked(result, cached, seconds):
+            self.lut_path.set(result)
+            if self.save_lut_path.get():
+                self.config.update_lut_path(result)
+            how = 'reused from cache' if cached else f'baked in {seconds:.2f}s'
+            self._log_output(f"LUT chain of {len(chain)} file(s) -> {result} ({how})")
+            if window.winfo_exists():
+                window.destroy()
+
+        tk.Button(window, text="Bake && Use", command=bake,
+                  font=self.button_font).pack(pady=5)
+        status.pack(pady=(0, 10))
+        refresh()
+
     # ----------------------------------------------------------------------
     # Instant Info helpers
     # ----------------------------------------------------------------------
@@ -740,6 +5992,7 @@ class HDRVideoProcessor:
 
     def _set_instant_info(self, text):
         """Replace the contents of the Instant Info panel (thread-safe via after)."""
+        self._show_info_view(self.instant_text_frame)
         # The widget is created as 'disabled' to prevent stray edits; flip it
         # to 'normal' just long enough to swap the contents, then lock it back.
         self.instant_info_text.config(state='normal')
@@ -747,6 +6000,80 @@ class HDRVideoProcessor:
         self.instant_info_text.insert('1.0', text)
         self.instant_info_text.config(state='disabled')
 
+    def update_scopes(self):
+        """Analyse a frame of the active video on a worker thread and show its scopes"""
+        path = self.video_path.get()
+        if not path or not os.path.exists(path):
+            messagebox.showerror("Error", "Please select a video file")
+            return
+        try:
+            timestamp = max(float(self.scope_time.get() or 0), 0.0)
+        except ValueError:
+            messagebox.showerror("Error", "Scope time must be a number of seconds")
+            return
+        lut_path = self.lut_path.get() if self.scope_use_lut.get() else None
+        if lut_path and not os.path.exists(lut_path):
+            messagebox.showerror("Error", "Please select a LUT file")
+            return
+        hdr = self._current_hdr_values()
+        full_resolution = self.scope_full_res.get()
+        self.scope_stats.config(text=f"Analysing {timestamp:.2f}s...")
+
+        def worker():
+            pin_analysis_thread()
+            try:
+                scopes = analyze_scopes(path, timestamp, hdr, lut_path, full_resolution,
+                                        self.scope_cache)
+            except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+                self.root.after(0, lambda message=f"Scopes error: {e}":
+                                self.scope_stats.config(text=message))
+                return
+            self.root.after(0, lambda: self._show_scopes(scopes))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _show_scopes(self, scopes):
+        """Put analyze_scopes() output on screen (Tk thread only)."""
+        for key, label in self.scope_labels.items():
+            # Keep a reference: Tk drops images Python no longer holds.
+            self._scope_images[key] = tk.PhotoImage(data=scopes['images'][key])
+            label.config(image=self._scope_images[key])
+        stats = scopes['stats']
+        legal = 'limited' if scopes['limited'] else 'full'
+        self.scope_stats.config(text=(
+            f"{stats['width']}x{stats['height']}, {legal} range, transfer {stats['transfer']}\n"
+            f"below black {stats['below_black']:.2%}  above white {stats['above_white']:.2%}\n"
+            f"at peak code {stats['at_peak']:.2%}\n"
+            f"nits peak {stats['peak_nits']:.0f}  p99 {stats['p99_nits']:.0f}  "
+            f"avg {stats['average_nits']:.0f}"))
+
+    def _show_info_view(self, view):
+        """Swap the Instant Info panel between the text and element-tree views."""
+        for other in (self.instant_text_frame, self.element_tree):
+            if other is not view:
+                other.pack_forget()
+        if not view.winfo_ismapped():
+            view.pack(padx=5, pady=5, fill='both', expand=True, side=tk.LEFT)
+
+    def _show_instant_info(self, path):
+        """Show path in the Instant Info panel.
+
+        Matroska files open straight into the element tree (only the top
+        level is read, so there's nothing to wait for); anything else shows
+        its cached probe text, probing it first if it hasn't run yet.
+        """
+        if os.path.splitext(path)[1].lower() in MKV_EXTENSIONS:
+            try:
+                self.element_tree.load(path)
+            except (OSError, ValueError) as e:
+                self._set_instant_info(f"[Instant Info error] {e}")
+                return
+            self._show_info_view(self.element_tree)
+        elif path in self.probe_results:
+            self._set_instant_info(self.probe_results[path])
+        else:
+            self._set_instant_info(f"Probing: {path}\nPlease wait...")
+            self.probe_scheduler.prioritize(path)
+
     def _probe_file_instantly(self, file_path):
         """Kick off an async metadata probe for the given file.
 
@@ -754,70 +6081,128 @@ class HDRVideoProcessor:
           * .mkv / .mka / .mks / .webm  -> bundled mkvinfo
           * everything else             -> system ffprobe (if installed)
         """
+        self._probe_files([file_path])
+
+    def _probe_files(self, file_paths):
+        """Replace the file list with file_paths and probe them all concurrently.
+
+        The first path becomes the active video and is probed first. Any
+        probes still queued or running for a previous drop are superseded.
+        """
         # Bail out early on missing/bogus paths so we don't show stale info.
-        if not file_path or not os.path.exists(file_path):
+        file_paths = [p for p in file_paths if p and os.path.exists(p)]
+        if not file_paths:
+            self.probe_scheduler.cancel()
             self._set_instant_info("(no file)")
             return
 
-        # Show an immediate placeholder so the user knows we heard the drop,
-        # even if the actual probe takes a moment to spin up.
-        self._set_instant_info(f"Probing: {file_path}\nPlease wait...")
+        self.probe_results = {}
+        self.file_list.delete(*self.file_list.get_children())
+        for path in file_paths:
+            if self.file_list.exists(path):
+                continue
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            self.file_list.insert('', tk.END, iid=path, text=os.path.basename(path),
+                                  values=(f'{size_mb:.1f}', '', '', 'queued'))
 
-        # Dispatch to a worker so the GUI stays responsive on large files.
-        thread = threading.Thread(
-            target=self._run_probe_worker,
-            args=(file_path,),
-            daemon=True
-        )
-        thread.start()
+        # Show the element tree (Matroska) or an immediate placeholder so the
+        # user knows we heard the drop, even if the probe takes a moment.
+        selected = file_paths[0]
+        self.probe_scheduler.submit(file_paths, selected=selected)
+        self._show_instant_info(selected)
+        self.file_list.selection_set(selected)
+        self.file_list.see(selected)
+
+    def _on_probe_result(self, path, ok, output, generation):
+        """Store a finished probe and refresh its row (runs on the Tk thread)."""
+        # A newer drop replaced the list while this probe was running.
+        if generation != self.probe_scheduler.generation or not self.file_list.exists(path):
+            return
+        self.probe_results[path] = output
+        summary = summarize_probe_output(output)
+        duration = summary['duration']
+        self.file_list.set(path, 'duration',
+                           f'{int(duration // 60)}:{int(duration % 60):02d}' if duration else '')
+        self.file_list.set(path, 'transfer', summary['transfer'])
+        self.file_list.set(path, 'status', 'ok' if ok else 'error')
+        # Matroska rows already show the element tree; don't reset it.
+        if path == self.video_path.get() and os.path.splitext(path)[1].lower() not in MKV_EXTENSIONS:
+            self._set_instant_info(output)
+
+    def _on_file_list_select(self, _event=None):
+        """Make the focused row the active video and show (or fetch) its info."""
+        path = self.file_list.focus() or next(iter(self.file_list.selection()), '')
+        if not path:
+            return
+        self.video_path.set(path)
+        self._show_instant_info(path)
+
+    def _sort_file_list(self, column):
+        """Sort the file list by a column, toggling direction on repeat clicks."""
+        last_column, last_reverse = self._file_list_sort
+        reverse = (not last_reverse) if column == last_column else False
+        self._file_list_sort = (column, reverse)
+
+        def key(iid):
+            if column == '#0':
+                return self.file_list.item(iid, 'text').lower()
+            value = self.file_list.set(iid, column)
+            if column == 'size':
+                return float(value or 0)
+            if column == 'duration':
+                minutes, _sep, seconds = value.partition(':')
+                return int(minutes or 0) * 60 + int(seconds or 0)
+            return value
+        for index, iid in enumerate(sorted(self.file_list.get_children(), key=key, reverse=reverse)):
+            self.file_list.move(iid, '', index)
 
     def _run_probe_worker(self, file_path):
-        """Worker-thread body: run mkvinfo or ffprobe and post the result back."""
-        ext = os.path.splitext(file_path)[1].lower()
-        # Matroska-family extensions that mkvinfo can read natively.
-        mkv_exts = {'.mkv', '.mka', '.mks', '.webm'}
+        """Worker-thread body: run mkvinfo or ffprobe and return (ok, text)."""
+        with JobProfiler('probe', file_path) as profiler:
+            result = self._probe_output(file_path)
+        if profiler.summary:
+            self.root.after(0, lambda: self._record_profile(profiler.summary))
+        return result
 
+    def _probe_output(self, file_path):
+        """(ok, text): mkvinfo for Matroska files, ffprobe for everything else."""
+        ext = os.path.splitext(file_path)[1].lower()
         try:
-            if ext in mkv_exts:
+            if ext in MKV_EXTENSIONS:
                 # Use the bundled mkvinfo binary for true Matroska containers.
-                output = self._run_mkvinfo(file_path)
-            else:
-                # Fall back to ffprobe for mov/mp4/etc. We try -show_format and
-                # -show_streams so the user gets both container- and track-
-                # level metadata in one shot.
-                output = self._run_ffprobe(file_path)
+                return self._run_mkvinfo(file_path)
+            # Fall back to ffprobe for mov/mp4/etc. We try -show_format and
+            # -show_streams so the user gets both container- and track-
+            # level metadata in one shot.
+            return self._run_ffprobe(file_path)
         except Exception as e:
             # Surface the error inline rather than popping a dialog — the user
             # is dragging files, not running an operation, so noise is bad.
-            output = f"[Instant Info error] {e}"
-
-        # Marshal the UI update back onto the Tk main thread.
-        self.root.after(0, lambda: self._set_instant_info(output))
+            return False, f"[Instant Info error] {e}"
 
     def _run_mkvinfo(self, file_path):
-        """Run the bundled mkvinfo and return its stdout (or stderr on failure)."""
+        """Run the bundled mkvinfo and return (ok, stdout — plus stderr on failure)."""
         result = subprocess.run(
-            [self.mkvinfo_path, file_path],
+            prioritized([self.mkvinfo_path, file_path]),
             capture_output=True, text=True,
-            # On Windows, suppress the flashing console window that would
-            # otherwise pop up for each subprocess call.
-            creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+            # No flashing console window on Windows, at the preset priority.
+            creationflags=child_creationflags()
         )
         if result.returncode == 0:
-            return result.stdout
+            return True, result.stdout
         # Non-zero exit: still show whatever output we got, it's usually
         # diagnostic ("not a Matroska file" etc.).
-        return (result.stdout or '') + (result.stderr or '')
+        return False, (result.stdout or '') + (result.stderr or '')
 
     def _run_ffprobe(self, file_path):
-        """Run ffprobe (if available) and return a human-readable dump."""
+        """Run ffprobe (if available) and return (ok, a human-readable dump)."""
         # Resolve ffprobe lazily so the rest of the app still works on systems
         # where it isn't installed.
         ffprobe = shutil.which('ffprobe')
         if not ffprobe:
-            return ("ffprobe not found on PATH.\n"
-                    "Install FFmpeg and add it to PATH to see instant info "
-                    "for non-Matroska files (.mov, .mp4, etc).")
+            return False, ("ffprobe not found on PATH.\n"
+                           "Install FFmpeg and add it to PATH to see instant info "
+                           "for non-Matroska files (.mov, .mp4, etc).")
 
         # -hide_banner trims the noisy build-config preamble.
         # -show_format dumps container-level metadata (duration, bitrate, tags).
@@ -830,16 +6215,16 @@ class HDRVideoProcessor:
             file_path
         ]
         result = subprocess.run(
-            cmd,
+            prioritized(cmd),
             capture_output=True, text=True,
-            creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+            creationflags=child_creationflags()
         )
         if result.returncode == 0:
             # ffprobe prints to stderr by default for non-JSON output, but with
             # -show_format/-show_streams it goes to stdout. Concatenate just in
             # case so we never silently drop info.
-            return (result.stdout or '') + (result.stderr or '')
-        return f"[ffprobe failed: exit {result.returncode}]\n{result.stderr}"
+            return True, (result.stdout or '') + (result.stderr or '')
+        return False, f"[ffprobe failed: exit {result.returncode}]\n{result.stderr}"
 
     def _log_output(self, message):
         """Add message to output text widget"""
@@ -854,11 +6239,12 @@ class HDRVideoProcessor:
         'Custom (manual)' sentinel is a no-op so users can flip back to
         editing without their values being clobbered.
         """
-        preset = HDR_PRESETS.get(preset_name)
+        profile = self.hdr_profiles.get(preset_name)
         # Custom or unknown name -> leave everything alone. The user is in
         # control of the fields directly.
-        if preset is None:
+        if profile is None:
             return
+        preset = profile.as_dict()
 
         # Map preset keys to the Tk StringVars they drive. Updating the var
         # also fires the trace_add('write') hook that persists to settings.ini
@@ -875,228 +6261,841 @@ class HDRVideoProcessor:
         self.hdr_max_luminance.set(preset['max_luminance'])
         self.hdr_min_luminance.set(preset['min_luminance'])
 
-    def _build_hdr_flags(self):
-        """Assemble the mkvmerge HDR/colour flag list from the UI vars.
+    def _current_hdr_values(self):
+        """Snapshot the HDR panel as an HDR_PRESETS-style dict of raw strings."""
+        return {
+            'colour_matrix': self.hdr_colour_matrix.get(),
+            'colour_range': self.hdr_colour_range.get(),
+            'transfer': self.hdr_transfer.get(),
+            'primaries': self.hdr_primaries.get(),
+            'max_cll': self.hdr_max_cll.get(),
+            'max_fall': self.hdr_max_fall.get(),
+            'chromaticity': self.hdr_chromaticity.get(),
+            'white_point': self.hdr_white_point.get(),
+            'max_luminance': self.hdr_max_luminance.get(),
+            'min_luminance': self.hdr_min_luminance.get(),
+        }
 
-        Returns a flat list of CLI args. Each flag is only included when the
-        corresponding field is non-empty, so HLG users (who leave the
-        mastering-display fields blank) don't end up with bogus zero-valued
-        metadata in their output.
+    def _current_hdr_profile(self):
+        """The HDR panel compiled into an HDRProfile (raises HDRProfileError).
 
-        All flags target track ID 0 because the source mov/mp4 has the video
-        as its first track (confirmed via the user's mkvinfo dumps).
+        Compiled once and reused until a field changes, so a batch builds
+        its flags and job specs from one shared object.
         """
-        flags = []
+        if self._hdr_profile is None:
+            self._hdr_profile = compile_hdr_profile(self._current_hdr_values())
+        return self._hdr_profile
 
-        # Helper: append "flag 0:value" only if the value is meaningfully set.
-        # Strip whitespace so a field full of spaces is treated as empty.
-        def add(flag_name, raw_value):
-            if raw_value is None:
-                return
-            value = raw_value.strip()
-            if not value:
-                return
-            flags.extend([flag_name, f'0:{value}'])
-
-        # Core colour-space identifiers. These four are the bare minimum for
-        # YouTube to flip the HDR badge on, so they should almost always be
-        # populated. We still go through add() so an intentionally blank
-        # field is honored rather than silently overridden.
-        add('--colour-matrix', self.hdr_colour_matrix.get())
-        add('--colour-range', self.hdr_colour_range.get())
-        add('--colour-transfer-characteristics', self.hdr_transfer.get())
-        add('--colour-primaries', self.hdr_primaries.get())
-
-        # Light-level metadata — relevant for PQ, omitted for HLG.
-        add('--max-content-light', self.hdr_max_cll.get())
-        add('--max-frame-light', self.hdr_max_fall.get())
-
-        # Mastering-display chromaticity + white point. mkvmerge expects six
-        # comma-separated coords for chromaticity (Rx,Ry,Gx,Gy,Bx,By) and two
-        # for the white point (Wx,Wy). We pass them through verbatim — the
-        # user's responsibility to format them correctly.
-        add('--chromaticity-coordinates', self.hdr_chromaticity.get())
-        add('--white-colour-coordinates', self.hdr_white_point.get())
-
-        # Mastering-display luminance bounds, in cd/m^2.
-        add('--max-luminance', self.hdr_max_luminance.get())
-        add('--min-luminance', self.hdr_min_luminance.get())
-
-        return flags
+    def _build_hdr_flags(self):
+        """The mkvmerge HDR/colour flag list for the HDR panel (see build_hdr_flags)."""
+        return list(self._current_hdr_profile().flags)
+
+    def _check_hdr_profile(self):
+        """Validate the HDR panel before a batch; shows the problem and returns False."""
+        if not self.tag_hdr.get():
+            return True
+        try:
+            self._current_hdr_profile()
+        except HDRProfileError as e:
+            messagebox.showerror("Invalid HDR metadata", str(e).replace('; ', '\n'))
+            return False
+        return True
+
+    def save_hdr_profile(self):
+        """Save the HDR panel as a named profile in the user's library."""
+        try:
+            values = self._current_hdr_profile().as_dict()
+        except HDRProfileError as e:
+            messagebox.showerror("Invalid HDR metadata", str(e).replace('; ', '\n'))
+            return
+        name = simpledialog.askstring("Save HDR Profile", "Profile name:", parent=self.root)
+        if not name or not name.strip():
+            return
+        name = name.strip()
+        if name in HDR_PRESETS:
+            messagebox.showerror("Error", f"'{name}' is a built-in preset; pick another name")
+            return
+        profile = compile_hdr_profile(values, name)
+        try:
+            save_hdr_profile(profile)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not save {HDR_PROFILE_LIBRARY}: {e}")
+            return
+        self.hdr_profiles[name] = profile
+        self.preset_combo.config(values=list(self.hdr_profiles) + ['Custom (manual)'])
+        self.hdr_preset_var.set(name)
+        self._log_output(f"Saved HDR profile '{name}' to {HDR_PROFILE_LIBRARY}")
+
+    def _job_spec(self, input_path):
+        """The run_mux_job() spec for one input under the current UI settings."""
+        return {
+            'input': input_path,
+            'lut': self.lut_path.get(),
+            'hdr': self._current_hdr_profile().as_dict() if self.tag_hdr.get() else None,
+            'output_prefix': self.output_prefix.get(),
+            'verify_level': self.verify_level.get(),
+            'backend': self.mux_backend.get(),
+            'segment_threshold_bytes': int(self._segment_threshold_gb() * 1024 ** 3),
+            'segments': self.config.segment_count,
+        }
+
+    def _segment_threshold_gb(self):
+        try:
+            return max(float(self.segment_threshold_gb.get() or 0), 0.0)
+        except ValueError:
+            return 0.0
 
     def process_video(self):
         """Process the video with the selected LUT"""
         if not self.video_path.get() or not self.lut_path.get():
             messagebox.showerror("Error", "Please provide both video and LUT files")
             return
-            
-        input_path = self.video_path.get()
-        input_name = Path(input_path).stem
-        output_path = str(Path(input_path).parent / f"{input_name}{self.output_prefix.get()}.mkv")
 
-        # ------------------------------------------------------------------
-        # Build the HDR flag block.
-        # ------------------------------------------------------------------
-        # mkvmerge applies --colour-* / --max-* / --chromaticity-coordinates /
-        # --white-colour-coordinates / --max-luminance / --min-luminance to
-        # the NEXT input file's track 0 (our video track). They must appear
-        # BEFORE the input filename on the command line.
-        #
-        # Each flag takes the form "TID:VALUE" where TID is the track ID. The
-        # source video sits at track ID 0 in the mov/mp4 we're muxing in, so
-        # every flag is prefixed with "0:".
-        # ------------------------------------------------------------------
-        hdr_flags = self._build_hdr_flags() if self.tag_hdr.get() else []
+        # Several rows selected in the file list -> process exactly those.
+        selected = list(self.file_list.selection())
+        if len(selected) > 1:
+            self._process_batch(selected)
+            return
+        self._process_batch([self.video_path.get()])
 
-        # Build command. HDR flags are inserted immediately before the input
-        # path so mkvmerge associates them with that input's video track.
-        cmd = [
-            self.mkvmerge_path,
-            '-o', output_path,
-            '--attachment-mime-type', 'application/x-cube',
-            '--attach-file', self.lut_path.get(),
-        ] + hdr_flags + [
-            input_path
-        ]
-        
-        try:
-            # Clear previous output
-            self.output_text.delete('1.0', tk.END)
-            self._log_output("Starting video processing...")
-            self._log_output(f"Command: {' '.join(cmd)}\n")
-            
-            # Run mkvmerge
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, 
-                                     stderr=subprocess.STDOUT, text=True)
-            
-            # Read output in real-time
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self._log_output(output.strip())
-            
-            if process.returncode != 0:
-                raise Exception("mkvmerge failed")
-                
-            # Verify output file
-            if not self._verify_output(input_path, output_path):
-                raise Exception("Output file verification failed")
-                
-            self._log_output("\nVerification successful!")
-            
-            # Show MKVInfo if requested
-            if self.show_info.get():
-                self._show_mkvinfo(output_path)
-                
-            # Prompt for deletion if enabled
-            if self.delete_original.get():
-                if messagebox.askyesno("Move to Trash", 
-                                     "Do you want to move the original file to trash? It will not be permanently deleted, just moved to the trash folder."):
+    def process_all_listed(self):
+        """Process every file currently in the file list, in list order"""
+        paths = list(self.file_list.get_children())
+        if not paths or not self.lut_path.get():
+            messagebox.showerror("Error", "Please provide both video and LUT files")
+            return
+        self._process_batch(paths)
+
+    def _process_batch(self, input_paths):
+        """Mux + verify every input, then confirm trashing the originals once.
+
+        Verified originals are only *staged* on the trash queue while the
+        batch runs, so a slow trash backend (or a pending prompt) never sits
+        between two muxes.
+        """
+        if not self._check_hdr_profile():
+            return
+        # Clear previous output
+        self.output_text.delete('1.0', tk.END)
+        input_paths = self._check_signal_batch(input_paths)
+        if not input_paths:
+            self._log_output("Nothing to process.")
+            return
+        fingerprints = self._fingerprint_batch(input_paths)
+        if fingerprints is None:
+            return
+        proxies = []
+        failures = []
+        succeeded = 0
+        batch_started = time.monotonic()
+        EVENT_LOG.emit('batch_start', files=len(input_paths))
+        for input_path in input_paths:
+            profiler = JobProfiler('mux', input_path)
+            try:
+                with profiler:
+                    job = self._process_one(input_path, show_info=len(input_paths) == 1,
+                                            fingerprint=fingerprints.get(input_path))
+                succeeded += 1
+                if self.make_proxies.get():
+                    proxies.append(self._submit_proxy(job['input'], fingerprints.get(input_path)))
+                # A 'reuse' duplicate has no output next to it, so its
+                # original is the only copy in that folder — keep it.
+                if self.delete_original.get() and job.get('dedupe') != 'reuse':
+                    self.trash_queue.stage(job['input'])
+            except Exception as e:
+                error_msg = str(e)
+                failures.append((input_path, error_msg))
+                self._log_output(f"\nError: {error_msg}")
+                EVENT_LOG.emit('error', stage='job', input=input_path, detail=error_msg)
+            if profiler.summary:
+                self._record_profile(profiler.summary)
+        if proxies and not self._wait_for_proxies(proxies):
+            return
+        EVENT_LOG.emit('batch_end', files=len(input_paths), succeeded=succeeded,
+                       failed=len(failures), seconds=time.monotonic() - batch_started)
+
+        # One confirmation for the whole batch; the queue does the slow part
+        # in the background after a short undo window.
+        staged = len(self.trash_queue.staged)
+        if staged:
+            if messagebox.askyesno("Move to Trash",
+                                   f"Do you want to move {staged} verified original file(s) to trash? "
+                                   "They will not be permanently deleted, just moved to the trash folder.\n\n"
+                                   f"You can undo this from 'Trash Queue...' for the next "
+                                   f"{int(self.trash_queue.grace_seconds)} seconds."):
+                self.trash_queue.confirm()
+                self._log_output(f"{staged} original file(s) queued for trash")
+            else:
+                self.trash_queue.discard_staged()
+
+        if len(input_paths) == 1:
+            if failures:
+                messagebox.showerror("Error", failures[0][1])
+            else:
+                self._log_output("\nProcessing completed successfully!")
+                messagebox.showinfo("Success", "Video processed successfully!")
+            return
+
+        self._log_output(f"\nBatch finished: {succeeded} of {len(input_paths)} processed successfully")
+        if failures:
+            messagebox.showerror("Batch finished with errors",
+                                 f"{len(failures)} of {len(input_paths)} file(s) failed:\n" +
+                                 "\n".join(f"{os.path.basename(p)}: {err}" for p, err in failures[:10]))
+        else:
+            messagebox.showinfo("Success", f"All {succeeded} videos processed successfully!")
+
+    def _submit_proxy(self, input_path, fingerprint=None):
+        """Queue an SDR proxy encode; its result is logged when it lands."""
+        # The HDR tags say which matrix/range the source is in; untagged
+        # jobs leave it to ffmpeg.
+        hdr = self._current_hdr_values() if self.tag_hdr.get() else None
+        return self.proxy_builder.submit(input_path, self.lut_path.get(), fingerprint, hdr)
+
+    def _on_proxy_result(self, result):
+        name = os.path.basename(result['input'])
+        if result['error']:
+            self._log_output(f"Proxy for {name} FAILED: {result['error']}")
+        elif result['skipped']:
+            self._log_output(f"Proxy for {name} is up to date")
+        else:
+            self._log_output(f"Proxy for {name} written in {result['seconds']:.1f}s: {result['proxy']}")
+
+    def _wait_for_proxies(self, futures):
+        """Keep the window alive until queued proxy encodes finish, logging each.
+
+        The originals may be trashed right after the batch, and the encodes
+        read from them. Returns False if the window was closed meanwhile
+        (the rest of the batch must not touch Tk then).
+        """
+        pending = set(futures)
+        waiting = sum(1 for future in futures if not future.done())
+        if waiting:
+            self._log_output(f"\nWaiting for {waiting} proxy encode(s)...")
+        while pending:
+            done, pending = futures_wait(pending, timeout=0.1)
+            for future in done:
+                try:
+                    self._on_proxy_result(future.result())
+                except Exception as e:
+                    self._log_output(f"Proxy encode error: {e}")
+            if not pending:
+                break
+            self.root.update()
+            # update() runs _on_close when the user closes the window.
+            if self._closing:
+                return False
+        return True
+
+    def _check_signal_batch(self, input_paths):
+        """Sample every input and flag clips whose code values contradict the HDR tags.
+
+        Returns the inputs to process: all of them, only the unflagged ones,
+        or [] when the user stops the batch.
+        """
+        if not (self.signal_check.get() and self.tag_hdr.get()):
+            return input_paths
+        if _import_numpy() is None or not shutil.which('ffmpeg'):
+            self._log_output("Range/Transfer check skipped (needs NumPy and ffmpeg)")
+            return input_paths
+        hdr = self._current_hdr_values()
+        flagged = {}
+
+        def on_report(path, future):
+            # Tk thread: collect one finished clip.
+            try:
+                report = future.result()
+            except Exception as e:
+                self._log_output(f"  {os.path.basename(path)}: check failed: {e}")
+                return
+            EVENT_LOG.emit('signal_check', input=path, ok=report['ok'], frames=report['frames'],
+                           seconds=report['seconds'], code_low=report['code_low'],
+                           code_high=report['code_high'], detail=report['detail'])
+            self._log_output(f"  {os.path.basename(path)}: {report['frames']} frame(s) in "
+                             f"{report['seconds']:.1f}s, luma codes {report['code_low']}-"
+                             f"{report['code_high']}: {report['detail']}")
+            if report['issues']:
+                flagged[path] = report['issues']
+
+        # Clips are sampled on a pool so the window keeps repainting; the
+        # batch itself waits here because the prompt below needs every result.
+        # Results are collected on this thread as futures_wait() hands them
+        # back, so none can arrive after the prompt.
+        self._log_output(f"Checking signal range of {len(input_paths)} clip(s)...")
+        with ThreadPoolExecutor(max_workers=SIGNAL_CHECK_CLIPS, initializer=pin_analysis_thread) as pool:
+            pending = {pool.submit(check_signal_range, path, hdr): path for path in input_paths}
+            while pending:
+                done, _not_done = futures_wait(pending, timeout=0.1)
+                for future in done:
+                    on_report(pending.pop(future), future)
+                self.root.update()
+        if not flagged:
+            return input_paths
+
+        lines = [f"{os.path.basename(path)}: {'; '.join(issues)}"
+                 for path, issues in list(flagged.items())[:10]]
+        answer = messagebox.askyesnocancel(
+            "Range / Transfer mismatch",
+            f"{len(flagged)} clip(s) don't look like the selected Range/Transfer tags:\n\n" +
+            "\n".join(lines) +
+            "\n\nYes: mux them anyway\nNo: skip the flagged clip(s)\nCancel: stop the batch")
+        if answer is None:
+            return []
+        if answer:
+            return input_paths
+        for path in flagged:
+            self._log_output(f"Skipped {os.path.basename(path)} (Range/Transfer mismatch)")
+        return [path for path in input_paths if path not in flagged]
+
+    def _fingerprint_batch(self, input_paths):
+        """Fingerprint every input concurrently and log duplicate groups.
+
+        Returns {path: fingerprint}, or None if the window was closed while
+        waiting.
+        """
+        if self.dedupe_mode.get() == 'off':
+            return {}
+        fingerprints = {}
+        # Sample reads are latency bound (network shares, card readers), so
+        # overlap them across a small thread pool, and keep the window
+        # repainting while a large batch is read.
+        with ThreadPoolExecutor(max_workers=PROBE_MAX_WORKERS, initializer=pin_analysis_thread) as pool:
+            pending = {pool.submit(content_fingerprint, path): path for path in input_paths}
+            while pending:
+                done, _not_done = futures_wait(pending, timeout=0.1)
+                for future in done:
+                    path = pending.pop(future)
                     try:
-                        # Convert path to absolute path and normalize it
-                        abs_path = os.path.abspath(os.path.normpath(input_path))
-                        if os.path.exists(abs_path):
-                            send2trash(abs_path)
-                            self._log_output("Original file moved to trash")
-                        else:
-                            raise FileNotFoundError(f"Could not find file: {abs_path}")
-                    except Exception as e:
-                        error_msg = f"Could not move file to trash: {str(e)}"
-                        self._log_output(error_msg)
-                        messagebox.showerror("Error", error_msg)
-            
-            self._log_output("\nProcessing completed successfully!")
-            messagebox.showinfo("Success", "Video processed successfully!")
-            
-        except Exception as e:
-            error_msg = str(e)
-            self._log_output(f"\nError: {error_msg}")
-            messagebox.showerror("Error", error_msg)
+                        fingerprints[path] = future.result()
+                    except OSError as e:
+                        self._log_output(f"Could not fingerprint {os.path.basename(path)}: {e}")
+                if not pending:
+                    break
+                self.root.update()
+                if self._closing:
+                    for future in pending:
+                        future.cancel()
+                    return None
+        for group in find_duplicate_groups(fingerprints):
+            self._log_output("Duplicate content in batch: " +
+                             ", ".join(os.path.basename(p) for p in group))
+        return fingerprints
 
-    def _verify_output(self, input_path, output_path):
-        """Verify the output file is valid and at least as large as input"""
-        if not os.path.exists(output_path):
-            return False
-            
-        input_size = os.path.getsize(input_path)
-        output_size = os.path.getsize(output_path)
-        
-        # Check file size
-        if output_size < input_size:
-            return False
-            
-        # Verify with mkvinfo
-        try:
-            result = subprocess.run([self.mkvinfo_path, output_path], 
-                                  capture_output=True, text=True)
-            return result.returncode == 0
-        except:
-            return False
+    def _reuse_duplicate(self, input_path, output_path, existing_output):
+        """Point a duplicate job at an already tagged output. Returns the mode used."""
+        if self.dedupe_mode.get() == 'link':
+            try:
+                if os.path.exists(output_path):
+                    if os.path.samefile(output_path, existing_output):
+                        return 'link'
+                    os.remove(output_path)
+                os.link(existing_output, output_path)
+                return 'link'
+            except OSError as e:
+                # FAT/exFAT cards and cross-volume pairs can't hard-link.
+                self._log_output(f"Could not link existing output ({e}), reusing it in place")
+        return 'reuse'
+
+    def _process_one(self, input_path, show_info=True, fingerprint=None):
+        """Mux and verify a single input. Raises on failure, returns the job record."""
+        output_path = output_path_for(input_path, self.output_prefix.get())
+        expected_hdr = self._current_hdr_profile().as_dict() if self.tag_hdr.get() else None
+        profile = IngestIndexer.profile_key(self.output_prefix.get(), expected_hdr,
+                                            self.lut_path.get())
+
+        # Same content already muxed with this profile -> no mkvmerge pass.
+        existing = self.dedupe_history.lookup(fingerprint, profile) if fingerprint else None
+        if existing and os.path.abspath(existing) != os.path.abspath(output_path) \
+                and self.dedupe_mode.get() != 'off':
+            mode = self._reuse_duplicate(input_path, output_path, existing)
+            target = output_path if mode == 'link' else existing
+            self._log_output(f"{os.path.basename(input_path)} is a duplicate of already tagged "
+                             f"{os.path.basename(existing)} ({mode})")
+            report = verify_output(None, target, 'quick', expected_hdr=expected_hdr,
+                                   expected_attachment=self.lut_path.get())
+            job = {'input': input_path, 'output': target, 'verify': report, 'dedupe': mode}
+            self.job_history.append(job)
+            if not report['ok']:
+                raise Exception(f"Existing output failed verification: {report['detail']}")
+            if mode == 'link':
+                self.ingest_index.mark_done(input_path, output_path, self.output_prefix.get(),
+                                            expected_hdr=expected_hdr,
+                                            expected_attachment=self.lut_path.get())
+            return job
+
+        # Verification level and timing are kept with the job so throughput
+        # vs. confidence can be compared per batch.
+        result = run_mux_job(self._job_spec(input_path), self.mkvmerge_path,
+                             on_line=self._log_output)
+        # A pre_* plugin hook may have moved the input or renamed the output.
+        input_path, output_path = result['input'], result['output']
+        job = {
+            'input': input_path,
+            'output': output_path,
+            'verify': result['metrics'].get('verify'),
+            'metrics': result['metrics'],
+        }
+        self.job_history.append(job)
+        if not result['ok']:
+            raise Exception(result['detail'])
+
+        self._log_output("\nVerification successful!")
+        self.ingest_index.mark_done(input_path, output_path, self.output_prefix.get(),
+                                    expected_hdr=expected_hdr,
+                                    expected_attachment=self.lut_path.get())
+        if fingerprint:
+            self.dedupe_history.record(fingerprint, profile, input_path, output_path)
+
+        # Show MKVInfo if requested
+        if show_info and self.show_info.get():
+            self._show_mkvinfo(output_path)
+        return job
+
+    def _verify_output(self, input_path, output_path, level='quick'):
+        """Verify the output file at the given level; returns verify_output()'s report."""
+        # Only check tags we actually asked mkvmerge to write.
+        expected_hdr = self._current_hdr_profile().as_dict() if self.tag_hdr.get() else None
+        return verify_output(input_path, output_path, level,
+                             expected_hdr=expected_hdr,
+                             expected_attachment=self.lut_path.get())
 
     def _show_mkvinfo(self, file_path):
-        """Show MKVInfo output for the processed file"""
+        """Show the processed file's Matroska element tree in a new window"""
+        info_window = tk.Toplevel(self.root)
+        info_window.title(f"Matroska Elements - {os.path.basename(file_path)}")
+        info_window.geometry("700x500")
+        element_tree = MkvElementTree(info_window)
+        element_tree.pack(padx=10, pady=10, fill='both', expand=True)
         try:
-            result = subprocess.run([self.mkvinfo_path, file_path], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                # Create a new window to show the info
-                info_window = tk.Toplevel(self.root)
-                info_window.title("MKVInfo Output")
-                
-                text_widget = tk.Text(info_window, wrap=tk.WORD, width=80, height=30)
-                text_widget.pack(padx=10, pady=10)
-                
-                # Insert the mkvinfo output
-                text_widget.insert('1.0', result.stdout)
-                text_widget.config(state='disabled')
-                
-                # Add scrollbar
-                scrollbar = tk.Scrollbar(info_window, command=text_widget.yview)
-                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-                text_widget.config(yscrollcommand=scrollbar.set)
-            else:
-                raise Exception(f"MKVInfo failed: {result.stderr}")
+            element_tree.load(file_path)
         except Exception as e:
+            info_window.destroy()
             messagebox.showerror("MKVInfo Error", str(e))
 
+    def _record_profile(self, summary):
+        """Keep a JobProfiler summary for the Profiles window and log it."""
+        self.profile_summaries.append(summary)
+        self._log_output(format_profile_summary(summary))
+
+    def _show_profiles(self):
+        """Window listing this session's profiled jobs, slowest first."""
+        window = tk.Toplevel(self.root)
+        window.title(f"Profiles - {os.path.abspath(self._profile_dir)}")
+        text = tk.Text(window, width=140, height=25, font=("Consolas", 10), wrap='none')
+        text.pack(padx=10, pady=10, fill='both', expand=True)
+        if not self.profile_summaries:
+            text.insert(tk.END, "No profiled jobs yet. Tick 'Profile jobs' and drop or process a file.\n")
+        for summary in sorted(self.profile_summaries, key=lambda item: item['seconds'], reverse=True):
+            text.insert(tk.END, format_profile_summary(summary) + "\n")
+            for key in ('pstats', 'alloc'):
+                if summary[key]:
+                    text.insert(tk.END, f"    {summary[key]}\n")
+        text.config(state=tk.DISABLED)
+
+    def index_folder(self):
+        """Scan an ingest folder and list only the clips that still need processing"""
+        if not self._check_hdr_profile():
+            return
+        initial_dir = self.config.last_video_path if os.path.exists(self.config.last_video_path) else os.getcwd()
+        root_dir = filedialog.askdirectory(initialdir=initial_dir)
+        if not root_dir:
+            return
+        self._log_output(f"Indexing {root_dir}...")
+        prefix = self.output_prefix.get()
+        expected_hdr = self._current_hdr_profile().as_dict() if self.tag_hdr.get() else None
+        lut = self.lut_path.get()
+
+        # The walk itself is fast, but re-verifying stale outputs is disk
+        # bound — keep it off the Tk thread.
+        def worker():
+            try:
+                result = self.ingest_index.scan(root_dir, prefix, expected_hdr, lut)
+            except Exception as e:
+                self.root.after(0, lambda message=f"Index error: {e}": self._log_output(message))
+                return
+            self.root.after(0, lambda: self._on_index_result(root_dir, result))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_index_result(self, root_dir, result):
+        """Show the pending clips from an index scan in the file list."""
+        self._log_output(f"Indexed {result['scanned']} clip(s) in {result['seconds']:.2f}s: "
+                         f"{len(result['pending'])} pending, {len(result['done'])} already processed "
+                         f"({result['verified']} output(s) re-verified)")
+        if result['pending']:
+            self._set_dropped_videos(result['pending'])
+        else:
+            messagebox.showinfo("Index Folder", f"Every clip under {root_dir} is already processed.")
+
+    # ----------------------------------------------------------------------
+    # Job server submission
+    # ----------------------------------------------------------------------
+
+    def submit_to_server(self):
+        """Send the selected (or all listed) files to the job server"""
+        paths = list(self.file_list.selection()) or list(self.file_list.get_children())
+        if not paths and self.video_path.get():
+            paths = [self.video_path.get()]
+        if not paths or not self.lut_path.get():
+            messagebox.showerror("Error", "Please provide both video and LUT files")
+            return
+        if not self._check_hdr_profile():
+            return
+        specs = [self._job_spec(path) for path in paths]
+        client = JobClient(self.job_server_url.get())
+
+        # Network calls stay off the Tk thread; a remote server that is slow
+        # to answer must not freeze the window.
+        def worker():
+            submitted, error = [], None
+            try:
+                for spec in specs:
+                    submitted.append(client.submit(spec))
+            except (urllib.error.URLError, OSError) as e:
+                error = str(e)
+            self.root.after(0, lambda: self._on_jobs_submitted(submitted, error))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_jobs_submitted(self, submitted, error):
+        for job in submitted:
+            self.remote_jobs[job['id']] = {'input': job['spec']['input'], 'status': job['status']}
+            self._set_list_status(job['spec']['input'], 'queued')
+        self._log_output(f"Submitted {len(submitted)} job(s) to {self.job_server_url.get()}")
+        if error:
+            self._log_output(f"Job server error: {error}")
+            messagebox.showerror("Job Server", f"Could not submit to the job server:\n{error}")
+        self._schedule_remote_poll()
+
+    def _schedule_remote_poll(self):
+        if not self._remote_poll_pending:
+            self._remote_poll_pending = True
+            self.root.after(int(JOB_POLL_SECONDS * 1000), self._poll_job_server)
+
+    def _poll_job_server(self):
+        """Fetch job states in the background and fold them into the UI."""
+        client = JobClient(self.job_server_url.get())
+
+        def worker():
+            try:
+                jobs = client.jobs()
+            except (urllib.error.URLError, OSError) as e:
+                jobs = None
+                self.root.after(0, lambda message=f"Job server error: {e}": self._log_output(message))
+            self.root.after(0, lambda: self._on_remote_jobs(jobs))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_remote_jobs(self, jobs):
+        self._remote_poll_pending = False
+        for job in jobs or []:
+            tracked = self.remote_jobs.get(job['id'])
+            if tracked is None:
+                continue
+            status = job['status']
+            if status == 'running':
+                self._set_list_status(tracked['input'], f"{job['progress']}%")
+            else:
+                self._set_list_status(tracked['input'], status)
+            if status != tracked['status']:
+                tracked['status'] = status
+                name = os.path.basename(tracked['input'])
+                if status == 'done':
+                    metrics = job['metrics']
+                    self._log_output(f"[{job['worker']}] {name} done: "
+                                     f"{metrics.get('mux_mb_per_s', 0):.1f} MB/s mux, "
+                                     f"verify {metrics.get('verify', {}).get('level', '?')}")
+                    self.job_history.append({'input': tracked['input'],
+                                             'output': output_path_for(tracked['input'],
+                                                                       job['spec']['output_prefix']),
+                                             'verify': metrics.get('verify'),
+                                             'metrics': metrics, 'worker': job['worker']})
+                elif status == 'failed':
+                    self._log_output(f"[{job['worker']}] {name} FAILED: {job['detail']}")
+                else:
+                    self._log_output(f"[{job['worker'] or 'server'}] {name}: {status}")
+        if any(job['status'] in ('queued', 'running') for job in self.remote_jobs.values()):
+            self._schedule_remote_poll()
+
+    def _set_list_status(self, path, status):
+        if self.file_list.exists(path):
+            self.file_list.set(path, 'status', status)
+
+    # ----------------------------------------------------------------------
+    # Trash queue UI
+    # ----------------------------------------------------------------------
+
+    def _on_trash_event(self, kind, path, detail):
+        """Log a TrashQueue event (runs on the Tk thread)."""
+        name = os.path.basename(path)
+        if kind == 'trashed':
+            self._log_output(f"Original moved to trash: {name}")
+        elif kind == 'retry':
+            self._log_output(f"Trash failed for {name}, will retry: {detail}")
+        elif kind == 'failed':
+            self._log_output(f"Could not move file to trash: {name}: {detail}")
+            messagebox.showerror("Error", f"Could not move file to trash: {path}\n{detail}")
+
+    def _show_trash_queue(self):
+        """Window listing queued (undoable), trashed and failed originals."""
+        window = tk.Toplevel(self.root)
+        window.title("Trash Queue")
+
+        listbox = tk.Listbox(window, width=100, height=20, selectmode=tk.EXTENDED,
+                             font=("Consolas", 10))
+        listbox.pack(padx=10, pady=10, fill='both', expand=True)
+        queued_paths = []
+
+        def refresh():
+            queued_paths[:] = self.trash_queue.pending_paths()
+            listbox.delete(0, tk.END)
+            for path in queued_paths:
+                listbox.insert(tk.END, f"[queued]  {path}")
+            for path, when in reversed(self.trash_queue.trashed):
+                listbox.insert(tk.END, f"[trashed {time.strftime('%H:%M:%S', time.localtime(when))}]  {path}")
+            for path, error in self.trash_queue.failed:
+                listbox.insert(tk.END, f"[failed]  {path}  ({error})")
+
+        def undo_selected():
+            # Only queued rows (always listed first) can still be undone.
+            for index in listbox.curselection():
+                if index < len(queued_paths) and not self.trash_queue.undo(queued_paths[index]):
+                    self._log_output(f"Undo: {queued_paths[index]} is already being moved to the trash")
+            refresh()
+
+        def undo_all():
+            count = self.trash_queue.undo()
+            self._log_output(f"Undo: {count} file(s) removed from the trash queue")
+            refresh()
+
+        button_frame = tk.Frame(window)
+        button_frame.pack(pady=(0, 10))
+        tk.Button(button_frame, text="Undo Selected", command=undo_selected,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Undo All Queued", command=undo_all,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Refresh", command=refresh,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    # ----------------------------------------------------------------------
+    # Contact sheet
+    # ----------------------------------------------------------------------
+
+    def show_contact_sheet(self):
+        """Thumbnail grid of the listed clips (or a chosen folder) with HDR badges."""
+        # A multi-row selection narrows the sheet; the single focused row
+        # is just the active video, so that still shows the whole list.
+        paths = list(self.file_list.selection())
+        if len(paths) < 2:
+            paths = list(self.file_list.get_children())
+        if not paths:
+            initial_dir = self.config.last_video_path if os.path.exists(self.config.last_video_path) else os.getcwd()
+            root_dir = filedialog.askdirectory(initialdir=initial_dir)
+            if not root_dir:
+                return
+            paths = [entry.path for entry in
+                     IngestIndexer.iter_inputs(os.path.abspath(root_dir), self.output_prefix.get())]
+        if not paths:
+            messagebox.showinfo("Contact Sheet", "No videos to show.")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title(f"Contact Sheet - {len(paths)} clip(s)")
+        window.geometry(f"{CONTACT_SHEET_COLUMNS * (THUMBNAIL_WIDTH + 16) + 40}x700")
+        use_lut = tk.BooleanVar(value=False)
+        status = tk.StringVar(value='')
+
+        controls = tk.Frame(window)
+        controls.pack(fill='x', padx=10, pady=(10, 0))
+        canvas = tk.Canvas(window, highlightthickness=0)
+        scrollbar = tk.Scrollbar(window, command=canvas.yview)
+        canvas.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill='y')
+        canvas.pack(side=tk.LEFT, fill='both', expand=True, padx=10, pady=10)
+        grid = tk.Frame(canvas)
+        canvas.create_window((0, 0), window=grid, anchor='nw')
+        grid.bind('<Configure>', lambda e: canvas.config(scrollregion=canvas.bbox('all')))
+
+        # The PhotoImages must outlive this call or Tk blanks the labels.
+        images = {}
+        cells = {}
+        run = {'stop': threading.Event()}
+
+        def build_cells():
+            for child in grid.winfo_children():
+                child.destroy()
+            images.clear()
+            cells.clear()
+            blank = images['blank'] = tk.PhotoImage(width=THUMBNAIL_WIDTH, height=THUMBNAIL_WIDTH * 9 // 16)
+            for index, path in enumerate(paths):
+                cell = tk.Frame(grid, bd=1, relief=tk.GROOVE)
+                cell.grid(row=index // CONTACT_SHEET_COLUMNS, column=index % CONTACT_SHEET_COLUMNS,
+                          padx=4, pady=4, sticky='n')
+                picture = tk.Label(cell, image=blank, cursor='hand2')
+                picture.pack()
+                badge = tk.Label(cell, text='...', font=self.default_font)
+                badge.pack(fill='x')
+                tk.Label(cell, text=os.path.basename(path), font=self.default_font,
+                         wraplength=THUMBNAIL_WIDTH).pack()
+                for widget in (cell, picture):
+                    widget.bind('<Button-1>', lambda e, p=path: self._select_video(p))
+                cells[path] = (picture, badge)
+
+        def show_result(result, stop_event):
+            # Results can land after the window has been closed, or from a
+            # run Regenerate has since replaced (its cells are gone, and the
+            # new run's cell for the same clip must not get the old LUT).
+            if (stop_event is not run['stop'] or not window.winfo_exists()
+                    or result['input'] not in cells):
+                return
+            picture, badge = cells[result['input']]
+            if result['error']:
+                badge.config(text='error', bg='#f4cccc')
+                self._log_output(f"Contact sheet: {os.path.basename(result['input'])}: {result['error']}")
+                return
+            try:
+                images[result['input']] = tk.PhotoImage(file=result['thumbnail'])
+                picture.config(image=images[result['input']])
+            except tk.TclError as e:
+                self._log_output(f"Contact sheet: cannot show {result['thumbnail']}: {e}")
+            # Green when the source already carries the transfer the HDR
+            # panel will tag; amber when muxing would relabel it.
+            expected = self.hdr_transfer.get()
+            matches = not result['transfer'] or result['transfer'] == expected
+            badge.config(text=transfer_badge(result['transfer'], result['range']),
+                         bg='#d9ead3' if matches else '#fce5cd')
+
+        def start():
+            run['stop'].set()
+            run['stop'] = stop_event = threading.Event()
+            build_cells()
+            lut = self.lut_path.get() if use_lut.get() and os.path.exists(self.lut_path.get()) else None
+            status.set(f"Generating {len(paths)} thumbnail(s)...")
+
+            def worker():
+                try:
+                    totals = generate_contact_sheet(
+                        paths, lut, cache=self.thumbnail_cache, stop_event=stop_event,
+                        on_result=lambda result: self.root.after(0, lambda: show_result(result, stop_event)))
+                except Exception as e:
+                    self.root.after(0, lambda message=f"Contact sheet error: {e}":
+                                    stop_event is run['stop'] and status.set(message))
+                    return
+                summary = (f"{totals['total']} clip(s) in {totals['seconds']:.1f}s: "
+                           f"{totals['cached']} cached, {totals['generated']} generated, "
+                           f"{totals['failed']} failed")
+                self.root.after(0, lambda: stop_event is run['stop'] and window.winfo_exists()
+                                and status.set(summary))
+            threading.Thread(target=worker, daemon=True).start()
+
+        def on_close():
+            run['stop'].set()
+            window.destroy()
+
+        tk.Checkbutton(controls, text="Apply LUT", variable=use_lut,
+                       font=self.default_font).pack(side=tk.LEFT)
+        tk.Button(controls, text="Regenerate", command=start,
+                  font=self.default_font).pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, textvariable=status, font=self.default_font).pack(side=tk.LEFT, padx=5)
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        start()
+
+    def _select_video(self, path):
+        """Make path the active video, selecting its file list row if it has one."""
+        if self.file_list.exists(path):
+            self.file_list.selection_set(path)
+            self.file_list.focus(path)
+            self.file_list.see(path)
+        self.video_path.set(path)
+        self._show_instant_info(path)
+
+    def _on_close(self):
+        """Stop proxy encodes (after asking) and finish confirmed trash work before exiting."""
+        # The trash dialog pumps events, so a second close click lands here.
+        if self._closing:
+            return
+        encodes = self.proxy_builder.pending()
+        if encodes and not messagebox.askyesno(
+                "Proxy encodes running",
+                f"{encodes} proxy encode(s) are still queued or running.\n\n"
+                "Stop them and close?"):
+            return
+        self._closing = True
+        self.proxy_builder.shutdown()
+        if self.trash_queue.pending_paths():
+            # The user already confirmed these; skip the undo window rather
+            # than silently leaving the originals behind.
+            self._flush_trash_with_progress()
+        self.trash_queue.stop()
+        # Archive copies and the like may still be running for the last job.
+        wait_for_hooks()
+        self.root.destroy()
+
+    def _flush_trash_with_progress(self):
+        """Flush the trash queue off the Tk thread behind a small progress dialog."""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Finishing trash")
+        dialog.transient(self.root)
+        dialog.protocol("WM_DELETE_WINDOW", lambda: None)
+        status = tk.StringVar()
+        tk.Label(dialog, textvariable=status, font=self.default_font,
+                 padx=20, pady=15).pack()
+        dialog.grab_set()
+        flusher = threading.Thread(target=self.trash_queue.flush,
+                                   kwargs={'timeout': TRASH_CLOSE_TIMEOUT}, daemon=True)
+        flusher.start()
+        while flusher.is_alive():
+            status.set(f"Moving {len(self.trash_queue.pending_paths())} confirmed "
+                       f"original(s) to the trash...")
+            self.root.update()
+            flusher.join(0.1)
+        left = self.trash_queue.pending_paths()
+        if left:
+            print(f'[HDRVideoProcessor._on_close] {len(left)} original(s) not trashed '
+                  f'within {TRASH_CLOSE_TIMEOUT:.0f}s')
+        dialog.destroy()
+
     def _handle_drop(self, event):
         """Handle files dropped on the main window"""
         files = self.root.tk.splitlist(event.data)
         if not files:
             return
 
-        file_path = files[0]
         # Accept any extension mkvinfo or ffprobe might understand for the
-        # instant-info path, but still gate the actual mkvmerge pipeline on
-        # the supported source extensions (mov/mp4) like before.
-        if file_path.lower().endswith(('.mov', '.mp4', '.mkv', '.mka', '.mks', '.webm', '.m4v')):
-            self.video_path.set(file_path)
-            if self.save_video_path.get():
-                self.config.update_video_path(os.path.dirname(file_path))
-            # Instant probe: user wants metadata immediately on drop.
-            self._probe_file_instantly(file_path)
-        elif file_path.lower().endswith('.cube'):
-            self.lut_path.set(file_path)
+        # instant-info path. Every video in the drop goes into the file list;
+        # a .cube anywhere in the drop becomes the LUT.
+        videos = [f for f in files if f.lower().endswith(VIDEO_EXTENSIONS)]
+        luts = [f for f in files if f.lower().endswith('.cube')]
+        if videos:
+            self._set_dropped_videos(videos)
+        if len(luts) > 1:
+            # Several LUTs at once: let the user order them into a chain.
+            self.show_lut_chain(luts)
+        elif luts:
+            self.lut_path.set(luts[0])
             if self.save_lut_path.get():
-                self.config.update_lut_path(file_path)
+                self.config.update_lut_path(luts[0])
 
     def _handle_video_drop(self, event):
         """Handle files dropped on video drop zone"""
         files = self.root.tk.splitlist(event.data)
         # Same widened extension set as _handle_drop — see comment there.
-        if files and files[0].lower().endswith(('.mov', '.mp4', '.mkv', '.mka', '.mks', '.webm', '.m4v')):
-            self.video_path.set(files[0])
-            if self.save_video_path.get():
-                self.config.update_video_path(os.path.dirname(files[0]))
-            # Fire the instant info probe the moment the file lands.
-            self._probe_file_instantly(files[0])
+        videos = [f for f in files if f.lower().endswith(VIDEO_EXTENSIONS)]
+        if videos:
+            self._set_dropped_videos(videos)
+
+    def _set_dropped_videos(self, videos):
+        """Make the first dropped video active and probe the whole drop."""
+        self.video_path.set(videos[0])
+        if self.save_video_path.get():
+            self.config.update_video_path(os.path.dirname(videos[0]))
+        # Fire the instant info probes the moment the files land.
+        self._probe_files(videos)
 
     def _handle_lut_drop(self, event):
         """Handle files dropped on LUT drop zone"""
         files = self.root.tk.splitlist(event.data)
-        if files and files[0].lower().endswith('.cube'):
+        luts = [f for f in files if f.lower().endswith('.cube')]
+        if len(luts) > 1:
+            self.show_lut_chain(luts)
+        elif files and files[0].lower().endswith('.cube'):
             self.lut_path.set(files[0])
             if self.save_lut_path.get():
                 self.config.update_lut_path(files[0])
@@ -1105,6 +7104,91 @@ class HDRVideoProcessor:
         """Start the GUI"""
         self.root.mainloop()
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HDR Video Processor")
+    parser.add_argument('--serve', metavar='[HOST:]PORT',
+                        help='run a headless job server instead of the GUI')
+    parser.add_argument('--local-workers', type=int, default=0, metavar='N',
+                        help='with --serve, also start N worker processes on this machine')
+    parser.add_argument('--worker', metavar='URL',
+                        help='run a headless worker pulling jobs from the server at URL')
+    parser.add_argument('--worker-name', help='name reported by --worker (default host:pid)')
+    parser.add_argument('--job-token', default=os.environ.get(JOB_TOKEN_ENV), metavar='TOKEN',
+                        help=f'shared secret for --serve/--worker; required to serve on a '
+                             f'non-loopback address (default: ${JOB_TOKEN_ENV})')
+    parser.add_argument('--mkvmerge', help='mkvmerge binary for workers (default: bundled)')
+    parser.add_argument('--priority', choices=sorted(PROCESS_PRIORITIES), default='balanced',
+                        help='CPU/IO priority of mkvmerge/ffmpeg children in headless modes')
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DIR, metavar='DIR',
+                        help=f'cProfile + tracemalloc every probe/mux job into DIR '
+                             f'(default: {PROFILE_DIR})')
+    parser.add_argument('--plugin-dir', default=PLUGIN_DIR, metavar='DIR',
+                        help=f'load pipeline hook plugins from DIR (default: {PLUGIN_DIR})')
+    parser.add_argument('--event-log', metavar='PATH',
+                        help='append JSON-lines events to PATH (headless modes)')
+    parser.add_argument('--metrics-port', type=int, default=0, metavar='PORT',
+                        help='serve Prometheus metrics at http://127.0.0.1:PORT/metrics '
+                             '(the job server always serves /metrics on its own port)')
+    parser.add_argument('--benchmark', metavar='INPUT',
+                        help='time single-pass, segmented and native muxes of INPUT')
+    parser.add_argument('--lut', help='LUT to attach for --benchmark')
+    parser.add_argument('--segments', type=int, default=0, metavar='N',
+                        help='part count for --benchmark (default: SEGMENT_MAX_PARALLEL)')
+    args = parser.parse_args(argv)
+
+    if args.event_log:
+        EVENT_LOG.configure(args.event_log)
+    set_process_priority(args.priority)
+    set_profiling(args.profile)
+    if args.metrics_port and (args.serve or args.worker):
+        start_metrics_server(args.metrics_port)
+
+    if args.benchmark:
+        if not args.lut:
+            parser.error('--benchmark needs --lut')
+        run_benchmark(args.benchmark, args.lut, args.mkvmerge, args.segments or None)
+        return
+
+    # Benchmarks time the muxers alone; every other mode runs the plugins.
+    plugins, plugin_errors = load_plugins(args.plugin_dir)
+    plugin_messages = ([f"Loaded plugin {path}" for path in plugins] +
+                       [f"Could not load plugin {error}" for error in plugin_errors])
+    for message in plugin_messages:
+        print(f"[main] {message}")
+
+    if args.serve:
+        host, _sep, port = args.serve.rpartition(':')
+        try:
+            server = JobServer(host or '127.0.0.1', int(port), token=args.job_token)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Job server listening on {server.url}")
+        workers = spawn_local_workers(server.url, args.local_workers, args.mkvmerge,
+                                      args.plugin_dir, token=args.job_token)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in workers:
+                process.terminate()
+        return
+
+    if args.worker:
+        print(f"Worker pulling jobs from {args.worker}")
+        try:
+            run_worker(args.worker, name=args.worker_name, mkvmerge_path=args.mkvmerge,
+                       token=args.job_token)
+        except KeyboardInterrupt:
+            pass
+        wait_for_hooks()
+        return
+
+    if TkinterDnD is None:
+        messagebox.showerror("Error", "Please install tkinterdnd2 using: pip install tkinterdnd2")
+        sys.exit(1)
+    app = HDRVideoProcessor(plugin_messages)
+    app.run()
+
 if __name__ == "__main__":
-    app = HDRVideoProcessor()
-    app.run()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -4,6 +4,7 @@ python -m pip install --upgrade pip
 python -m pip install tkinterdnd2
 python -m pip install send2trash
 python -m pip install configparser
+python -m pip install numpy
 
 echo Creating fonts directory...
 mkdir "%LOCALAPPDATA%\Microsoft\Windows\Fonts" 2>nul
@@ -4,6 +4,7 @@ python3 -m pip install --upgrade pip
 python3 -m pip install tkinterdnd2
 python3 -m pip install send2trash
 python3 -m pip install configparser
+python3 -m pip install numpy
 
 echo "Creating fonts directory..."
 mkdir -p ~/.fonts
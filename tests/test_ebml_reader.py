@@ -0,0 +1,132 @@
+"""The minimal EBML / Matroska reader against hand-assembled files."""
+import struct
+
+import pytest
+
+import hdr_gui
+
+
+def vint_size(size, length=None):
+    if length is None:
+        length = 1
+        while size >= (1 << (7 * length)) - 1:
+            length += 1
+    return ((1 << (7 * length)) | size).to_bytes(length, 'big')
+
+
+def element(eid, payload, size_length=None):
+    return eid.to_bytes((eid.bit_length() + 7) // 8, 'big') + vint_size(len(payload), size_length) + payload
+
+
+def uint(eid, value):
+    return element(eid, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+def float64(eid, value):
+    return element(eid, struct.pack('>d', value))
+
+
+def string(eid, text):
+    return element(eid, text.encode('utf-8'))
+
+
+EBML_HEADER = element(hdr_gui.EBML_ID_HEADER, string(hdr_gui.EBML_ID_DOCTYPE, 'matroska'))
+INFO = element(hdr_gui.MKV_ID_INFO, uint(hdr_gui.MKV_ID_TIMESTAMP_SCALE, 1000000) +
+               float64(hdr_gui.MKV_ID_DURATION, 12500.0))
+COLOUR = element(hdr_gui.MKV_ID_COLOUR,
+                 uint(hdr_gui.MKV_ID_MATRIX, 9) + uint(hdr_gui.MKV_ID_RANGE, 1) +
+                 uint(hdr_gui.MKV_ID_TRANSFER, 18) + uint(hdr_gui.MKV_ID_PRIMARIES, 9) +
+                 element(hdr_gui.MKV_ID_MASTERING,
+                         float64(hdr_gui.MKV_ID_WHITE_X, 0.3127) + float64(hdr_gui.MKV_ID_WHITE_Y, 0.329) +
+                         float64(hdr_gui.MKV_ID_LUMINANCE_MAX, 1000.0)))
+TRACKS = element(hdr_gui.MKV_ID_TRACKS, element(
+    hdr_gui.MKV_ID_TRACK_ENTRY, uint(hdr_gui.MKV_ID_TRACK_TYPE, 1) + element(hdr_gui.MKV_ID_VIDEO, COLOUR)))
+ATTACHMENTS = element(hdr_gui.MKV_ID_ATTACHMENTS, element(
+    hdr_gui.MKV_ID_ATTACHED_FILE, string(hdr_gui.MKV_ID_FILE_NAME, 'look.cube') +
+    string(hdr_gui.MKV_ID_FILE_MIME, 'application/x-cube')))
+CLUSTER = element(hdr_gui.MKV_ID_CLUSTER, uint(0xE7, 0) + element(0xA3, b'\x81\0\0\x80frame'))
+
+
+def segment(*children, size=None):
+    body = b''.join(children)
+    if size == 'unknown':
+        return hdr_gui.MKV_ID_SEGMENT.to_bytes(4, 'big') + b'\x01' + b'\xff' * 7 + body
+    return element(hdr_gui.MKV_ID_SEGMENT, body, 8)
+
+
+def write(tmp_path, data, name='clip.mkv'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_vint_round_trip():
+    for value in (0, 1, 126, 127, 16382, 16383, 2 ** 20, 2 ** 40):
+        encoded = vint_size(value)
+        assert hdr_gui._ebml_read_size(encoded, 0) == (value, len(encoded))
+    assert hdr_gui._ebml_read_size(b'\xff', 0) == (None, 1)
+    assert hdr_gui._ebml_read_size(b'\x01' + b'\xff' * 7, 0) == (None, 8)
+    assert hdr_gui._ebml_read_id(bytes.fromhex('1A45DFA3'), 0) == (hdr_gui.EBML_ID_HEADER, 4)
+    with pytest.raises(ValueError):
+        hdr_gui._ebml_read_id(b'\x00\x00', 0)
+
+
+def test_iter_ebml_clamps_unknown_sizes_and_stops_on_truncation():
+    body = uint(0xE7, 5) + uint(0xE7, 6)
+    unknown = hdr_gui.MKV_ID_CLUSTER.to_bytes(4, 'big') + b'\xff' + body
+    walked = list(hdr_gui.iter_ebml(unknown, 0, len(unknown)))
+    assert walked == [(hdr_gui.MKV_ID_CLUSTER, 0, 5, len(body))]
+
+    truncated = body + b'\xe7'         # ID with no size byte
+    assert [e[0] for e in hdr_gui.iter_ebml(truncated, 0, len(truncated))] == [0xE7, 0xE7]
+
+
+def test_summary_reads_header_elements_before_clusters(tmp_path):
+    path = write(tmp_path, EBML_HEADER + segment(INFO, TRACKS, ATTACHMENTS, CLUSTER))
+    summary = hdr_gui.read_mkv_summary(path)
+    assert summary['doc_type'] == 'matroska'
+    assert summary['duration_s'] == pytest.approx(12.5)
+    assert summary['colour'] == {'colour_matrix': '9', 'colour_range': '1', 'transfer': '18',
+                                 'primaries': '9', 'white_point': '0.3127,0.329',
+                                 'max_luminance': '1000'}
+    assert summary['attachments'] == [('look.cube', 'application/x-cube')]
+    assert summary['has_clusters']
+
+
+def test_summary_follows_seekhead_past_clusters(tmp_path):
+    # Attachments written after the media data, reachable only via the SeekHead.
+    def seek_head(position):
+        return element(hdr_gui.MKV_ID_SEEKHEAD, element(
+            hdr_gui.MKV_ID_SEEK, element(hdr_gui.MKV_ID_SEEK_ID, hdr_gui.MKV_ID_ATTACHMENTS.to_bytes(4, 'big')) +
+            element(hdr_gui.MKV_ID_SEEK_POSITION, position.to_bytes(4, 'big'))))
+
+    placeholder = seek_head(0)
+    position = len(placeholder) + len(INFO) + len(CLUSTER)
+    body = seek_head(position) + INFO + CLUSTER + ATTACHMENTS
+    for size in (None, 'unknown'):
+        summary = hdr_gui.read_mkv_summary(write(tmp_path, EBML_HEADER + segment(body, size=size)))
+        assert summary['attachments'] == [('look.cube', 'application/x-cube')]
+        assert summary['colour'] == {}
+
+
+def test_summary_rejects_non_matroska(tmp_path):
+    with pytest.raises(ValueError):
+        hdr_gui.read_mkv_summary(write(tmp_path, b'', 'empty.mkv'))
+    with pytest.raises(ValueError):
+        hdr_gui.read_mkv_summary(write(tmp_path, b'\0\0\0\x18ftypisom' + b'\0' * 16, 'clip.mp4'))
+    with pytest.raises(ValueError):
+        hdr_gui.read_mkv_summary(write(tmp_path, EBML_HEADER + INFO, 'nosegment.mkv'))
+
+
+@pytest.mark.parametrize('scale, expected', [
+    (1000000, 'track 1, +40 ms, key, 5 bytes'),
+    (100000, 'track 1, +40 ticks (+4 ms), key, 5 bytes'),
+])
+def test_browser_converts_block_timestamps_with_timestamp_scale(tmp_path, scale, expected):
+    info = element(hdr_gui.MKV_ID_INFO, uint(hdr_gui.MKV_ID_TIMESTAMP_SCALE, scale))
+    cluster = element(hdr_gui.MKV_ID_CLUSTER, uint(0xE7, 0) + element(0xA3, b'\x81\x00\x28\x80frame'))
+    browser = hdr_gui.MkvElementBrowser(write(tmp_path, EBML_HEADER + segment(info, cluster)))
+    _segment_header, seg = browser.roots()
+    clusters = [e for e in browser.children(seg)[0] if e[0] == hdr_gui.MKV_ID_CLUSTER]
+    block = browser.children(clusters[0])[0][1]
+    assert browser.describe([block]) == [('SimpleBlock', expected)]
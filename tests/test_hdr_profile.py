@@ -0,0 +1,117 @@
+"""HDR profile validation, compilation and the user library loader."""
+import json
+
+import pytest
+
+import hdr_gui
+
+PQ_1000 = dict(hdr_gui.HDR_PRESETS['Generic Rec.2100 PQ / HDR10 (1000 nits)'])
+
+
+def with_fields(**fields):
+    return dict(PQ_1000, **fields)
+
+
+def test_preset_compiles_to_flags():
+    profile = hdr_gui.compile_hdr_profile(PQ_1000)
+    flags = dict(zip(profile.flags[::2], profile.flags[1::2]))
+    assert flags['--colour-transfer-characteristics'] == '0:16'
+    assert flags['--chromaticity-coordinates'] == '0:0.708,0.292,0.170,0.797,0.131,0.046'
+    assert flags['--min-luminance'] == '0:0.0001'
+    assert len(profile.flags) == 2 * len(hdr_gui.HDR_PROFILE_FIELDS)
+
+
+def test_blank_fields_produce_no_flag():
+    profile = hdr_gui.compile_hdr_profile(hdr_gui.HDR_PRESETS['SDR Rec.709 (no HDR)'])
+    assert profile.flags == ('--colour-matrix', '0:1', '--colour-range', '0:1',
+                             '--colour-transfer-characteristics', '0:1', '--colour-primaries', '0:1')
+    assert profile.get('max_cll') == ''
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('colour_range', '4', 'colour_range: 4 is outside 0..3'),
+    ('transfer', '19', 'transfer: 19 is outside 0..18'),
+    ('max_cll', '70000', 'max_cll: 70000 is outside 0..65535'),
+    ('max_luminance', '10001', 'max_luminance: 10001 is outside 0.0..10000.0'),
+    ('colour_matrix', 'nine', "colour_matrix: 'nine' is not an integer"),
+    ('chromaticity', '0.708,0.292,0.170,0.797,0.131', 'chromaticity: needs 6 comma-separated values, got 5'),
+    ('white_point', '0.3127,1.2', 'white_point: coordinate 1.2 is outside 0..1'),
+])
+def test_range_and_shape_rejections(field, value, message):
+    with pytest.raises(hdr_gui.HDRProfileError) as info:
+        hdr_gui.compile_hdr_profile(with_fields(**{field: value}))
+    assert str(info.value) == message
+
+
+def test_every_problem_is_reported():
+    with pytest.raises(hdr_gui.HDRProfileError) as info:
+        hdr_gui.compile_hdr_profile(with_fields(colour_range='9', white_point='0.3'))
+    assert 'colour_range:' in str(info.value) and 'white_point:' in str(info.value)
+
+
+def test_cross_field_rejections():
+    with pytest.raises(hdr_gui.HDRProfileError, match='max_fall: must not exceed max_cll'):
+        hdr_gui.compile_hdr_profile(with_fields(max_cll='400', max_fall='1000'))
+    with pytest.raises(hdr_gui.HDRProfileError, match='min_luminance: must be below max_luminance'):
+        hdr_gui.compile_hdr_profile(with_fields(min_luminance='1000'))
+
+
+def test_numbers_and_strings_compile_alike():
+    numeric = with_fields(colour_matrix=9, colour_range=1, transfer=16, primaries=9,
+                          max_cll=1000, max_fall=400, max_luminance=1000, min_luminance=0.0001)
+    assert hdr_gui.compile_hdr_profile(numeric) is hdr_gui.compile_hdr_profile(PQ_1000)
+    # Whitespace and None are normalised the same way.
+    assert hdr_gui.compile_hdr_profile(with_fields(transfer=' 16 ')) is hdr_gui.compile_hdr_profile(PQ_1000)
+    assert hdr_gui.compile_hdr_profile(with_fields(max_cll=None, max_fall=None)).get('max_cll') == ''
+
+
+@pytest.mark.parametrize('values', [
+    ['not', 'a', 'dict'],
+    with_fields(transfer=True),
+    with_fields(chromaticity=[0.708, 0.292]),
+])
+def test_wrong_types_are_rejected(values):
+    with pytest.raises(hdr_gui.HDRProfileError):
+        hdr_gui.compile_hdr_profile(values)
+
+
+def test_profiles_are_interned_per_name():
+    first = hdr_gui.compile_hdr_profile(dict(PQ_1000), 'mine')
+    assert hdr_gui.compile_hdr_profile(dict(PQ_1000), 'mine') is first
+    assert hdr_gui.compile_hdr_profile(dict(PQ_1000), 'other') is not first
+    with pytest.raises(AttributeError):
+        first.name = 'changed'
+
+
+def test_library_skips_bad_entries(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'Good': with_fields(max_cll=600), 'Bad': with_fields(colour_range='7'),
+                                'Numeric': {'transfer': 18, 'colour_range': 1}, 'Wrong': 'text'}))
+    profiles, errors = hdr_gui.load_hdr_profiles(str(path))
+    assert profiles['Good'].get('max_cll') == '600'
+    assert profiles['Numeric'].get('transfer') == '18'
+    assert 'Bad' not in profiles and 'Wrong' not in profiles
+    assert [error.split(':')[0] for error in errors] == ['Bad', 'Wrong']
+    # Built-in presets are always there.
+    assert 'SDR Rec.709 (no HDR)' in profiles
+
+
+@pytest.mark.parametrize('text', ['{"truncated": ', '["a", "list"]', '42'])
+def test_malformed_library_keeps_presets(tmp_path, text):
+    path = tmp_path / 'profiles.json'
+    path.write_text(text)
+    profiles, errors = hdr_gui.load_hdr_profiles(str(path))
+    assert len(errors) == 1 and errors[0].startswith(str(path))
+    assert set(profiles) == {name for name, values in hdr_gui.HDR_PRESETS.items() if values}
+
+
+def test_save_then_load_round_trip(tmp_path):
+    path = str(tmp_path / 'profiles.json')
+    hdr_gui.save_hdr_profile(hdr_gui.compile_hdr_profile(with_fields(max_cll=800), 'Grade A'), path)
+    profiles, errors = hdr_gui.load_hdr_profiles(path)
+    assert errors == [] and profiles['Grade A'].get('max_cll') == '800'
+
+    with open(path, 'w') as f:
+        f.write('[]')
+    with pytest.raises(ValueError):
+        hdr_gui.save_hdr_profile(profiles['Grade A'], path)
@@ -0,0 +1,119 @@
+"""JobServer's lease, re-queue and ownership rules, driven in-process."""
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import hdr_gui
+
+SPEC = {'input': '/shared/clip.mov', 'lut': '/shared/grade.cube', 'output_prefix': '_hdr'}
+
+
+@pytest.fixture
+def server():
+    server = hdr_gui.JobServer('127.0.0.1', 0)
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def expire_lease(server, job_id):
+    server.jobs[job_id]['heartbeat'] -= hdr_gui.JOB_LEASE_SECONDS + 1
+
+
+def post(server, path, data, token=None):
+    """Raw POST so malformed bodies reach the handler as sent."""
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    request = urllib.request.Request(server.url + path, data=data, method='POST', headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_claim_is_fifo_and_idle_returns_none(server):
+    first = server.submit(dict(SPEC, input='/shared/a.mov'))
+    second = server.submit(dict(SPEC, input='/shared/b.mov'))
+    assert server.claim('w1')['id'] == first['id']
+    assert server.claim('w2')['id'] == second['id']
+    assert server.claim('w3') is None
+
+
+def test_expired_lease_is_requeued_and_reclaimed(server):
+    job = server.submit(SPEC)
+    assert server.claim('w1')['worker'] == 'w1'
+    # Within the lease nobody else gets it.
+    assert server.claim('w2') is None
+
+    expire_lease(server, job['id'])
+    reclaimed = server.claim('w2')
+    assert reclaimed['id'] == job['id'] and reclaimed['worker'] == 'w2'
+    assert 'Lease expired on w1' in reclaimed['detail']
+
+
+def test_heartbeat_keeps_the_lease(server):
+    job = server.submit(SPEC)
+    server.claim('w1')
+    expire_lease(server, job['id'])
+    server.update(job['id'], {'worker': 'w1', 'status': 'running', 'progress': 40})
+    assert server.claim('w2') is None
+    assert server.snapshot(job['id'])['progress'] == 40
+
+
+def test_stale_worker_update_is_refused(server):
+    job = server.submit(SPEC)
+    server.claim('w1')
+    expire_lease(server, job['id'])
+    server.claim('w2')
+
+    with pytest.raises(hdr_gui.JobLeaseError):
+        server.update(job['id'], {'worker': 'w1', 'status': 'failed', 'detail': 'late'})
+    status, body = post(server, f"/jobs/{job['id']}/status",
+                        json.dumps({'worker': 'w1', 'status': 'done'}).encode())
+    assert status == 409 and b'not leased to' in body
+
+    server.update(job['id'], {'worker': 'w2', 'status': 'done', 'progress': 100})
+    finished = server.snapshot(job['id'])
+    assert finished['status'] == 'done' and finished['worker'] == 'w2' and finished['finished']
+    # Finished jobs take no more updates, even from their last worker.
+    with pytest.raises(hdr_gui.JobLeaseError):
+        server.update(job['id'], {'worker': 'w2', 'status': 'running'})
+
+
+def test_bad_requests(server):
+    job = server.submit(SPEC)
+    server.claim('w1')
+    assert post(server, f"/jobs/{job['id']}/status", b'["not", "an", "object"]')[0] == 400
+    assert post(server, f"/jobs/{job['id']}/status", b'{not json')[0] == 400
+    assert post(server, f"/jobs/{job['id']}/status",
+                json.dumps({'worker': 'w1', 'status': 'paused'}).encode())[0] == 400
+    assert post(server, '/jobs/999/status', json.dumps({'worker': 'w1'}).encode())[0] == 404
+    assert post(server, '/jobs', json.dumps({'input': '/shared/clip.mov'}).encode())[0] == 400
+
+
+@pytest.mark.parametrize('prefix', ['/../../x', '..', 'sub/dir', 'sub\\dir'])
+def test_path_like_output_prefix_is_refused(server, prefix):
+    status, _body = post(server, '/jobs', json.dumps(dict(SPEC, output_prefix=prefix)).encode())
+    assert status == 400
+    assert server.snapshot() == []
+
+
+def test_token_is_required_when_set():
+    server = hdr_gui.JobServer('127.0.0.1', 0, token='s3cret')
+    server.start()
+    try:
+        assert post(server, '/jobs', json.dumps(SPEC).encode())[0] == 401
+        assert post(server, '/jobs', json.dumps(SPEC).encode(), token='wrong')[0] == 401
+        assert post(server, '/jobs', json.dumps(SPEC).encode(), token='s3cret')[0] == 201
+        assert hdr_gui.JobClient(server.url, token='s3cret').claim('w1')['worker'] == 'w1'
+    finally:
+        server.shutdown()
+
+
+def test_non_loopback_bind_needs_a_token():
+    with pytest.raises(ValueError, match='needs a token'):
+        hdr_gui.JobServer('0.0.0.0', 0)
@@ -0,0 +1,47 @@
+"""save_json_state and the index/history classes that persist through it."""
+import json
+import threading
+
+import pytest
+
+import hdr_gui
+
+
+def test_concurrent_saves_leave_valid_json(tmp_path):
+    path = str(tmp_path / 'index.json')
+    entries, lock = {}, threading.Lock()
+
+    def writer(n):
+        for i in range(50):
+            with lock:
+                entries[f'{n}-{i}'] = 'x' * 500
+            hdr_gui.save_json_state(path, entries, lock)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(path, encoding='utf-8') as f:
+        assert len(json.load(f)) == 200
+    assert [p.name for p in tmp_path.iterdir()] == ['index.json']
+
+
+def test_failed_save_keeps_the_previous_file(tmp_path):
+    path = str(tmp_path / 'index.json')
+    lock = threading.Lock()
+    hdr_gui.save_json_state(path, {'kept': 1}, lock)
+    with pytest.raises(TypeError):
+        hdr_gui.save_json_state(path, {'bad': object()}, lock)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'kept': 1}
+    assert [p.name for p in tmp_path.iterdir()] == ['index.json']
+
+
+def test_dedupe_history_round_trip(tmp_path):
+    history_file = str(tmp_path / 'dedupe.json')
+    output = tmp_path / 'clip_hdr.mkv'
+    output.write_bytes(b'mkv')
+    hdr_gui.DedupeHistory(history_file).record('abc', 'profile', '/in/clip.mov', str(output))
+    assert hdr_gui.DedupeHistory(history_file).lookup('abc', 'profile') == str(output)
+    assert hdr_gui.DedupeHistory(history_file).lookup('abc', 'other') is None
@@ -0,0 +1,94 @@
+"""Round trips through the .cube reader/writer and the LUT chain baker."""
+import pytest
+
+import hdr_gui
+
+np = pytest.importorskip('numpy')
+
+
+def lattice(size):
+    """(b, g, r, 3) identity lattice, red fastest like a .cube file."""
+    steps = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    b, g, r = np.meshgrid(steps, steps, steps, indexing='ij')
+    return np.stack([r, g, b], axis=-1)
+
+
+def affine_cube(path, scale, offset, size=3):
+    """A 3D .cube for rgb -> rgb * scale + offset (exact under trilinear)."""
+    hdr_gui.write_cube(str(path), lattice(size) * np.float32(scale) + np.float32(offset))
+    return str(path)
+
+
+def test_write_then_read_round_trip(tmp_path):
+    rng = np.random.default_rng(7)
+    table = rng.random((5, 5, 5, 3), dtype=np.float32)
+    path = tmp_path / 'random.cube'
+    hdr_gui.write_cube(str(path), table, np.array([-0.1] * 3), np.array([1.5] * 3), title='rand')
+
+    (stage,) = hdr_gui.read_cube(str(path))
+    assert stage['kind'] == '3d' and stage['size'] == 5
+    np.testing.assert_allclose(stage['table'], table, atol=1e-6)
+    np.testing.assert_allclose(stage['domain_min'], [-0.1] * 3)
+    np.testing.assert_allclose(stage['domain_max'], [1.5] * 3)
+    # Red varies fastest in the file: second row is r = lattice step 1.
+    assert path.read_text().splitlines()[5].split() == [f'{v:.6f}' for v in table[0, 0, 1]]
+
+
+def test_chain_applies_stages_in_order(tmp_path):
+    halve = affine_cube(tmp_path / 'halve.cube', 0.5, 0.0)
+    lift = affine_cube(tmp_path / 'lift.cube', 1.0, 0.25, size=2)
+
+    table, _lo, _hi = hdr_gui.bake_lut_chain([halve, lift], size=9)
+    np.testing.assert_allclose(table, lattice(9) * 0.5 + 0.25, atol=1e-6)
+    table, _lo, _hi = hdr_gui.bake_lut_chain([lift, halve], size=9)
+    # lift's output reaches 1.25, which halve clamps to its 1.0 domain edge.
+    np.testing.assert_allclose(table, np.minimum(lattice(9) + 0.25, 1.0) * 0.5, atol=1e-6)
+
+
+def test_shaper_input_range_becomes_the_composite_domain(tmp_path):
+    shaper = tmp_path / 'log_to_linear.cube'
+    rows = ['LUT_1D_SIZE 3', 'LUT_1D_INPUT_RANGE 0.0 2.0', 'LUT_3D_SIZE 2']
+    rows += ['0 0 0', '0.5 0.5 0.5', '1 1 1']
+    rows += [' '.join(f'{v:g}' for v in rgb) for rgb in lattice(2).reshape(-1, 3)]
+    shaper.write_text('\n'.join(rows) + '\n')
+
+    kinds = [stage['kind'] for stage in hdr_gui.read_cube(str(shaper))]
+    assert kinds == ['1d', '3d']
+    table, domain_min, domain_max = hdr_gui.bake_lut_chain([str(shaper)], size=5)
+    np.testing.assert_allclose(domain_max, [2.0] * 3)
+    np.testing.assert_allclose(table, lattice(5), atol=1e-6)
+
+    baked = tmp_path / 'baked.cube'
+    hdr_gui.write_cube(str(baked), table, domain_min, domain_max)
+    assert 'DOMAIN_MAX 2.000000 2.000000 2.000000' in baked.read_text()
+    np.testing.assert_allclose(hdr_gui.apply_lut_stage(hdr_gui.read_cube(str(baked))[0],
+                                                       np.array([1.0, 2.0, 0.5], np.float32)),
+                               [0.5, 1.0, 0.25], atol=1e-6)
+
+
+def test_composite_lut_is_cached_by_content(tmp_path):
+    cache = tmp_path / 'cache'
+    first = affine_cube(tmp_path / 'a.cube', 0.5, 0.0)
+    second = affine_cube(tmp_path / 'b.cube', 1.0, 0.1)
+
+    assert hdr_gui.composite_lut([first], 9, str(cache)) == (first, True)
+    path, cached = hdr_gui.composite_lut([first, second], 9, str(cache))
+    assert not cached and path.startswith(str(cache))
+    assert hdr_gui.composite_lut([first, second], 9, str(cache)) == (path, True)
+    (stage,) = hdr_gui.read_cube(path)
+    np.testing.assert_allclose(stage['table'], lattice(9) * 0.5 + 0.1, atol=1e-6)
+
+    affine_cube(tmp_path / 'b.cube', 1.0, 0.2)           # same name, new contents
+    edited, cached = hdr_gui.composite_lut([first, second], 9, str(cache))
+    assert edited != path and not cached
+    assert sorted(p.suffix for p in cache.iterdir()) == ['.cube', '.cube']
+
+
+def test_malformed_cube_is_rejected(tmp_path):
+    path = tmp_path / 'short.cube'
+    path.write_text('LUT_3D_SIZE 2\n0 0 0\n1 1 1\n')
+    with pytest.raises(ValueError, match='expected 8'):
+        hdr_gui.read_cube(str(path))
+    path.write_text('0 0 0\n')
+    with pytest.raises(ValueError, match='LUT_3D_SIZE'):
+        hdr_gui.read_cube(str(path))
@@ -0,0 +1,260 @@
+"""Round trips through the native MP4 -> Matroska remuxer on tiny synthetic files."""
+import struct
+
+import pytest
+
+import hdr_gui
+
+
+# ---------------------------------------------------------------------------
+# Synthetic MP4 builder
+# ---------------------------------------------------------------------------
+def box(kind, payload):
+    return struct.pack('>I', 8 + len(payload)) + kind + payload
+
+
+def full_box(kind, payload, version=0, flags=0):
+    return box(kind, struct.pack('>I', (version << 24) | flags) + payload)
+
+
+def video_entry(width=1920, height=1080):
+    visual = b'\0' * 6 + b'\0\x01' + b'\0' * 16 + struct.pack('>HH', width, height) + b'\0' * 50
+    return box(b'avc1', visual + box(b'avcC', b'\x01\x64\x00\x28\xff\xe1AVCC'))
+
+
+def sound_entry(fourcc, version=0, channels=2, bits=16, rate=48000, v1=None, v2=None, children=b''):
+    """QuickTime/ISO sound sample entry; v1 = (bytes_per_frame,), v2 = (bits, flags, bytes_per_packet)."""
+    head = b'\0' * 6 + b'\0\x01' + struct.pack('>HHI', version, 0, 0)
+    if version == 2:
+        v2_bits, flags, packet = v2
+        body = (struct.pack('>HHhHII', 3, 16, -2, 0, 65536, 72) + struct.pack('>d', rate) +
+                struct.pack('>IIIIII', channels, 0x7F000000, v2_bits, flags, packet, 1))
+    else:
+        body = struct.pack('>HHhHI', channels, bits, 0, 0, rate << 16)
+        if version == 1:
+            body += struct.pack('>IIII', 1, v1[0], v1[0], v1[0] // channels)
+    return box(fourcc, head + body + children)
+
+
+def make_mp4(path, tracks):
+    """Write an MP4 from track dicts and return the sample payloads per track.
+
+    Each track dict has: handler, timescale, entry, chunks (list of lists of
+    sample bytes), and optionally stsz (explicit sizes, or an int for a
+    constant size), stts ([(count, delta)]), extra (bytes of extra stbl
+    boxes) and media_time (elst start).
+    """
+    ftyp = box(b'ftyp', b'isom' + b'\0' * 4 + b'isom')
+    mdat = b''
+    base = len(ftyp) + 8
+    offsets = [[] for _ in tracks]
+    for chunk_index in range(max(len(t['chunks']) for t in tracks)):
+        for i, track in enumerate(tracks):
+            if chunk_index < len(track['chunks']):
+                offsets[i].append(base + len(mdat))
+                mdat += b''.join(track['chunks'][chunk_index])
+
+    traks = b''
+    for i, track in enumerate(tracks):
+        samples = [s for chunk in track['chunks'] for s in chunk]
+        count = len(samples)
+        stsz = track.get('stsz')
+        if isinstance(stsz, int):
+            stsz_box = full_box(b'stsz', struct.pack('>II', stsz, count))
+        else:
+            sizes = stsz or [len(s) for s in samples]
+            stsz_box = full_box(b'stsz', struct.pack('>II', 0, count) +
+                                b''.join(struct.pack('>I', n) for n in sizes))
+        stts = track.get('stts') or [(count, 1)]
+        runs = []
+        for number, chunk in enumerate(track['chunks'], 1):
+            if not runs or runs[-1][1] != len(chunk):
+                runs.append((number, len(chunk)))
+        stbl = box(b'stbl',
+                   full_box(b'stsd', struct.pack('>I', 1) + track['entry']) +
+                   full_box(b'stts', struct.pack('>I', len(stts)) +
+                            b''.join(struct.pack('>II', n, d) for n, d in stts)) +
+                   stsz_box +
+                   full_box(b'stsc', struct.pack('>I', len(runs)) +
+                            b''.join(struct.pack('>III', c, n, 1) for c, n in runs)) +
+                   full_box(b'stco', struct.pack('>I', len(offsets[i])) +
+                            b''.join(struct.pack('>I', o) for o in offsets[i])) +
+                   track.get('extra', b''))
+        duration = sum(n * d for n, d in stts)
+        mdia = box(b'mdia',
+                   full_box(b'mdhd', struct.pack('>IIIIHH', 0, 0, track['timescale'], duration, 0, 0)) +
+                   full_box(b'hdlr', b'\0' * 4 + track['handler'] + b'\0' * 12 + b'\0') +
+                   box(b'minf', stbl))
+        edts = b''
+        if track.get('media_time'):
+            edts = box(b'edts', full_box(b'elst', struct.pack('>IIiI', 1, duration,
+                                                              track['media_time'], 0x10000)))
+        traks += box(b'trak', edts + mdia)
+
+    with open(path, 'wb') as f:
+        f.write(ftyp + box(b'mdat', mdat) + box(b'moov', traks))
+
+
+# ---------------------------------------------------------------------------
+# Matroska output reader (independent of the remuxer's writer helpers)
+# ---------------------------------------------------------------------------
+def children(buf, start, end):
+    return list(hdr_gui.iter_ebml(buf, start, end))
+
+
+def child(buf, start, end, eid):
+    return next((c for c in children(buf, start, end) if c[0] == eid), None)
+
+
+def read_mkv(path):
+    """Return (track_entries, blocks, attachment_data) of a Matroska file.
+
+    track_entries maps track number -> {element_id: raw bytes}; blocks is a
+    list of (track_number, timestamp_ms, keyframe, payload) in file order.
+    """
+    with open(path, 'rb') as f:
+        buf = f.read()
+    top = children(buf, 0, len(buf))
+    assert top[0][0] == hdr_gui.EBML_ID_HEADER
+    segment = top[1]
+    assert segment[0] == hdr_gui.MKV_ID_SEGMENT
+    seg_start, seg_end = segment[2], segment[2] + segment[3]
+    assert seg_end == len(buf)
+
+    tracks, blocks, attachment = {}, [], None
+    for eid, _h, pos, size in children(buf, seg_start, seg_end):
+        if eid == hdr_gui.MKV_ID_TRACKS:
+            for _e, _th, tpos, tsize in children(buf, pos, pos + size):
+                fields = {cid: buf[cpos:cpos + csize]
+                          for cid, _ch, cpos, csize in children(buf, tpos, tpos + tsize)}
+                tracks[int.from_bytes(fields[hdr_gui.MKV_ID_TRACK_NUMBER], 'big')] = fields
+        elif eid == hdr_gui.MKV_ID_ATTACHMENTS:
+            attached = child(buf, pos, pos + size, hdr_gui.MKV_ID_ATTACHED_FILE)
+            data = child(buf, attached[2], attached[2] + attached[3], hdr_gui.MKV_ID_FILE_DATA)
+            attachment = buf[data[2]:data[2] + data[3]]
+        elif eid == hdr_gui.MKV_ID_CLUSTER:
+            cluster_ts = 0
+            for cid, _ch, cpos, csize in children(buf, pos, pos + size):
+                if cid == hdr_gui.MKV_ID_CLUSTER_TIMESTAMP:
+                    cluster_ts = int.from_bytes(buf[cpos:cpos + csize], 'big')
+                elif cid == hdr_gui.MKV_ID_SIMPLE_BLOCK:
+                    track, length = hdr_gui._ebml_read_size(buf, cpos)
+                    relative, flags = struct.unpack('>hB', buf[cpos + length:cpos + length + 3])
+                    blocks.append((track, cluster_ts + relative, bool(flags & 0x80),
+                                   buf[cpos + length + 3:cpos + csize]))
+    return tracks, blocks, attachment
+
+
+def audio_field(entry, eid):
+    audio = entry[hdr_gui.MKV_ID_AUDIO]
+    return next(audio[p:p + s] for i, _h, p, s in children(audio, 0, len(audio)) if i == eid)
+
+
+@pytest.fixture
+def lut(tmp_path):
+    path = tmp_path / 'look.cube'
+    path.write_text('LUT_3D_SIZE 2\n' + '0 0 0\n' * 8)
+    return str(path)
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+def test_video_and_aac_round_trip(tmp_path, lut):
+    frames = [b'V%03d' % i * (2 + i % 5) for i in range(24)]
+    # I P B B ... ordering: composition offsets of 2/3/0 frames, elst skips the 2-frame delay.
+    ctts = [2 if i % 3 == 0 else 3 if i % 3 == 1 else 0 for i in range(len(frames))]
+    video = {'handler': b'vide', 'timescale': 30000, 'entry': video_entry(),
+             'chunks': [frames[i:i + 6] for i in range(0, len(frames), 6)],
+             'stts': [(len(frames), 1001)], 'media_time': 2 * 1001,
+             'extra': full_box(b'stss', struct.pack('>III', 2, 1, 13)) +
+                      full_box(b'ctts', struct.pack('>I', len(ctts)) +
+                               b''.join(struct.pack('>II', 1, c * 1001) for c in ctts))}
+    aac = [b'A%03d' % i for i in range(20)]
+    asc = b'\x11\x90'
+    dcd = b'\x04' + bytes([13 + 2 + len(asc)]) + b'\x40\x15' + b'\0' * 11 + b'\x05' + bytes([len(asc)]) + asc
+    esd = b'\x03' + bytes([3 + len(dcd)]) + b'\0\x01\0' + dcd
+    audio = {'handler': b'soun', 'timescale': 48000,
+             'entry': sound_entry(b'mp4a', children=full_box(b'esds', esd)),
+             'chunks': [aac[i:i + 5] for i in range(0, len(aac), 5)], 'stts': [(len(aac), 1024)]}
+    source, output = tmp_path / 'clip.mp4', tmp_path / 'clip.mkv'
+    make_mp4(source, [video, audio])
+
+    hdr = dict(hdr_gui.HDR_PRESETS['DJI Osmo Pocket 3 (HLG)'])
+    hdr_gui.native_remux(str(source), str(output), lut, hdr)
+    tracks, blocks, attachment = read_mkv(str(output))
+
+    assert tracks[1][hdr_gui.MKV_ID_CODEC_ID] == b'V_MPEG4/ISO/AVC'
+    assert tracks[1][hdr_gui.MKV_ID_CODEC_PRIVATE] == b'\x01\x64\x00\x28\xff\xe1AVCC'
+    assert tracks[2][hdr_gui.MKV_ID_CODEC_ID] == b'A_AAC'
+    assert tracks[2][hdr_gui.MKV_ID_CODEC_PRIVATE] == asc
+    with open(lut, 'rb') as f:
+        assert attachment == f.read()
+
+    video_blocks = [b for b in blocks if b[0] == 1]
+    assert [b[3] for b in video_blocks] == frames
+    assert [b[2] for b in video_blocks] == [i in (0, 12) for i in range(len(frames))]
+    # Presentation times: (dts + ctts - elst) in ms.
+    assert [b[1] for b in video_blocks] == [round((i + c - 2) * 1001 / 30) for i, c in enumerate(ctts)]
+    assert [b[3] for b in blocks if b[0] == 2] == aac
+
+    summary = hdr_gui.read_mkv_summary(str(output))
+    assert summary['colour']['transfer'] == hdr['transfer']
+    assert summary['attachments'] == [('look.cube', 'application/x-cube')]
+
+
+def test_quicktime_pcm_is_written_one_block_per_chunk(tmp_path, lut):
+    # Legacy QuickTime sowt: stsz says "1 byte" per sample, the real frame
+    # size (2 ch x 16-bit) only lives in the v1 bytesPerFrame field.
+    chunk_frames = [1000, 1000, 400]
+    pcm = [bytes([(c + i) % 256 for i in range(n * 4)]) for c, n in enumerate(chunk_frames)]
+    audio = {'handler': b'soun', 'timescale': 48000,
+             'entry': sound_entry(b'sowt', version=1, v1=(4,)),
+             'chunks': [[data[i:i + 4] for i in range(0, len(data), 4)] for data in pcm],
+             'stsz': 1}
+    source, output = tmp_path / 'pcm.mov', tmp_path / 'pcm.mkv'
+    make_mp4(source, [audio])
+
+    hdr_gui.native_remux(str(source), str(output), lut)
+    tracks, blocks, _attachment = read_mkv(str(output))
+
+    assert tracks[1][hdr_gui.MKV_ID_CODEC_ID] == b'A_PCM/INT/LIT'
+    assert audio_field(tracks[1], hdr_gui.MKV_ID_BIT_DEPTH) == b'\x10'
+    assert [b[3] for b in blocks] == pcm
+    assert [b[1] for b in blocks] == [0, round(1000 / 48), round(2000 / 48)]
+
+
+@pytest.mark.parametrize('flags, bits, codec_id', [
+    (0x2 | 0x4, 24, b'A_PCM/INT/BIG'),          # signed big-endian integer
+    (0x4, 24, b'A_PCM/INT/LIT'),                # signed little-endian integer
+    (0x1 | 0x8, 32, b'A_PCM/FLOAT/IEEE'),       # packed little-endian float
+])
+def test_lpcm_v2_fields_drive_codec_and_depth(tmp_path, lut, flags, bits, codec_id):
+    frame = 2 * bits // 8
+    data = bytes(i % 251 for i in range(frame * 50))
+    audio = {'handler': b'soun', 'timescale': 96000,
+             'entry': sound_entry(b'lpcm', version=2, rate=96000, v2=(bits, flags, frame)),
+             'chunks': [[data[i:i + frame] for i in range(0, len(data), frame)]],
+             'stsz': frame}
+    source, output = tmp_path / 'lpcm.mov', tmp_path / 'lpcm.mkv'
+    make_mp4(source, [audio])
+
+    hdr_gui.native_remux(str(source), str(output), lut)
+    tracks, blocks, _attachment = read_mkv(str(output))
+
+    assert tracks[1][hdr_gui.MKV_ID_CODEC_ID] == codec_id
+    assert int.from_bytes(audio_field(tracks[1], hdr_gui.MKV_ID_BIT_DEPTH), 'big') == bits
+    assert int.from_bytes(audio_field(tracks[1], hdr_gui.MKV_ID_CHANNELS), 'big') == 2
+    assert struct.unpack('>d', audio_field(tracks[1], hdr_gui.MKV_ID_SAMPLING_FREQUENCY))[0] == 96000
+    assert [b[3] for b in blocks] == [data]
+
+
+def test_pcm_layouts_matroska_cannot_carry_are_refused(tmp_path, lut):
+    # Big-endian float has no Matroska codec ID; the job must fall back to mkvmerge.
+    audio = {'handler': b'soun', 'timescale': 48000,
+             'entry': sound_entry(b'lpcm', version=2, v2=(32, 0x1 | 0x2, 8)),
+             'chunks': [[b'\0' * 8] * 4], 'stsz': 8}
+    source = tmp_path / 'float_be.mov'
+    make_mp4(source, [audio])
+    with pytest.raises(ValueError, match='float'):
+        hdr_gui.native_remux(str(source), str(tmp_path / 'out.mkv'), lut)
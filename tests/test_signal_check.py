@@ -0,0 +1,101 @@
+"""Range / Transfer classification of sampled luma histograms."""
+import pytest
+
+import hdr_gui
+
+np = pytest.importorskip('numpy')
+
+LIMITED_PQ = {'colour_range': '1', 'transfer': '16'}
+FULL_PQ = {'colour_range': '2', 'transfer': '16'}
+LIMITED_HLG = {'colour_range': '1', 'transfer': '18'}
+FULL_HLG = {'colour_range': '2', 'transfer': '18'}
+
+
+def histogram(*spans):
+    """1024-bin luma histogram; each span is (first code, last code, pixel count)."""
+    counts = np.zeros(1024, dtype=np.int64)
+    for first, last, pixels in spans:
+        counts[first:last + 1] += pixels // (last - first + 1)
+    return counts
+
+
+def test_limited_footage_is_detected_and_passes():
+    report = hdr_gui.classify_luma_histogram(histogram((64, 940, 876_000)), LIMITED_HLG)
+    assert report['detected_range'] == '1'
+    assert 64 <= report['code_low'] <= 70 and 930 <= report['code_high'] <= 940
+    assert report['ok'] and report['detail'] == 'range looks limited'
+
+
+def test_limited_footage_tagged_full_is_flagged():
+    report = hdr_gui.classify_luma_histogram(histogram((64, 940, 876_000)), FULL_HLG)
+    assert not report['ok']
+    assert report['issues'] == [f"tagged full range but blacks sit at code {report['code_low']} "
+                                f"(limited-range black is 64)"]
+
+
+@pytest.mark.parametrize('spans', [
+    ((0, 47, 20_000), (48, 1019, 980_000)),      # 2% deep blacks
+    ((64, 1019, 980_000), (1020, 1023, 20_000)),  # 2% at the reserved top codes
+])
+def test_full_range_evidence_flags_a_limited_tag(spans):
+    report = hdr_gui.classify_luma_histogram(histogram(*spans), LIMITED_HLG)
+    assert report['detected_range'] == '2'
+    assert not report['ok'] and 'looks full range' in report['issues'][0]
+
+
+def test_evidence_below_the_threshold_is_not_enough():
+    # 0.5% below code 48 is under SIGNAL_EVIDENCE_FRACTION, but it still
+    # drags the darkest 0.1% under 56, so the clip is inconclusive.
+    report = hdr_gui.classify_luma_histogram(histogram((0, 47, 5_000), (64, 940, 995_000)),
+                                             LIMITED_HLG)
+    assert report['detected_range'] == ''
+
+
+@pytest.mark.parametrize('hdr', [LIMITED_HLG, FULL_HLG])
+def test_inconclusive_is_never_flagged(hdr):
+    # Nothing near either black level: a bright, low-contrast shot.
+    report = hdr_gui.classify_luma_histogram(histogram((120, 900, 780_000)), hdr)
+    assert report['detected_range'] == '' and report['code_low'] > 96
+    assert report['ok'] and report['detail'] == 'range looks inconclusive'
+
+
+@pytest.mark.parametrize('low, high, expected', [(56, 900, '1'), (96, 900, '1'), (97, 900, ''),
+                                                 (64, 1019, '1')])
+def test_limited_window_edges(low, high, expected):
+    counts = np.zeros(1024, dtype=np.int64)
+    counts[low] = counts[high] = 10_000
+    counts[500] = 980_000
+    assert hdr_gui.classify_luma_histogram(counts, LIMITED_HLG)['detected_range'] == expected
+
+
+def test_pq_above_4000_nits_is_flagged():
+    # Limited-range PQ reaches 4000 nits around code 855; HLG/SDR footage
+    # mislabelled as PQ puts its highlights up there.
+    bright = hdr_gui.classify_luma_histogram(histogram((64, 800, 950_000), (900, 940, 50_000)),
+                                             LIMITED_PQ)
+    assert not bright['ok'] and 'above 4000 nits' in bright['detail']
+
+    graded = hdr_gui.classify_luma_histogram(histogram((64, 800, 995_000), (900, 940, 5_000)),
+                                             LIMITED_PQ)
+    assert graded['ok']
+
+
+def test_pq_threshold_follows_the_tagged_range():
+    # Code 880 is above 4000 nits as limited range, below it as full range.
+    counts = histogram((0, 47, 20_000), (48, 870, 930_000), (880, 880, 50_000))
+    assert any('4000 nits' in issue
+               for issue in hdr_gui.classify_luma_histogram(counts, LIMITED_PQ)['issues'])
+    full = hdr_gui.classify_luma_histogram(counts, FULL_PQ)
+    assert full['detected_range'] == '2' and full['ok']
+
+
+def test_source_tags_are_compared():
+    source = {'range': '2', 'transfer': '18'}
+    report = hdr_gui.classify_luma_histogram(histogram((64, 800, 737_000)), LIMITED_PQ, source)
+    assert report['issues'] == ['source stream says full range, tag says limited',
+                                'source stream says transfer 18, tag says 16']
+
+
+def test_empty_histogram():
+    report = hdr_gui.classify_luma_histogram(np.zeros(1024, dtype=np.int64), LIMITED_PQ)
+    assert report['ok'] and report['detail'] == 'no frames decoded'
@@ -0,0 +1,83 @@
+"""TrashQueue's undo window and in-flight rule, with a fake backend."""
+import threading
+
+import hdr_gui
+
+
+class GatedBackend:
+    """Records each path and blocks inside the call until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, path):
+        self.calls.append(path)
+        self.entered.set()
+        assert self.release.wait(5)
+
+
+def make_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'clip{i}.mov'
+        path.write_bytes(b'x')
+        paths.append(str(path))
+    return paths
+
+
+def test_undo_within_grace_period_keeps_the_file(tmp_path):
+    calls = []
+    queue = hdr_gui.TrashQueue(backend=calls.append, grace_seconds=60)
+    try:
+        (path,) = make_files(tmp_path, 1)
+        queue.stage(path)
+        assert queue.confirm() == 1
+        assert queue.undo(path) == 1
+        assert queue.pending_paths() == [] and queue.flush(timeout=1)
+        assert calls == []
+    finally:
+        queue.stop()
+
+
+def test_undo_of_an_in_flight_path_is_refused(tmp_path):
+    backend = GatedBackend()
+    queue = hdr_gui.TrashQueue(backend=backend, grace_seconds=0, batch_size=4)
+    try:
+        first, second = make_files(tmp_path, 2)
+        queue.stage(first)
+        queue.stage(second)
+        queue.confirm()
+        assert backend.entered.wait(5)
+        assert backend.calls == [first]
+
+        # first is being moved right now; second is still only queued.
+        assert queue.undo(first) == 0
+        assert queue.undo(second) == 1
+        backend.release.set()
+
+        assert queue.flush(timeout=5)
+        assert [path for path, _when in queue.trashed] == [first]
+        assert backend.calls == [first]
+    finally:
+        backend.release.set()
+        queue.stop()
+
+
+def test_undo_all_during_a_batch_skips_in_flight(tmp_path):
+    backend = GatedBackend()
+    queue = hdr_gui.TrashQueue(backend=backend, grace_seconds=0, batch_size=1)
+    try:
+        (path,) = make_files(tmp_path, 1)
+        queue.stage(path)
+        queue.confirm()
+        assert backend.entered.wait(5)
+        assert queue.undo() == 0
+        assert queue.pending_paths() == [path]
+        backend.release.set()
+        assert queue.flush(timeout=5)
+        assert backend.calls == [path]
+    finally:
+        backend.release.set()
+        queue.stop()
@@ -0,0 +1,47 @@
+"""How the sampled verification level picks its decode windows."""
+import pytest
+
+import hdr_gui
+
+
+@pytest.fixture
+def decoder(monkeypatch):
+    """Fake quick check + ffmpeg; records the windows and full decodes asked for."""
+    calls = {'windows': [], 'full': 0, 'duration': 0.0}
+    monkeypatch.setattr(hdr_gui.shutil, 'which', lambda name: '/usr/bin/' + name)
+    monkeypatch.setattr(hdr_gui, '_verify_quick', lambda *args: (
+        True, 'Header OK', {'duration_s': calls['duration']}))
+
+    def decode_window(ffmpeg, path, start, seconds, timeout):
+        calls['windows'].append(start)
+        return ''
+
+    def verify_full(path, deadline, ffmpeg):
+        calls['full'] += 1
+        return True, 'Full decode clean'
+
+    monkeypatch.setattr(hdr_gui, '_decode_window', decode_window)
+    monkeypatch.setattr(hdr_gui, '_verify_full', verify_full)
+    return calls
+
+
+def test_long_file_gets_random_windows(decoder):
+    decoder['duration'] = 600.0
+    report = hdr_gui.verify_output('in.mov', 'out.mkv', 'sampled')
+    assert report['ok'] and report['level'] == 'sampled'
+    assert len(decoder['windows']) == hdr_gui.VERIFY_SAMPLE_COUNT and decoder['full'] == 0
+    assert all(0.0 <= start <= 600.0 - hdr_gui.VERIFY_SAMPLE_SECONDS for start in decoder['windows'])
+
+
+def test_unknown_duration_escalates_to_full_decode(decoder):
+    report = hdr_gui.verify_output('in.mov', 'out.mkv', 'sampled')
+    assert decoder['windows'] == [] and decoder['full'] == 1
+    assert report['ok'] and report['requested'] == 'sampled' and report['level'] == 'full'
+    assert report['detail'].startswith('Duration unknown')
+
+
+def test_file_shorter_than_a_window_is_decoded_once(decoder):
+    decoder['duration'] = 1.5
+    report = hdr_gui.verify_output('in.mov', 'out.mkv', 'sampled')
+    assert decoder['windows'] == [0.0]
+    assert report['ok'] and report['detail'] == 'Whole 1.5s file decoded cleanly'